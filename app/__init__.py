@@ -1,15 +1,25 @@
+import os
+import click
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
-from flask_login import LoginManager
+from flask_login import LoginManager, current_user
 from config import config
+from portal_common.instrumentation import Instrumentation
+from portal_common.user_cache import UserCache
+from portal_common.password_policy import PasswordHasher
+from portal_common.login_throttle import LoginThrottle
 
 # Initialize extensions
 db = SQLAlchemy()
-migrate = Migrate()
+migrate = None  # Flask-Migrate is created lazily, see create_app
 csrf = CSRFProtect()
 login_manager = LoginManager()
+instrumentation = Instrumentation()
+user_cache = UserCache()
+password_hasher = PasswordHasher()
+login_throttle = LoginThrottle()
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
@@ -22,18 +32,47 @@ def create_app(config_name='default'):
     # Load configuration
     app.config.from_object(config[config_name])
 
+    # Behind the Render/Vercel proxy every request comes from the proxy's address; take the
+    # client's from the last PROXY_FIX_X_FOR X-Forwarded-For hops (login throttle)
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+    # Pool strategy depends on where we run (serverless/pgbouncer vs gunicorn)
+    from app.db_engine import build_engine_options
+    strategy, engine_options = build_engine_options(app.config)
+    app.config['DB_POOL_STRATEGY'] = strategy
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
+    if app.config['ENABLE_MIGRATIONS']:
+        # Alembic is a heavy import and is only needed for the `flask db` CLI,
+        # so serverless cold starts skip it
+        from flask_migrate import Migrate
+        global migrate
+        migrate = Migrate(app, db)
     csrf.init_app(app)
     login_manager.init_app(app)
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
+
+    # Opt-in request timing; the summary is limited to INSTRUMENTATION_ADMIN_EMAILS
+    instrumentation.init_app(app, admin_check=lambda: (
+        current_user.is_authenticated and (current_user.email or '').lower() in app.config['INSTRUMENTATION_ADMIN_EMAILS']
+    ))
 
-    # User loader for Flask-Login
+    # User loader for Flask-Login, served from the per-process snapshot cache
     from app.models import User
+    user_cache.init_app(app, User, db.session)
+    instrumentation.register_metrics('user_cache', user_cache.stats)
+    instrumentation.register_metrics('password_hasher', password_hasher.stats)
+    instrumentation.register_metrics('login_throttle', login_throttle.stats)
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(int(user_id))
 
     # Register blueprints/routes
     from app import routes, models
@@ -41,12 +80,63 @@ def create_app(config_name='default'):
     app.register_blueprint(routes.bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
 
-    # Create database tables (needed for Vercel serverless)
-    # Only create tables if we have a proper database URL (not SQLite on Vercel)
-    try:
-        with app.app_context():
-            db.create_all()
-    except Exception as e:
-        app.logger.warning(f"Could not create database tables: {e}")
+    configure_templates(app)
+
+    @app.cli.command('init-db')
+    def init_db():
+        """Create database tables (run once per deployment database)"""
+        db.create_all()
+        print('Database tables created.')
+
+    @app.cli.command('compile-templates')
+    def compile_templates():
+        """Precompile Jinja templates to Python modules for faster cold starts"""
+        target = app.config['JINJA_COMPILED_TEMPLATES_DIR']
+        app.jinja_env.compile_templates(target, zip=None, ignore_errors=False)
+        print(f'Templates compiled to {target}.')
+
+    @app.cli.command('hash-benchmark')
+    @click.option('--target-ms', default=250, help='Target time for one password hash')
+    def hash_benchmark(target_ms):
+        """Pick a PASSWORD_HASH_COST that meets a target login latency on this host"""
+        from portal_common.password_policy import benchmark
+        algorithm = app.config['PASSWORD_HASH_ALGORITHM']
+        cost, elapsed = benchmark(algorithm, target_ms)
+        print(f'{algorithm}: PASSWORD_HASH_COST={cost} ({elapsed:.0f} ms per hash)')
+
+    # Creating tables costs a round trip plus DDL reflection, so serverless
+    # deployments create them with `flask init-db` instead of on every cold start
+    if app.config['AUTO_CREATE_TABLES']:
+        try:
+            with app.app_context():
+                db.create_all()
+        except Exception as e:
+            app.logger.warning(f"Could not create database tables: {e}")
+
+    # Open the first pooled connection at boot instead of on the first request
+    if app.config['DB_WARMUP'] and strategy == 'queue':
+        from app.db_engine import warm_up
+        try:
+            with app.app_context():
+                warm_up(db.engine)
+        except Exception as e:
+            app.logger.warning(f"Could not warm up the database pool: {e}")
 
     return app
+
+
+def configure_templates(app):
+    """Use precompiled templates when available and cache template bytecode"""
+    from jinja2 import ChoiceLoader, FileSystemBytecodeCache, ModuleLoader
+
+    compiled_dir = app.config.get('JINJA_COMPILED_TEMPLATES_DIR')
+    if app.config.get('JINJA_USE_COMPILED_TEMPLATES') and compiled_dir and os.path.isdir(compiled_dir):
+        app.jinja_env.loader = ChoiceLoader([ModuleLoader(compiled_dir), app.jinja_env.loader])
+
+    cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if cache_dir:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        except OSError as e:
+            app.logger.warning(f"Template bytecode cache disabled: {e}")
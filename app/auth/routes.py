@@ -1,9 +1,11 @@
 from flask import render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, current_user, login_required
-from app import db
+from app import db, password_hasher, login_throttle
+from portal_common.password_policy import PasswordHasherBusy
 from app.auth import bp
 from app.auth.forms import LoginForm, RegistrationForm, ProfileForm
 from app.models import User
+from portal_common.user_cache import live_user
 
 
 @bp.route('/register', methods=['GET', 'POST'])
@@ -34,13 +36,28 @@ def login():
         return redirect(url_for('main.index'))
 
     form = LoginForm()
+    if request.method == 'POST':
+        # Throttle before any database or hashing work
+        retry_after = login_throttle.hit(request.remote_addr, request.form.get('email'))
+        if retry_after:
+            flash('Too many login attempts. Please wait a few minutes and try again.', 'warning')
+            return render_template('auth/login.html', title='Login', form=form), 429, {'Retry-After': str(int(retry_after) + 1)}
+
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data.lower()).first()
-        if user is None or not user.check_password(form.password.data):
+        try:
+            # Also upgrades the stored hash if the hashing policy has changed
+            valid = user is not None and password_hasher.verify_and_update(user, form.password.data)
+        except PasswordHasherBusy:
+            flash('Too many login attempts right now. Please try again in a moment.', 'warning')
+            return render_template('auth/login.html', title='Login', form=form), 503
+        if not valid:
             flash('Invalid email or password.', 'danger')
             return redirect(url_for('auth.login'))
 
+        db.session.commit()
         login_user(user, remember=form.remember_me.data)
+        login_throttle.reset_user(form.email.data)
         next_page = request.args.get('next')
         if not next_page or not next_page.startswith('/'):
             next_page = url_for('main.index')
@@ -65,10 +82,11 @@ def profile():
     form = ProfileForm(obj=current_user)
 
     if form.validate_on_submit():
-        current_user.full_name = form.full_name.data
-        current_user.bio = form.bio.data
-        current_user.location = form.location.data
-        current_user.website = form.website.data
+        user = live_user(current_user)
+        user.full_name = form.full_name.data
+        user.bio = form.bio.data
+        user.location = form.location.data
+        user.website = form.website.data
         db.session.commit()
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('auth.profile'))
@@ -0,0 +1,117 @@
+"""
+Database engine strategies
+
+The pool strategy is picked from DB_POOL_STRATEGY, or from the environment
+when it is unset:
+
+- ``null``: no pooling in the app, for external poolers (pgbouncer, Vercel
+  Postgres' pooled URL) and serverless instances that freeze between requests
+- ``queue``: a small pre-pinged QueuePool with connection recycling, for
+  long-lived gunicorn workers
+- ``default``: SQLAlchemy's defaults (used for SQLite)
+"""
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+class PoolTimingMixin:
+    """Record how long callers wait to get a connection from the pool"""
+
+    def _init_timing(self):
+        self._timing_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        if not hasattr(self, '_timing_lock'):
+            self._init_timing()
+        started = time.perf_counter()
+        connection = super()._do_get()
+        waited = time.perf_counter() - started
+        with self._timing_lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return connection
+
+    def timing_stats(self):
+        checkouts = getattr(self, 'checkouts', 0)
+        return {
+            'checkouts': checkouts,
+            'avg_wait_ms': round(self.wait_total / checkouts * 1000, 2) if checkouts else 0.0,
+            'max_wait_ms': round(getattr(self, 'wait_max', 0.0) * 1000, 2)
+        }
+
+
+class TimedQueuePool(PoolTimingMixin, QueuePool):
+    pass
+
+
+class TimedNullPool(PoolTimingMixin, NullPool):
+    pass
+
+
+def choose_strategy(url, config):
+    """Pick the pool strategy for a database URL"""
+    strategy = config.get('DB_POOL_STRATEGY')
+    if strategy:
+        return strategy
+    if not url or not url.startswith('postgresql'):
+        return 'default'
+    # Pooled URLs already go through pgbouncer; serverless instances freeze
+    # with idle connections, so keep no pool in either case
+    if config.get('SERVERLESS') or 'pgbouncer=true' in url or '-pooler.' in url:
+        return 'null'
+    return 'queue'
+
+
+def build_engine_options(config):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for the configured strategy
+
+    Args:
+        config: Flask config mapping
+
+    Returns:
+        tuple: (strategy name, engine options dict)
+    """
+    url = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    strategy = choose_strategy(url, config)
+
+    if strategy == 'null':
+        return strategy, {'poolclass': TimedNullPool}
+    if strategy == 'queue':
+        return strategy, {
+            'poolclass': TimedQueuePool,
+            'pool_size': config.get('DB_POOL_SIZE', 5),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 5),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+            'pool_recycle': config.get('DB_POOL_RECYCLE', 280),
+            'pool_pre_ping': True
+        }
+    return 'default', {}
+
+
+def warm_up(engine):
+    """Open (and return to the pool) one connection so the first request doesn't pay for it"""
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+
+
+def pool_metrics(engine, strategy):
+    """Current pool state for the health endpoint"""
+    pool = engine.pool
+    metrics = {'strategy': strategy, 'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow()
+        })
+    if isinstance(pool, PoolTimingMixin):
+        metrics.update(pool.timing_stats())
+    return metrics
@@ -1,7 +1,7 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from app import db
+from sqlalchemy.orm import joinedload
+from app import db, password_hasher
 
 
 class User(UserMixin, db.Model):
@@ -29,11 +29,11 @@ class User(UserMixin, db.Model):
 
     def set_password(self, password):
         """Hash and set the user's password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
         """Check if provided password matches hash"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -101,9 +101,17 @@ class Task(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
+    # Covers the per-user status/category counts on the dashboard
+    __table_args__ = (db.Index('ix_tasks_user_category_completed', 'user_id', 'category_id', 'completed'),)
+
     def __repr__(self):
         return f'<Task {self.title}>'
 
+    @classmethod
+    def listing_query(cls, user_id):
+        """A user's tasks with categories loaded in the same query"""
+        return cls.query.filter_by(user_id=user_id).options(joinedload(cls.category))
+
     def to_dict(self):
         """Convert task to dictionary"""
         return {
@@ -3,6 +3,8 @@ from flask_login import login_required, current_user
 from app import db
 from app.models import Task, Category
 from app.forms import TaskForm, CategoryForm
+from app.stats import get_task_stats
+from app.db_engine import pool_metrics
 from datetime import datetime
 import os
 
@@ -37,6 +39,12 @@ def health():
     if db_error:
         parts.append(f"DB error: {db_error}")
 
+    try:
+        metrics = pool_metrics(db.engine, current_app.config['DB_POOL_STRATEGY'])
+        parts.append("DB pool: " + ', '.join(f"{key}={value}" for key, value in metrics.items()))
+    except Exception as e:
+        parts.append(f"DB pool error: {e}")
+
     code = 200 if db_connected else 503
     return '\n'.join(parts), code
 
@@ -51,7 +59,7 @@ def index():
         category_id = request.args.get('category', type=int)
 
         # Base query - filter by current user
-        query = Task.query.filter_by(user_id=current_user.id)
+        query = Task.listing_query(current_user.id)
 
         # Apply category filter
         if category_id:
@@ -69,19 +77,18 @@ def index():
         # Get all categories for the sidebar/filter (user's categories only)
         categories = Category.query.filter_by(user_id=current_user.id).all()
 
-        # Get counts for filters (user's tasks only)
-        total_count = Task.query.filter_by(user_id=current_user.id).count()
-        active_count = Task.query.filter_by(user_id=current_user.id, completed=False).count()
-        completed_count = Task.query.filter_by(user_id=current_user.id, completed=True).count()
+        # Get counts for filters and category badges (one grouped query)
+        stats = get_task_stats(current_user.id)
 
         return render_template('index.html',
                              tasks=tasks,
                              categories=categories,
                              current_filter=filter_status,
                              current_category=category_id,
-                             total_count=total_count,
-                             active_count=active_count,
-                             completed_count=completed_count)
+                             total_count=stats.total,
+                             active_count=stats.active,
+                             completed_count=stats.completed,
+                             stats=stats)
     except Exception as e:
         return f"Database Error: {str(e)}. Please make sure POSTGRES_URL is configured in Vercel.", 500
 
@@ -168,8 +175,9 @@ def toggle_task(id):
 def categories():
     """Display all categories"""
     categories_list = Category.query.filter_by(user_id=current_user.id).all()
+    stats = get_task_stats(current_user.id)
     form = CategoryForm()
-    return render_template('categories.html', categories=categories_list, form=form)
+    return render_template('categories.html', categories=categories_list, stats=stats, form=form)
 
 @bp.route('/categories/new', methods=['POST'])
 @login_required
@@ -0,0 +1,35 @@
+from app import db
+from app.models import Task
+
+
+class TaskStats:
+    """Task counts for one user, by status and by category"""
+
+    def __init__(self):
+        self.total = 0
+        self.active = 0
+        self.completed = 0
+        self.by_category = {}
+
+    def category_count(self, category_id):
+        """Number of tasks in a category"""
+        return self.by_category.get(category_id, 0)
+
+
+def get_task_stats(user_id):
+    """Compute status and per-category task counts in a single grouped query"""
+    rows = db.session.query(Task.category_id, Task.completed, db.func.count(Task.id)) \
+        .filter(Task.user_id == user_id) \
+        .group_by(Task.category_id, Task.completed) \
+        .all()
+
+    stats = TaskStats()
+    for category_id, completed, count in rows:
+        stats.total += count
+        if completed:
+            stats.completed += count
+        else:
+            stats.active += count
+        if category_id is not None:
+            stats.by_category[category_id] = stats.by_category.get(category_id, 0) + count
+    return stats
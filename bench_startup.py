@@ -0,0 +1,59 @@
+"""
+Cold-start benchmark for the Vercel entry point
+
+Starts a fresh interpreter for every run, imports api/index.py and serves
+one request, reporting import time and import-to-first-response time.
+
+Usage:
+    python bench_startup.py [--runs 5] [--path /health]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {basedir!r})
+from api.index import app
+imported = time.perf_counter()
+response = app.test_client().get({path!r})
+responded = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'first_response_ms': (responded - start) * 1000,
+    'status': response.status_code
+}}))
+"""
+
+
+def run_once(path, env):
+    code = CHILD.format(basedir=basedir, path=path)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/health')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('FLASK_ENV', 'production')
+
+    results = [run_once(args.path, env) for _ in range(args.runs)]
+    for key in ('import_ms', 'first_response_ms'):
+        values = [r[key] for r in results]
+        print(f"{key:>18}: median {statistics.median(values):7.1f} ms  "
+              f"min {min(values):7.1f} ms  max {max(values):7.1f} ms")
+    print(f"{'status':>18}: {results[-1]['status']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,16 @@ def get_database_url():
         return 'sqlite://'
     return 'sqlite:///' + os.path.join(basedir, 'todo_dev.db')
 
+# Vercel sets VERCEL=1 in its functions; SERVERLESS=1 forces the same behaviour elsewhere
+SERVERLESS = bool(os.environ.get('VERCEL') or os.environ.get('SERVERLESS'))
+
+def env_flag(name, default):
+    """Read a boolean environment variable"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
 class Config:
     """Base configuration class"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-please-change-in-production'
@@ -33,6 +43,54 @@ class Config:
     SQLALCHEMY_DATABASE_URI = get_database_url()
     SERVER_NAME = os.environ.get('SERVER_NAME')
 
+    # Cold-start settings: serverless instances skip DDL and the Alembic import
+    AUTO_CREATE_TABLES = env_flag('AUTO_CREATE_TABLES', not SERVERLESS)
+    ENABLE_MIGRATIONS = env_flag('ENABLE_MIGRATIONS', not SERVERLESS)
+    JINJA_COMPILED_TEMPLATES_DIR = os.path.join(basedir, 'app', 'compiled_templates')
+    # Off by default: compiled templates shadow the sources, so a stale build would hide template edits
+    JINJA_USE_COMPILED_TEMPLATES = env_flag('JINJA_USE_COMPILED_TEMPLATES', False)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR') or \
+        ('/tmp/jinja-cache' if SERVERLESS else None)
+
+    # Connection pooling, see app/db_engine.py. DB_POOL_STRATEGY is null, queue
+    # or default; unset picks null for serverless/pgbouncer and queue otherwise
+    SERVERLESS = SERVERLESS
+    DB_POOL_STRATEGY = os.environ.get('DB_POOL_STRATEGY')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 280))
+    DB_WARMUP = env_flag('DB_WARMUP', not SERVERLESS)
+
+    # Password hashing: algorithm is pbkdf2:sha256 or scrypt, cost is PBKDF2 iterations or
+    # scrypt N (unset = werkzeug default). Find a cost for this host with `flask hash-benchmark`
+    PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM', 'scrypt')
+    PASSWORD_HASH_COST = int(os.environ['PASSWORD_HASH_COST']) if os.environ.get('PASSWORD_HASH_COST') else None
+    PASSWORD_VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', 0))  # 0 = min(4, CPU count)
+    PASSWORD_VERIFY_QUEUE = int(os.environ.get('PASSWORD_VERIFY_QUEUE', 8))  # Waiting verifications before rejecting
+    PASSWORD_VERIFY_TIMEOUT = 10  # Seconds
+
+    # Login throttling: token buckets per client IP and per email, as attempts/seconds.
+    # LOGIN_THROTTLE_STORAGE (a SQLite file path) shares the buckets between worker processes
+    LOGIN_THROTTLE_ENABLED = os.environ.get('LOGIN_THROTTLE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    LOGIN_THROTTLE_IP_LIMIT = os.environ.get('LOGIN_THROTTLE_IP_LIMIT', '20/300')
+    LOGIN_THROTTLE_USER_LIMIT = os.environ.get('LOGIN_THROTTLE_USER_LIMIT', '5/300')
+    LOGIN_THROTTLE_STORAGE = os.environ.get('LOGIN_THROTTLE_STORAGE')
+
+    # Number of proxies in front of the app that append to X-Forwarded-For (0 = not behind a proxy).
+    # Only trust as many hops as there really are, or clients can pick their own address
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+
+    # Flask-Login user snapshots (per process); other workers see user changes after the TTL
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))  # 0 disables the cache
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))  # Seconds
+
+    # Performance instrumentation (Server-Timing header + /admin/performance)
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '').lower() in ('1', 'true', 'yes')
+    INSTRUMENTATION_ADMIN_EMAILS = [
+        email.strip().lower() for email in os.environ.get('INSTRUMENTATION_ADMIN_EMAILS', '').split(',') if email.strip()
+    ]
+
 class DevelopmentConfig(Config):
     """Development environment configuration"""
     DEBUG = True
@@ -43,11 +101,27 @@ class ProductionConfig(Config):
     """Production environment configuration"""
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = get_database_url()
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 1))  # Vercel's edge proxy
     # Remove SERVER_NAME for Vercel - it handles routing automatically
 
+class TestingConfig(Config):
+    """Test configuration (see tests/conftest.py)"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'  # A new in-memory database per app
+    SERVER_NAME = None
+    WTF_CSRF_ENABLED = False
+    AUTO_CREATE_TABLES = True
+    DB_POOL_STRATEGY = 'default'
+    DB_WARMUP = False
+    JINJA_BYTECODE_CACHE_DIR = None
+    PASSWORD_HASH_ALGORITHM = 'pbkdf2:sha256'
+    PASSWORD_HASH_COST = 1000
+    LOGIN_THROTTLE_ENABLED = False
+
 # Configuration dictionary
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
@@ -0,0 +1,23 @@
+"""Add covering index for the task dashboard counts
+
+Revision ID: d7e8f9a0b1c2
+Revises: c544eff5b372
+Create Date: 2026-02-03 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e8f9a0b1c2'
+down_revision = 'c544eff5b372'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_tasks_user_category_completed', 'tasks', ['user_id', 'category_id', 'completed'])
+
+
+def downgrade():
+    op.drop_index('ix_tasks_user_category_completed', table_name='tasks')
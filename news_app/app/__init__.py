@@ -1,6 +1,19 @@
+import os
+import sys
+
+# Modules shared with the todo app live in portal_common/ at the repository root
+_repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _repo_root not in sys.path:
+    sys.path.append(_repo_root)
+
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
+from flask_login import current_user
 from config import config
-from app.extensions import db, migrate, login_manager, csrf
+from app.extensions import db, migrate, login_manager, csrf, view_counter, image_processor, article_cache, \
+    instrumentation, user_cache, password_hasher, login_throttle, related_index, trending, \
+    unique_readers, page_cache, conditional_get, image_cache, \
+    image_collector, upload_reconciler
 
 
 def create_app(config_name='default'):
@@ -10,23 +23,71 @@ def create_app(config_name='default'):
     # Load configuration
     app.config.from_object(config[config_name])
 
+    # Behind the Render/Vercel proxy every request comes from the proxy's address; take the
+    # client's from the last PROXY_FIX_X_FOR X-Forwarded-For hops (login throttle, reader counts)
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
     # Initialize extensions with app
     db.init_app(app)
     migrate.init_app(app, db)
     csrf.init_app(app)
     login_manager.init_app(app)
+    view_counter.init_app(app)
+    trending.init_app(app)
+    view_counter.add_flush_listener(trending.record_batch)
+    unique_readers.init_app(app)
+    view_counter.add_flush_listener(unique_readers.persist)
+    image_processor.init_app(app)
+    image_cache.init_app(app)
+    image_collector.init_app(app)
+    upload_reconciler.init_app(app)
+    article_cache.init_app(app)
+    related_index.init_app(app)
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
+
+    # Opt-in request timing (Server-Timing header + /admin/performance)
+    instrumentation.init_app(app, admin_check=lambda: current_user.is_authenticated and current_user.is_admin)
+    instrumentation.register_metrics('view_counter', view_counter.stats)
+    instrumentation.register_metrics('trending', trending.stats)
+    instrumentation.register_metrics('unique_readers', unique_readers.stats)
+    instrumentation.register_metrics('article_cache', article_cache.stats)
+    instrumentation.register_metrics('related_index', related_index.stats)
+    instrumentation.register_metrics('image_cache', image_cache.stats)
+    instrumentation.register_metrics('image_collector', image_collector.stats)
+    instrumentation.register_metrics('upload_reconciler', upload_reconciler.stats)
+    instrumentation.register_metrics('password_hasher', password_hasher.stats)
+    instrumentation.register_metrics('login_throttle', login_throttle.stats)
+
+    # Anonymous full-page cache, after instrumentation so cache hits are timed too
+    page_cache.init_app(app)
+    instrumentation.register_metrics('page_cache', page_cache.stats)
+
+    # ETag/Last-Modified for articles, listings and uploads (its hook runs before the page cache's)
+    conditional_get.init_app(app)
 
     # Flask-Login configuration
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
 
-    # User loader for Flask-Login
+    # User loader for Flask-Login, served from the per-process snapshot cache
     from app.models import User
+    user_cache.init_app(app, User, db.session)
+    instrumentation.register_metrics('user_cache', user_cache.stats)
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(int(user_id))
+
+    @app.context_processor
+    def inject_unread_message_count():
+        """Navbar unread badge from the maintained counter"""
+        count = 0
+        if current_user.is_authenticated:
+            count = current_user.unread_messages_count or 0
+        return {'unread_message_count': count}
 
     # Register blueprints
     from app.blueprints.auth import auth_bp
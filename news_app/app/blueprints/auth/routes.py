@@ -1,10 +1,12 @@
 from datetime import datetime
-from flask import render_template, redirect, url_for, flash, request
+import click
+from flask import render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, current_user
 from app.blueprints.auth import auth_bp
 from app.blueprints.auth.forms import RegistrationForm, LoginForm
 from app.models import User
-from app.extensions import db
+from app.extensions import db, password_hasher, login_throttle
+from portal_common.password_policy import PasswordHasherBusy, benchmark
 
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
@@ -41,10 +43,24 @@ def login():
 
     form = LoginForm()
 
+    if request.method == 'POST':
+        # Throttle before any database or hashing work
+        retry_after = login_throttle.hit(request.remote_addr, request.form.get('username'))
+        if retry_after:
+            flash('Too many login attempts. Please wait a few minutes and try again.', 'warning')
+            return render_template('auth/login.html', form=form), 429, {'Retry-After': str(int(retry_after) + 1)}
+
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
 
-        if user and user.check_password(form.password.data):
+        try:
+            # Also upgrades the stored hash if the hashing policy has changed
+            valid = user is not None and password_hasher.verify_and_update(user, form.password.data)
+        except PasswordHasherBusy:
+            flash('Too many login attempts right now. Please try again in a moment.', 'warning')
+            return render_template('auth/login.html', form=form), 503
+
+        if valid:
             if not user.is_active:
                 flash('Your account has been deactivated. Please contact the administrator.', 'danger')
                 return redirect(url_for('auth.login'))
@@ -54,6 +70,7 @@ def login():
             db.session.commit()
 
             login_user(user, remember=form.remember_me.data)
+            login_throttle.reset_user(form.username.data)
             flash(f'Welcome back, {user.username}!', 'success')
 
             # Redirect to next page or home
@@ -67,6 +84,15 @@ def login():
     return render_template('auth/login.html', form=form)
 
 
+@auth_bp.cli.command('hash-benchmark')
+@click.option('--target-ms', default=250, help='Target time for one password hash')
+def hash_benchmark(target_ms):
+    """Pick a PASSWORD_HASH_COST that meets a target login latency on this host"""
+    algorithm = current_app.config['PASSWORD_HASH_ALGORITHM']
+    cost, elapsed = benchmark(algorithm, target_ms)
+    print(f"{algorithm}: PASSWORD_HASH_COST={cost} ({elapsed:.0f} ms per hash)")
+
+
 @auth_bp.route('/logout')
 def logout():
     """User logout"""
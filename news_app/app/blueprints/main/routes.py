@@ -1,9 +1,10 @@
-from flask import render_template, redirect, url_for, request, flash
+from flask import render_template, redirect, url_for, request, flash, current_app
 from flask_login import login_required, current_user
 from app.blueprints.main import main_bp
-from app.models import NewsArticle, User, JobApplication
+from app.models import NewsArticle, JobApplication, UserJob
 from app.extensions import db
 from sqlalchemy import func
+from app.utils.pagination import paginate_keyset
 
 
 @main_bp.route('/')
@@ -67,15 +68,7 @@ def welcome():
 
     # Get job statistics for poll display
     # Count how many users selected each job
-    import json
-    all_users = User.query.filter(User.desired_jobs.isnot(None)).all()
-    job_counts = {job: 0 for job in available_jobs}
-
-    for user in all_users:
-        user_jobs = user.get_desired_jobs()
-        for job in user_jobs:
-            if job in job_counts:
-                job_counts[job] += 1
+    job_counts = UserJob.job_counts(available_jobs)
 
     total_selections = sum(job_counts.values())
     user_jobs = current_user.get_desired_jobs()
@@ -109,17 +102,23 @@ def job_applications():
         return redirect(url_for('main.welcome'))
 
     # Get pending applications
-    pending = JobApplication.query.filter_by(status='pending').order_by(JobApplication.created_at.desc()).all()
+    cursor = request.args.get('cursor')
+    per_page = current_app.config.get('JOB_APPLICATIONS_PER_PAGE', 20)
+    pagination = paginate_keyset(JobApplication.queue_query().filter_by(status='pending'),
+                                 [(JobApplication.created_at, True), (JobApplication.id, True)],
+                                 cursor, per_page, count=True)
+    pending = pagination.items
 
     # Get recent reviewed applications
-    reviewed = JobApplication.query.filter(
+    reviewed = JobApplication.queue_query().filter(
         JobApplication.status.in_(['approved', 'denied'])
     ).order_by(JobApplication.reviewed_at.desc()).limit(20).all()
 
-    pending_count = len(pending)
+    pending_count = pagination.total
 
     return render_template('main/job_applications.html',
                          pending=pending,
+                         pagination=pagination,
                          reviewed=reviewed,
                          pending_count=pending_count)
 
@@ -1,8 +1,11 @@
-from flask import render_template, redirect, url_for, request, flash
+from datetime import datetime
+from flask import render_template, redirect, url_for, request, flash, current_app
 from flask_login import login_required, current_user
 from app.blueprints.messages import messages_bp
 from app.models import Message, User
 from app.extensions import db
+from app.utils.pagination import paginate_keyset
+from portal_common.user_cache import live_user
 from sqlalchemy import or_
 
 
@@ -10,11 +13,17 @@ from sqlalchemy import or_
 @login_required
 def inbox():
     """View inbox - received messages"""
-    messages = Message.query.filter_by(recipient_id=current_user.id).order_by(Message.created_at.desc()).all()
-    unread_count = Message.query.filter_by(recipient_id=current_user.id, is_read=False).count()
+    cursor = request.args.get('cursor')
+    per_page = current_app.config.get('MESSAGES_PER_PAGE', 25)
+
+    query = Message.inbox_query(current_user.id)
+    pagination = paginate_keyset(query, [(Message.created_at, True), (Message.id, True)], cursor, per_page,
+                                 count=True, count_cache_key=f'messages.inbox:{current_user.id}', count_ttl=10)
+    unread_count = current_user.unread_messages_count
 
     return render_template('messages/inbox.html',
-                         messages=messages,
+                         messages=pagination.items,
+                         pagination=pagination,
                          unread_count=unread_count,
                          active_tab='inbox')
 
@@ -23,7 +32,7 @@ def inbox():
 @login_required
 def sent():
     """View sent messages"""
-    messages = Message.query.filter_by(sender_id=current_user.id).order_by(Message.created_at.desc()).all()
+    messages = Message.sent_query(current_user.id).order_by(Message.created_at.desc()).all()
 
     return render_template('messages/sent.html',
                          messages=messages,
@@ -128,7 +137,11 @@ def delete(message_id):
 @login_required
 def mark_all_read():
     """Mark all messages as read"""
-    Message.query.filter_by(recipient_id=current_user.id, is_read=False).update({'is_read': True})
+    # Bulk update bypasses the per-message counter events, so reset the counter here
+    Message.query.filter_by(recipient_id=current_user.id, is_read=False).update(
+        {'is_read': True, 'read_at': datetime.utcnow()}, synchronize_session=False
+    )
+    live_user(current_user).unread_messages_count = 0
     db.session.commit()
 
     flash('All messages marked as read.', 'success')
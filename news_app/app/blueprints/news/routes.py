@@ -1,69 +1,156 @@
-from flask import render_template, redirect, url_for, flash, request, abort, current_app
+import time
+import click
+from flask import render_template, redirect, url_for, flash, request, abort, current_app, get_template_attribute
+from markupsafe import Markup
+from sqlalchemy.orm import defer, joinedload
 from flask_login import login_required, current_user
 from app.blueprints.news import news_bp
 from app.blueprints.news.forms import NewsForm, CategoryForm, SearchForm
 from app.models import NewsArticle, NewsCategory
-from app.extensions import db
+from app.extensions import db, image_processor, article_cache, related_index, trending, unique_readers, \
+    page_cache, view_counter, conditional_get, image_collector, upload_reconciler
 from app.decorators import admin_required, journalist_required
-from app.utils.image_handler import save_news_image, delete_news_image
+from app.utils.image_handler import save_news_image
+from app.utils.image_store import release_image
+from app.utils.search import search_articles, rebuild_index
+from app.utils.pagination import paginate_keyset, invalidate_count
+from app.utils.slugs import commit_with_unique_slug, find_redirect, drop_redirects
+from app.utils.unique_readers import reader_key
+from app.utils.http_cache import coarse_count
 
 
 @news_bp.route('/')
 def index():
     """News listing page with filtering and pagination"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     category_id = request.args.get('category', type=int)
     show_featured = request.args.get('featured', type=int)
 
-    # Base query: only published articles
-    query = NewsArticle.query.filter_by(is_published=True)
+    # Only published articles
+    filters = [NewsArticle.is_published == True]
 
     # Apply filters
     if category_id:
-        query = query.filter_by(category_id=category_id)
+        filters.append(NewsArticle.category_id == category_id)
     if show_featured:
-        query = query.filter_by(is_featured=True)
+        filters.append(NewsArticle.is_featured == True)
 
-    # Sort by publish date (newest first)
-    query = query.order_by(NewsArticle.publish_date.desc())
-
-    # Paginate
+    # Validator from the page's ids and edit times (an index seek) before the full listing is loaded.
+    # No Last-Modified: unpublishing or deleting a listed article would make the page look older
     per_page = current_app.config.get('ARTICLES_PER_PAGE', 12)
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    stamps = paginate_keyset(db.session.query(NewsArticle.id, NewsArticle.updated_at).filter(*filters),
+                             NewsArticle.LISTING_KEYS, cursor, per_page).items
+    categories = NewsCategory.query.all()
+    show_trending = not (cursor or category_id or show_featured)
+    not_modified = conditional_get.check(
+        request.query_string, stamps,
+        [(c.id, c.name, c.color) for c in categories],
+        [pk for _, pk in trending.ranking()] if show_trending else None
+    )
+    if not_modified:
+        return not_modified
+
+    # Paginate by publish date (newest first)
+    query = NewsArticle.listing_query().filter(*filters)
+    pagination = paginate_keyset(query, NewsArticle.LISTING_KEYS, cursor, per_page,
+                                 count=True, count_cache_key=f'news.index:{category_id}:{show_featured}')
 
     articles = pagination.items
-    categories = NewsCategory.query.all()
+
+    # Precomputed ranking, only on the unfiltered first page
+    trending_articles = trending.trending_articles() if show_trending else []
+
+    page_cache.tag(f'category:{category_id}' if category_id else 'listing')
 
     return render_template('news/index.html',
                            articles=articles,
                            pagination=pagination,
                            categories=categories,
+                           trending_articles=trending_articles,
                            selected_category=category_id,
                            show_featured=show_featured)
 
 
+def _shown_with(article):
+    """Category and author details on the article page; editing them doesn't touch updated_at"""
+    category = article.category
+    return category.id, category.name, category.color, category.description, article.author.display_name
+
+
 @news_bp.route('/article/<slug>')
 def article(slug):
     """Single article view"""
-    article = NewsArticle.query.filter_by(slug=slug).first_or_404()
+    # Content is only loaded if the rendered fragments aren't cached
+    article = NewsArticle.query.filter_by(slug=slug).options(
+        defer(NewsArticle.content), joinedload(NewsArticle.category), joinedload(NewsArticle.author)
+    ).first()
+    if article is None:
+        # Links to a slug from before the title changed
+        current_slug = find_redirect(NewsArticle, slug)
+        if current_slug is None:
+            abort(404)
+        return redirect(url_for('news.article', slug=current_slug), 301)
 
     # Only show published articles to non-admin users
     if not article.is_published and (not current_user.is_authenticated or not current_user.is_admin):
         abort(404)
 
-    # Increment view count
-    article.increment_views()
-
-    # Get related articles (same category, excluding current)
-    related_articles = NewsArticle.query.filter(
-        NewsArticle.category_id == article.category_id,
-        NewsArticle.id != article.id,
-        NewsArticle.is_published == True
-    ).order_by(NewsArticle.publish_date.desc()).limit(3).all()
+    # Increment view count and add the reader to the unique-reader sketches
+    article.increment_views(reader_key(current_user, request.remote_addr, request.user_agent.string))
+
+    # Precomputed content-similar articles (one indexed lookup); they change without updated_at
+    related_ids = related_index.related_ids(article)
+
+    # The author and admins see live reader estimates, so only readers get 304s. The ETag also
+    # covers the related articles, the category and author details and the view count (to one
+    # significant digit, or every view would change it); there is no Last-Modified since none of
+    # them moves updated_at
+    show_readers = current_user.is_authenticated and (current_user.is_admin or current_user.id == article.author_id)
+    if not show_readers:
+        not_modified = conditional_get.check(article.id, article.updated_at, related_ids, _shown_with(article),
+                                             coarse_count(article.total_views, digits=1))
+        if not_modified:
+            return not_modified
+
+    # Rendered body and related-articles block, cached per slug, revision, related articles
+    # and the category and author details the header and byline show
+    updated = article.updated_at.isoformat() if article.updated_at else ''
+    cache_key = f"{updated}:{','.join(map(str, related_ids))}:{_shown_with(article)}"
+    fragments = article_cache.get(slug, cache_key) if article.is_published else None
+    if fragments is None:
+        related_articles = related_index.related_for(article, related_ids)
+
+        template = 'news/_article_fragments.html'
+        fragments = {
+            'header': str(get_template_attribute(template, 'header')(article)),
+            'byline': str(get_template_attribute(template, 'byline')(article)),
+            'body': str(get_template_attribute(template, 'body')(article)),
+            'sidebar': str(get_template_attribute(template, 'sidebar')(article, related_articles))
+        }
+        if article.is_published:
+            article_cache.set(slug, cache_key, fragments)
+
+    if article.is_published:
+        page_cache.tag(f'article:{article.id}', f'category:{article.category_id}', article_id=article.id)
+
+    # Estimated unique readers, only shown to the author and admins
+    readers = unique_readers.estimate(article.id) if show_readers else None
 
     return render_template('news/article.html',
                            article=article,
-                           related_articles=related_articles)
+                           readers=readers,
+                           fragments={name: Markup(html) for name, html in fragments.items()})
+
+
+def _count_cached_view(endpoint, meta):
+    """Count views of article pages served from the page cache"""
+    article_id = meta.get('article_id')
+    if endpoint == 'news.article' and article_id:
+        unique_readers.record(article_id, reader_key(None, request.remote_addr, request.user_agent.string))
+        view_counter.record(article_id)
+
+
+page_cache.add_hit_listener(_count_cached_view)
 
 
 @news_bp.route('/search')
@@ -72,30 +159,34 @@ def search():
     form = SearchForm(request.args)
     query_text = request.args.get('query', '')
     category_id = request.args.get('category', type=int)
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
 
-    # Base query
-    query = NewsArticle.query.filter_by(is_published=True)
+    per_page = current_app.config.get('SEARCH_RESULTS_PER_PAGE', 20)
+    snippets = {}
 
-    # Apply search filter
-    if query_text:
-        search_filter = db.or_(
-            NewsArticle.title.ilike(f'%{query_text}%'),
-            NewsArticle.content.ilike(f'%{query_text}%'),
-            NewsArticle.summary.ilike(f'%{query_text}%')
-        )
-        query = query.filter(search_filter)
+    # Ranked full-text search when the index is available
+    results = search_articles(query_text, category_id, cursor, per_page) if query_text else None
 
-    # Apply category filter
-    if category_id:
-        query = query.filter_by(category_id=category_id)
+    if results:
+        pagination, snippets = results
+    else:
+        # Base query
+        query = NewsArticle.listing_query().filter_by(is_published=True)
 
-    # Sort by relevance (publish date for now)
-    query = query.order_by(NewsArticle.publish_date.desc())
+        # Fall back to a LIKE search if the full-text index isn't set up
+        if query_text:
+            search_filter = db.or_(
+                NewsArticle.title.ilike(f'%{query_text}%'),
+                NewsArticle.content.ilike(f'%{query_text}%'),
+                NewsArticle.summary.ilike(f'%{query_text}%')
+            )
+            query = query.filter(search_filter)
 
-    # Paginate
-    per_page = current_app.config.get('SEARCH_RESULTS_PER_PAGE', 20)
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Apply category filter
+        if category_id:
+            query = query.filter_by(category_id=category_id)
+
+        pagination = paginate_keyset(query, NewsArticle.LISTING_KEYS, cursor, per_page)
 
     articles = pagination.items
     categories = NewsCategory.query.all()
@@ -103,10 +194,13 @@ def search():
     # Populate form choices
     form.category.choices = [(0, 'All Categories')] + [(c.id, c.name) for c in categories]
 
+    page_cache.tag('listing')
+
     return render_template('news/search.html',
                            form=form,
                            articles=articles,
                            pagination=pagination,
+                           snippets=snippets,
                            query_text=query_text,
                            category_id=category_id)
 
@@ -135,16 +229,27 @@ def create():
         # Generate slug
         article.generate_slug()
 
-        # Handle image upload
+        # Handle image upload (processed in the background after commit)
+        new_image = None
         if form.image.data:
-            filename = save_news_image(form.image.data)
-            if filename:
-                article.image_filename = filename
+            new_image = save_news_image(form.image.data)
+            if new_image:
+                article.image_filename = new_image
+                article.image_pending = True
             else:
                 flash('Failed to upload image. Please try again with a different image.', 'warning')
 
         db.session.add(article)
-        db.session.commit()
+        commit_with_unique_slug(article, article.title)
+        invalidate_count('news.index')
+
+        if new_image:
+            image_processor.submit(new_image)
+        related_index.refresh(article.id)
+
+        # Related-article sidebars of other articles may now include this one
+        article_cache.clear()
+        page_cache.invalidate('listing', f'category:{article.category_id}')
 
         flash('Article created successfully!', 'success')
         return redirect(url_for('news.article', slug=article.slug))
@@ -164,6 +269,7 @@ def edit(article_id):
     form.category.choices = [(c.id, c.name) for c in categories]
 
     if form.validate_on_submit():
+        old_category_id = article.category_id
         article.title = form.title.data
         article.summary = form.summary.data
         article.content = form.content.data
@@ -171,23 +277,38 @@ def edit(article_id):
         article.is_featured = form.is_featured.data
         article.category_id = form.category.data
 
-        # Regenerate slug if title changed
+        # New slug only if the title changed it (the old one redirects)
         article.generate_slug()
 
         # Handle image upload (replace existing)
+        old_image = new_image = None
         if form.image.data:
-            # Delete old image if it exists
-            if article.image_filename:
-                delete_news_image(article.image_filename)
-
             # Save new image
             filename = save_news_image(form.image.data)
             if filename:
+                old_image = article.image_filename
+                new_image = filename
                 article.image_filename = filename
+                article.image_pending = True
+                article.image_variants = None
             else:
                 flash('Failed to upload new image. Keeping the existing image.', 'warning')
 
-        db.session.commit()
+        commit_with_unique_slug(article, article.title)
+        invalidate_count('news.index')
+
+        if new_image:
+            # Give up the replaced image only once the new one is committed; the
+            # collector removes its files when no other article uses it
+            if old_image and release_image(old_image):
+                db.session.commit()
+            image_processor.submit(new_image)
+        related_index.refresh(article.id)
+
+        # Drop this article's fragments and the sidebars that may list it
+        article_cache.clear()
+        page_cache.invalidate('listing', f'article:{article.id}',
+                              f'category:{old_category_id}', f'category:{article.category_id}')
 
         flash('Article updated successfully!', 'success')
         return redirect(url_for('news.article', slug=article.slug))
@@ -210,12 +331,18 @@ def delete(article_id):
     """Delete article (journalists and officials only)"""
     article = NewsArticle.query.get_or_404(article_id)
 
-    # Delete associated image
-    if article.image_filename:
-        delete_news_image(article.image_filename)
+    # Drop the article's image reference in the same transaction (files are collected later)
+    release_image(article.image_filename)
+    # Its old slugs no longer redirect anywhere and would keep blocking new ones
+    drop_redirects(article)
 
+    category_id = article.category_id
     db.session.delete(article)
     db.session.commit()
+    invalidate_count('news.index')
+    related_index.refresh(article_id)
+    article_cache.clear()
+    page_cache.invalidate('listing', f'article:{article_id}', f'category:{category_id}')
 
     flash('Article deleted successfully.', 'success')
     return redirect(url_for('news.index'))
@@ -244,7 +371,8 @@ def create_category():
         category.generate_slug()
 
         db.session.add(category)
-        db.session.commit()
+        commit_with_unique_slug(category, category.name)
+        page_cache.clear()
 
         flash('Category created successfully!', 'success')
     else:
@@ -268,7 +396,10 @@ def edit_category(category_id):
         category.color = form.color.data
         category.generate_slug()
 
-        db.session.commit()
+        commit_with_unique_slug(category, category.name)
+        # Category names and colours appear on listings and article pages
+        article_cache.clear()
+        page_cache.clear()
 
         flash('Category updated successfully!', 'success')
     else:
@@ -290,8 +421,57 @@ def delete_category(category_id):
         flash('Cannot delete category with existing articles. Please reassign or delete the articles first.', 'danger')
         return redirect(url_for('news.categories'))
 
+    drop_redirects(category)
     db.session.delete(category)
     db.session.commit()
+    article_cache.clear()
+    page_cache.clear()
 
     flash('Category deleted successfully.', 'success')
     return redirect(url_for('news.categories'))
+
+
+@news_bp.cli.command('reindex')
+def reindex():
+    """Rebuild the full-text search index"""
+    with db.engine.begin() as connection:
+        count = rebuild_index(connection)
+    print(f"Indexed {count} articles.")
+
+
+@news_bp.cli.command('gc-images')
+@click.option('--grace', type=int, default=None, help='Seconds an image must have been unused (default IMAGE_GC_GRACE)')
+def gc_images(grace):
+    """Remove the files of images no article uses any more"""
+    collected, freed = image_collector.collect(grace=grace, limit=None)
+    print(f"Removed {collected} unused images ({freed / 1024:.0f} KB).")
+
+
+@news_bp.cli.command('reconcile-uploads')
+@click.option('--grace', type=int, default=None, help='Seconds before quarantining and deleting (default UPLOAD_RECONCILE_GRACE)')
+@click.option('--dry-run', is_flag=True, help='Only report orphaned and missing files')
+@click.option('--verbose', '-v', is_flag=True, help='List every orphaned file')
+def reconcile_uploads(grace, dry_run, verbose):
+    """Quarantine and delete uploaded files no article uses, and list missing ones"""
+    report = upload_reconciler.reconcile(
+        grace=grace, dry_run=dry_run,
+        on_orphan=(lambda path: print(f"  orphan   {path}")) if verbose else None,
+        on_missing=lambda article_id, filename: print(f"  missing  {filename} (article {article_id})")
+    )
+    action = 'would be quarantined' if dry_run else 'quarantined'
+    print(f"Checked {report['scanned']} files: {report['quarantined']} {action}, "
+          f"{report['deleted']} deleted ({report['freed_bytes'] / 1024:.0f} KB), "
+          f"{report['restored']} restored, {report['missing']} missing.")
+
+
+@news_bp.cli.command('rebuild-related')
+def rebuild_related():
+    """Recompute the related-articles index"""
+    if not related_index.available():
+        print("NumPy and SciPy are required to build the related-articles index.")
+        return
+    started = time.perf_counter()
+    articles, rows = related_index.rebuild(
+        report=lambda phase, seconds: print(f"  {phase:<10} {seconds * 1000:8.1f} ms")
+    )
+    print(f"Indexed {articles} articles ({rows} neighbours) in {time.perf_counter() - started:.2f}s.")
@@ -2,8 +2,38 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
+from portal_common.instrumentation import Instrumentation
+from portal_common.user_cache import UserCache
+from portal_common.password_policy import PasswordHasher
+from portal_common.login_throttle import LoginThrottle
+from app.utils.view_counter import ViewCounter
+from app.utils.image_handler import ImageProcessor
+from app.utils.fragment_cache import FragmentCache
+from app.utils.related import RelatedIndex
+from app.utils.trending import TrendingTracker
+from app.utils.unique_readers import UniqueReaders
+from app.utils.page_cache import PageCache
+from app.utils.http_cache import ConditionalGet
+from app.utils.image_cache import DerivativeCache
+from app.utils.image_store import ImageCollector
+from app.utils.upload_reconciler import UploadReconciler
 
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
+view_counter = ViewCounter()
+image_processor = ImageProcessor()
+article_cache = FragmentCache(config_prefix='ARTICLE_CACHE')
+instrumentation = Instrumentation()
+user_cache = UserCache()
+password_hasher = PasswordHasher()
+login_throttle = LoginThrottle()
+related_index = RelatedIndex()
+trending = TrendingTracker()
+unique_readers = UniqueReaders()
+page_cache = PageCache()
+conditional_get = ConditionalGet()
+image_cache = DerivativeCache()
+image_collector = ImageCollector()
+upload_reconciler = UploadReconciler()
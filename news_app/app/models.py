@@ -1,8 +1,12 @@
+import json
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from app.extensions import db
-import re
+from sqlalchemy import event, case, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, object_session
+from app.extensions import db, view_counter, user_cache, password_hasher, unique_readers, image_cache
+from app.utils.image_handler import variant_filename
+from app.utils.slugs import assign_slug
 
 
 class User(db.Model, UserMixin):
@@ -18,7 +22,7 @@ class User(db.Model, UserMixin):
     citizen_id = db.Column(db.String(20), unique=True, nullable=True, index=True)  # e.g., "FSC-2026-001"
     full_name = db.Column(db.String(100), nullable=True)
     citizen_rank = db.Column(db.String(20), default='Citizen')  # Citizen, Official, Minister, President
-    desired_jobs = db.Column(db.Text, nullable=True)  # JSON array of up to 3 desired professions
+    unread_messages_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     is_admin = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
@@ -27,14 +31,15 @@ class User(db.Model, UserMixin):
 
     # Relationships
     news_articles = db.relationship('NewsArticle', backref='author', lazy='dynamic', cascade='all, delete-orphan')
+    jobs = db.relationship('UserJob', backref='user', cascade='all, delete-orphan', order_by='UserJob.id')
 
     def set_password(self, password):
         """Hash and set the password"""
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
         """Check if the provided password matches the hash"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -55,12 +60,14 @@ class User(db.Model, UserMixin):
         }
 
     def generate_citizen_id(self):
-        """Generate a unique citizen ID for Fiascha"""
-        import random
-        year = datetime.utcnow().year
-        # Generate ID like FSC-2026-001
-        count = User.query.count() + 1
-        self.citizen_id = f"FSC-{year}-{count:03d}"
+        """Assign the next unique citizen ID for Fiascha (e.g. FSC-2026-001)"""
+        self.citizen_id = CitizenIdCounter.allocate()[0]
+
+    @staticmethod
+    def assign_citizen_ids(users):
+        """Assign citizen IDs to many users from one reserved block"""
+        for user, citizen_id in zip(users, CitizenIdCounter.allocate(len(users))):
+            user.citizen_id = citizen_id
 
     @property
     def display_name(self):
@@ -69,53 +76,183 @@ class User(db.Model, UserMixin):
 
     def get_desired_jobs(self):
         """Get list of desired jobs"""
-        import json
-        if self.desired_jobs:
-            try:
-                return json.loads(self.desired_jobs)
-            except:
-                return []
-        return []
+        return [job.job_title for job in self.jobs]
 
     def set_desired_jobs(self, jobs_list):
         """Set desired jobs (max 3)"""
-        import json
-        if len(jobs_list) > 3:
-            jobs_list = jobs_list[:3]
-        self.desired_jobs = json.dumps(jobs_list)
+        jobs_list = list(dict.fromkeys(jobs_list))[:3]
+        # Keep the rows of jobs that stay: replacing them would INSERT the new row
+        # before the old one is DELETEd and break the (user_id, job_title) constraint
+        for selection in [selection for selection in self.jobs if selection.job_title not in jobs_list]:
+            self.jobs.remove(selection)
+        kept = {selection.job_title for selection in self.jobs}
+        for job in jobs_list:
+            if job not in kept:
+                self.jobs.append(UserJob(job_title=job))
 
     def add_desired_job(self, job):
         """Add a desired job (max 3)"""
         jobs = self.get_desired_jobs()
         if job not in jobs and len(jobs) < 3:
-            jobs.append(job)
-            self.set_desired_jobs(jobs)
+            self.jobs.append(UserJob(job_title=job))
             return True
         return False
 
     def remove_desired_job(self, job):
         """Remove a desired job"""
-        jobs = self.get_desired_jobs()
-        if job in jobs:
-            jobs.remove(job)
-            self.set_desired_jobs(jobs)
-            return True
+        for selection in self.jobs:
+            if selection.job_title == job:
+                self.jobs.remove(selection)
+                return True
         return False
 
     def toggle_desired_job(self, job):
         """Toggle a desired job selection"""
-        jobs = self.get_desired_jobs()
-        if job in jobs:
-            jobs.remove(job)
-            self.set_desired_jobs(jobs)
+        if self.remove_desired_job(job):
             return False
-        elif len(jobs) < 3:
-            jobs.append(job)
-            self.set_desired_jobs(jobs)
+        if self.add_desired_job(job):
             return True
         return None  # Max limit reached
 
 
+class UserJob(db.Model):
+    """A job held by a citizen (up to 3 per user)"""
+    __tablename__ = 'user_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    job_title = db.Column(db.String(50), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'job_title', name='unique_job_per_user'),)
+
+    def __repr__(self):
+        return f'<UserJob {self.user_id} - {self.job_title}>'
+
+    @staticmethod
+    def job_counts(jobs=None):
+        """
+        Count how many users hold each job in a single grouped query
+
+        Args:
+            jobs: Optional list of job titles to report (missing ones count as 0)
+
+        Returns:
+            dict: job title -> number of users
+        """
+        rows = db.session.query(UserJob.job_title, db.func.count(UserJob.id)) \
+            .group_by(UserJob.job_title).all()
+        counts = dict(rows)
+        if jobs is None:
+            return counts
+        return {job: counts.get(job, 0) for job in jobs}
+
+
+# Per-year citizen ID sequences known to exist (PostgreSQL only)
+_known_sequences = set()
+
+
+class CitizenIdCounter(db.Model):
+    """Last citizen ID number handed out per year (used when there are no database sequences)"""
+    __tablename__ = 'citizen_id_counters'
+
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CitizenIdCounter {self.year}: {self.last_value}>'
+
+    @staticmethod
+    def format(year, number):
+        return f"FSC-{year}-{number:03d}"
+
+    @staticmethod
+    def allocate(count=1, year=None):
+        """
+        Reserve a block of citizen IDs
+
+        Uses a per-year sequence on PostgreSQL (never blocks, numbers of rolled
+        back registrations are skipped) and a per-year counter row elsewhere
+        (locked until the current transaction commits).
+
+        Args:
+            count: Number of IDs to reserve
+            year: Year to allocate in, defaults to the current year
+
+        Returns:
+            list: Formatted citizen IDs in ascending order
+        """
+        year = year or datetime.utcnow().year
+        if db.session.get_bind().dialect.name == 'postgresql':
+            numbers = CitizenIdCounter._allocate_from_sequence(year, count)
+        else:
+            numbers = CitizenIdCounter._allocate_from_table(year, count)
+        return [CitizenIdCounter.format(year, number) for number in numbers]
+
+    @staticmethod
+    def reset():
+        """Restart numbering at 1 for every year (after the users were deleted, e.g. when seeding)"""
+        CitizenIdCounter.query.delete()
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Restarted rather than dropped, so other processes' _known_sequences stay valid
+            sequences = db.session.execute(db.text(
+                "SELECT sequence_name FROM information_schema.sequences "
+                "WHERE sequence_schema = current_schema() AND sequence_name LIKE 'citizen\\_id\\_seq\\_%'"
+            )).scalars().all()
+            for sequence in sequences:
+                db.session.execute(db.text(f'ALTER SEQUENCE "{sequence}" RESTART WITH 1'))
+
+    @staticmethod
+    def _highest_existing(year):
+        # One-off scan when a year's counter is first created, so numbering
+        # continues after IDs issued before the counter existed
+        prefix = f"FSC-{year}-"
+        highest = 0
+        for (citizen_id,) in db.session.query(User.citizen_id).filter(User.citizen_id.like(prefix + '%')):
+            suffix = citizen_id[len(prefix):]
+            if suffix.isdigit():
+                highest = max(highest, int(suffix))
+        return highest
+
+    @staticmethod
+    def _allocate_from_table(year, count):
+        counters = CitizenIdCounter.__table__
+        for _ in range(3):
+            updated = db.session.execute(
+                counters.update().where(counters.c.year == year)
+                .values(last_value=counters.c.last_value + count)
+            )
+            if updated.rowcount:
+                last = db.session.execute(
+                    db.select(counters.c.last_value).where(counters.c.year == year)
+                ).scalar_one()
+                return range(last - count + 1, last + 1)
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(counters.insert().values(
+                        year=year, last_value=CitizenIdCounter._highest_existing(year)
+                    ))
+            except IntegrityError:
+                # Another registration created the row first; use it
+                pass
+        raise RuntimeError(f"Could not allocate citizen IDs for {year}")
+
+    @staticmethod
+    def _allocate_from_sequence(year, count):
+        sequence = f"citizen_id_seq_{int(year)}"
+        if sequence not in _known_sequences:
+            if db.session.execute(db.text("SELECT to_regclass(:name)"), {'name': sequence}).scalar() is None:
+                start = CitizenIdCounter._highest_existing(year) + 1
+                db.session.execute(db.text(f"CREATE SEQUENCE IF NOT EXISTS {sequence} START WITH {start}"))
+            else:
+                # Only remember committed sequences; a new one vanishes if this transaction rolls back
+                _known_sequences.add(sequence)
+        numbers = db.session.execute(
+            db.text(f"SELECT nextval('{sequence}') FROM generate_series(1, :count)"), {'count': count}
+        ).scalars().all()
+        return sorted(numbers)
+
+
 class JobApplication(db.Model):
     """Job application requests from citizens"""
     __tablename__ = 'job_applications'
@@ -130,6 +267,10 @@ class JobApplication(db.Model):
     reviewed_at = db.Column(db.DateTime, nullable=True)
     reviewed_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_job_applications_status_created_at', 'status', 'created_at'),
+    )
+
     # Relationships
     applicant = db.relationship('User', foreign_keys=[user_id], backref='job_applications')
     reviewer = db.relationship('User', foreign_keys=[reviewed_by])
@@ -137,6 +278,11 @@ class JobApplication(db.Model):
     def __repr__(self):
         return f'<JobApplication {self.applicant.username} - {self.job_title}>'
 
+    @classmethod
+    def queue_query(cls):
+        """Applications with applicant and reviewer loaded in the same query"""
+        return cls.query.options(joinedload(cls.applicant), joinedload(cls.reviewer))
+
     def approve(self, admin_user, response=None):
         """Approve the job application"""
         self.status = 'approved'
@@ -171,9 +317,24 @@ class Message(db.Model):
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
     recipient = db.relationship('User', foreign_keys=[recipient_id], backref='received_messages')
 
+    __table_args__ = (
+        db.Index('ix_messages_recipient_is_read', 'recipient_id', 'is_read'),
+        db.Index('ix_messages_recipient_created_at', 'recipient_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Message from {self.sender.username} to {self.recipient.username}>'
 
+    @classmethod
+    def inbox_query(cls, user_id):
+        """Messages received by a user, with senders loaded in the same query"""
+        return cls.query.filter_by(recipient_id=user_id).options(joinedload(cls.sender))
+
+    @classmethod
+    def sent_query(cls, user_id):
+        """Messages sent by a user, with recipients loaded in the same query"""
+        return cls.query.filter_by(sender_id=user_id).options(joinedload(cls.recipient))
+
     def mark_as_read(self):
         """Mark message as read"""
         if not self.is_read:
@@ -181,6 +342,118 @@ class Message(db.Model):
             self.read_at = datetime.utcnow()
 
 
+def _adjust_unread_count(connection, user_id, delta, session=None):
+    """Atomically adjust a user's unread counter, never going below zero"""
+    users = User.__table__
+    if delta > 0:
+        value = users.c.unread_messages_count + delta
+    else:
+        value = case(
+            (users.c.unread_messages_count + delta > 0, users.c.unread_messages_count + delta),
+            else_=0
+        )
+    connection.execute(users.update().where(users.c.id == user_id).values(unread_messages_count=value))
+    # Core UPDATE bypasses the User mapper events, so drop the cached snapshot here
+    user_cache.invalidate(user_id, session)
+
+
+@event.listens_for(Message, 'after_insert')
+def _message_inserted(mapper, connection, target):
+    if not target.is_read:
+        _adjust_unread_count(connection, target.recipient_id, 1, object_session(target))
+
+
+@event.listens_for(Message, 'after_update')
+def _message_updated(mapper, connection, target):
+    history = inspect(target).attrs.is_read.history
+    if not history.has_changes():
+        return
+    was_read = bool(history.deleted[0]) if history.deleted else False
+    if was_read != bool(target.is_read):
+        _adjust_unread_count(connection, target.recipient_id, -1 if target.is_read else 1, object_session(target))
+
+
+@event.listens_for(Message, 'after_delete')
+def _message_deleted(mapper, connection, target):
+    if not target.is_read:
+        _adjust_unread_count(connection, target.recipient_id, -1, object_session(target))
+
+
+class RelatedArticle(db.Model):
+    """Precomputed content-similar articles, see app/utils/related.py"""
+    __tablename__ = 'related_articles'
+
+    article_id = db.Column(db.Integer, db.ForeignKey('news_articles.id', ondelete='CASCADE'), primary_key=True)
+    related_id = db.Column(db.Integer, db.ForeignKey('news_articles.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_related_articles_lookup', 'article_id', 'rank'),
+        db.Index('ix_related_articles_related', 'related_id'),
+    )
+
+    def __repr__(self):
+        return f'<RelatedArticle {self.article_id} -> {self.related_id} ({self.score:.2f})>'
+
+
+class ArticleViewBucket(db.Model):
+    """One hour of an article's views in a ring of TRENDING_WINDOW_HOURS slots, see app/utils/trending.py"""
+    __tablename__ = 'article_view_buckets'
+
+    article_id = db.Column(db.Integer, db.ForeignKey('news_articles.id', ondelete='CASCADE'), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hour = db.Column(db.Integer, nullable=False, index=True)  # Hours since the epoch
+    views = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ArticleViewBucket {self.article_id}@{self.hour}: {self.views}>'
+
+
+class ArticleReaderSketch(db.Model):
+    """HyperLogLog registers of an article's readers for one UTC day or all time, see app/utils/unique_readers.py"""
+    __tablename__ = 'article_reader_sketches'
+
+    article_id = db.Column(db.Integer, db.ForeignKey('news_articles.id', ondelete='CASCADE'), primary_key=True)
+    period = db.Column(db.String(10), primary_key=True)  # 'YYYY-MM-DD' or 'all'
+    registers = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<ArticleReaderSketch {self.article_id}@{self.period}>'
+
+
+class ImageBlob(db.Model):
+    """Number of articles using a stored news image, see app/utils/image_store.py"""
+    __tablename__ = 'image_blobs'
+
+    filename = db.Column(db.String(255), primary_key=True)  # Content hash name (older uploads keep theirs)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    released_at = db.Column(db.DateTime, index=True)  # When the last reference was dropped
+
+    def __repr__(self):
+        return f'<ImageBlob {self.filename}: {self.refcount}>'
+
+
+class SlugRedirect(db.Model):
+    """Former slug of an article or category, kept so old links redirect"""
+    __tablename__ = 'slug_redirects'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # Table name of the target
+    old_slug = db.Column(db.String(200), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'old_slug', name='unique_old_slug_per_kind'),
+        db.Index('ix_slug_redirects_target', 'kind', 'target_id'),
+    )
+
+    def __repr__(self):
+        return f'<SlugRedirect {self.kind}:{self.old_slug} -> {self.target_id}>'
+
+
 class NewsCategory(db.Model):
     """Category model for organizing news articles"""
     __tablename__ = 'news_categories'
@@ -196,11 +469,8 @@ class NewsCategory(db.Model):
     articles = db.relationship('NewsArticle', backref='category', lazy='dynamic')
 
     def generate_slug(self):
-        """Generate slug from name"""
-        slug = re.sub(r'[^\w\s-]', '', self.name.lower())
-        slug = re.sub(r'[\s_-]+', '-', slug)
-        slug = re.sub(r'^-+|-+$', '', slug)
-        self.slug = slug
+        """Generate a unique slug from the name (kept if the name still gives the same slug)"""
+        assign_slug(self, self.name)
 
     def __repr__(self):
         return f'<NewsCategory {self.name}>'
@@ -228,6 +498,8 @@ class NewsArticle(db.Model):
     summary = db.Column(db.String(500))  # Short description
     content = db.Column(db.Text, nullable=False)
     image_filename = db.Column(db.String(255))  # Stored image filename
+    image_pending = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    image_variants = db.Column(db.Text)  # JSON list of generated variant widths
 
     # Publishing
     is_published = db.Column(db.Boolean, default=False, index=True)
@@ -243,33 +515,79 @@ class NewsArticle(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('news_categories.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_news_articles_listing', 'is_published', 'publish_date', 'id'),
+    )
+
+    # Keyset pagination order for listings: newest first, id breaks ties
+    LISTING_KEYS = [(publish_date, True), (id, True)]
+
     def generate_slug(self):
-        """Generate slug from title"""
-        slug = re.sub(r'[^\w\s-]', '', self.title.lower())
-        slug = re.sub(r'[\s_-]+', '-', slug)
-        slug = re.sub(r'^-+|-+$', '', slug)
+        """Generate a unique slug from the title (kept if the title still gives the same slug)"""
+        assign_slug(self, self.title)
 
-        # Ensure uniqueness
-        base_slug = slug
-        counter = 1
-        while NewsArticle.query.filter_by(slug=slug).first():
-            slug = f"{base_slug}-{counter}"
-            counter += 1
+    @classmethod
+    def listing_query(cls):
+        """Articles with category and author loaded in the same query, for list pages"""
+        return cls.query.options(joinedload(cls.category), joinedload(cls.author))
 
-        self.slug = slug
+    def increment_views(self, reader=None):
+        """Record a view; the count is written in batches by the view counter"""
+        if reader is not None:
+            unique_readers.record(self.id, reader)
+        view_counter.record(self.id)
 
-    def increment_views(self):
-        """Increment article view count"""
-        self.views += 1
-        db.session.commit()
+    @property
+    def total_views(self):
+        """Stored view count plus views still waiting to be flushed"""
+        return (self.views or 0) + view_counter.pending_for(self.id)
 
     @property
     def image_url(self):
-        """Generate full image path"""
+        """Generate full image path (a placeholder while the upload is processed)"""
         if self.image_filename:
+            if self.image_pending:
+                return '/static/img/image-processing.svg'
             return f'/static/uploads/news/{self.image_filename}'
         return None
 
+    def thumbnail_url(self, width, height, ext=None):
+        """Cropped derivative from /img/<width>x<height>/ (the full image while processing or for other sizes)"""
+        if not self.image_filename or self.image_pending or (width, height) not in image_cache.sizes:
+            return self.image_url
+        filename = variant_filename(self.image_filename, ext=ext) if ext else self.image_filename
+        return f'/img/{width}x{height}/{filename}'
+
+    def get_image_variants(self):
+        """Generated image sizes as {'full': width, 'widths': [variant widths]}"""
+        if self.image_variants and not self.image_pending:
+            try:
+                return json.loads(self.image_variants)
+            except ValueError:
+                pass
+        return None
+
+    def _srcset(self, ext=None):
+        variants = self.get_image_variants()
+        if not variants:
+            return None
+        entries = [
+            f'/static/uploads/news/{variant_filename(self.image_filename, width, ext)} {width}w'
+            for width in variants['widths']
+        ]
+        entries.append(f'/static/uploads/news/{variant_filename(self.image_filename, ext=ext)} {variants["full"]}w')
+        return ', '.join(entries)
+
+    @property
+    def image_srcset(self):
+        """srcset of the resized images in the upload's format"""
+        return self._srcset()
+
+    @property
+    def image_webp_srcset(self):
+        """srcset of the WebP versions"""
+        return self._srcset('webp')
+
     @property
     def formatted_publish_date(self):
         """Format publish date for display"""
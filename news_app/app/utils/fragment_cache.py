@@ -0,0 +1,138 @@
+"""
+Rendered HTML fragment cache
+
+Entries live in a per-process LRU. When ARTICLE_CACHE_DIR is set, entries are
+also written to that directory so every gunicorn worker shares them. Entries
+expire after a TTL and can be dropped per group (e.g. an article slug) or all
+at once.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """LRU cache of rendered fragments with an optional shared on-disk backend"""
+
+    def __init__(self, app=None, config_prefix='ARTICLE_CACHE'):
+        self.config_prefix = config_prefix
+        self.max_entries = 256
+        self.ttl = 300
+        self.directory = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        prefix = self.config_prefix
+        self.max_entries = app.config.get(f'{prefix}_SIZE', 256)
+        self.ttl = app.config.get(f'{prefix}_TTL', 300)
+        self.directory = app.config.get(f'{prefix}_DIR')
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        app.extensions[prefix.lower()] = self
+
+    @staticmethod
+    def _digest(value):
+        return hashlib.sha1(str(value).encode()).hexdigest()
+
+    def _path(self, group, key):
+        # Group digest first so a whole group can be removed by filename prefix
+        return os.path.join(self.directory, f'{self._digest(group)}-{self._digest(key)}.json')
+
+    def get(self, group, key):
+        """Return the cached value for (group, key), or None"""
+        if not self.max_entries:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((group, key))
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end((group, key))
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[(group, key)]
+
+        value = self._read_disk(group, key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is not None:
+            self._store(group, key, value[1], value[0])
+            return value[1]
+        return None
+
+    def set(self, group, key, value):
+        """Cache a JSON-serialisable value under (group, key)"""
+        if not self.max_entries:
+            return
+        expires = time.time() + self.ttl
+        self._store(group, key, value, expires)
+        if self.directory:
+            path = self._path(group, key)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'expires': expires, 'value': value}, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+
+    def invalidate(self, group):
+        """Drop every entry in a group"""
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == group]:
+                del self._entries[cache_key]
+        if self.directory:
+            self._remove_files(f'{self._digest(group)}-')
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+        if self.directory:
+            self._remove_files('')
+
+    def stats(self):
+        """Cache metrics for monitoring"""
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def _store(self, group, key, value, expires):
+        with self._lock:
+            self._entries[(group, key)] = (expires, value)
+            self._entries.move_to_end((group, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, group, key, now):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(group, key), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('expires', 0) <= now:
+            return None
+        return data['expires'], data['value']
+
+    def _remove_files(self, prefix):
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith(prefix) and entry.name.endswith('.json'):
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+        except OSError:
+            pass
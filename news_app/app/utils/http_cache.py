@@ -0,0 +1,112 @@
+"""
+Conditional GET support
+
+Views compute an ETag and Last-Modified from cheap data (an article's
+``updated_at``, the ids and ``updated_at`` of a listing page) and call
+``conditional_get.check()`` before rendering. A matching If-None-Match or
+If-Modified-Since gets a 304 straight away. Otherwise the validators are
+added to the rendered response in an after_request hook.
+
+Uploaded news images keep the ETag/Last-Modified that Flask's static
+handler derives from the file's mtime and size. Their names are content
+hashes (see content_filename) and never rewritten, so they are also sent
+as immutable with a one year max-age.
+"""
+import hashlib
+import re
+from datetime import timezone
+from flask import g, request, session, Response
+from flask_login import current_user
+
+# Content hash names (and older generate_unique_filename names) with their _w<width> variants
+UPLOAD_NAME_RE = re.compile(r'^([0-9a-f]{32}|\d{8}_\d{6}_[0-9a-f]{8})(_w\d+)?\.(jpe?g|png|gif|webp)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def make_etag(*parts):
+    """Hash of the parts a response depends on"""
+    return hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def http_datetime(value):
+    """Naive UTC datetime from the database as an aware, whole-second datetime"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def coarse_count(value, digits=2):
+    """A counter rounded to ``digits`` significant digits, for validators of pages that show it"""
+    value = int(value or 0)
+    if value < 10 ** digits:
+        return value
+    scale = 10 ** (len(str(value)) - digits)
+    return value // scale * scale
+
+
+def viewer_key():
+    """Part of the ETag for whatever differs between visitors (navbar, admin controls)"""
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    return f'{current_user.id}:{int(bool(current_user.is_admin))}:{current_user.unread_messages_count or 0}'
+
+
+class ConditionalGet:
+    """Flask extension answering conditional requests before views do heavy work"""
+
+    def __init__(self, app=None):
+        self.upload_prefix = '/static/uploads/news/'
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the after_request hook (register after page_cache so it runs first)"""
+        app.extensions['conditional_get'] = self
+        app.after_request(self._add_headers)
+
+    def check(self, *etag_parts, last_modified=None):
+        """
+        Answer a conditional request for a response built from ``etag_parts``
+
+        Returns:
+            A 304 response if the client's copy is current, else None (the
+            validators are then added to the view's response)
+        """
+        if '_flashes' in session:
+            # The page will show one-off messages, so it must be rendered
+            return None
+        etag = make_etag(request.path, *etag_parts, viewer_key())
+        last_modified = http_datetime(last_modified)
+        g._conditional_validators = (etag, last_modified)
+
+        response = Response()
+        self._apply(response, etag, last_modified)
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+        return None
+
+    def _apply(self, response, etag, last_modified):
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # Clients revalidate every time; the page cache widens this for anonymous pages
+        response.cache_control.no_cache = True
+        if current_user.is_authenticated:
+            response.cache_control.private = True
+        else:
+            response.cache_control.public = True
+
+    def _add_headers(self, response):
+        validators = g.pop('_conditional_validators', None)
+        if validators is not None and response.status_code == 200:
+            self._apply(response, *validators)
+        elif request.path.startswith(self.upload_prefix) and response.status_code in (200, 206, 304) \
+                and UPLOAD_NAME_RE.match(request.path[len(self.upload_prefix):]):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
@@ -0,0 +1,253 @@
+"""
+On-demand image derivatives
+
+``/img/<width>x<height>/<filename>`` serves a processed news image cropped
+to one of the IMAGE_DERIVATIVE_SIZES (card thumbnails, related-article
+tiles), so list pages don't download the full 1200x800 image. Each
+derivative is made with Pillow on its first request and kept in
+IMAGE_CACHE_DIR (the instance folder by default); later requests are a
+stat and a ``send_file``, which the WSGI server can hand to sendfile().
+
+Concurrent first requests for the same derivative wait on a per-key lock
+(a thread lock, plus a striped file lock shared by worker processes), so
+it is only generated once. The directory is kept under
+IMAGE_CACHE_MAX_BYTES by deleting the least recently used files; a hit
+refreshes a file's mtime at most every TOUCH_INTERVAL seconds.
+"""
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from flask import abort, current_app, send_file
+from PIL import Image, ImageOps
+from werkzeug.utils import secure_filename
+from app.utils.http_cache import UPLOAD_NAME_RE, IMMUTABLE_MAX_AGE
+
+try:
+    import fcntl
+except ImportError:  # Windows: thread locks only
+    fcntl = None
+
+FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'gif': 'GIF', 'webp': 'WEBP'}
+MIMETYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'GIF': 'image/gif', 'WEBP': 'image/webp'}
+SAVE_OPTIONS = {'JPEG': {'quality': 82, 'optimize': True}, 'WEBP': {'quality': 78, 'method': 4}}
+LOCK_STRIPES = 64
+TOUCH_INTERVAL = 300
+RESCAN_INTERVAL = 300
+
+
+class DerivativeCache:
+    """Flask extension serving resized images from a size-bounded disk cache"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.sizes = frozenset()
+        self.directory = None
+        self.max_bytes = 512 * 1024 * 1024
+        self._size = None
+        self._scanned = 0
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self.hits = 0
+        self.generated = 0
+        self.evicted = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read IMAGE_DERIVATIVE_SIZES / IMAGE_CACHE_* and register the /img route"""
+        self.app = app
+        self.sizes = frozenset(tuple(size) for size in app.config.get('IMAGE_DERIVATIVE_SIZES', ()))
+        self.directory = app.config.get('IMAGE_CACHE_DIR') or os.path.join(app.instance_path, 'image_cache')
+        self.max_bytes = app.config.get('IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+        os.makedirs(os.path.join(self.directory, '.locks'), exist_ok=True)
+        app.extensions['image_cache'] = self
+        app.add_url_rule('/img/<int:width>x<int:height>/<filename>', 'image_derivative', self.serve)
+
+    def serve(self, width, height, filename):
+        """View for /img/<width>x<height>/<filename>"""
+        if (width, height) not in self.sizes or secure_filename(filename) != filename:
+            abort(404)
+        image_format = FORMATS.get(filename.rsplit('.', 1)[-1].lower())
+        if image_format is None:
+            abort(404)
+        # Upload names are unique and never rewritten, so neither are their derivatives
+        immutable = UPLOAD_NAME_RE.match(filename) is not None
+        for attempt in range(2):
+            path = self.get(width, height, filename, image_format)
+            if path is None:
+                abort(404)
+            try:
+                response = send_file(path, mimetype=MIMETYPES[image_format], conditional=True,
+                                     max_age=IMMUTABLE_MAX_AGE if immutable else None)
+                break
+            except FileNotFoundError:
+                # Evicted by another worker between the lookup and the send
+                if attempt:
+                    raise
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        return response
+
+    def path_for(self, width, height, filename):
+        return os.path.join(self.directory, f'{width}x{height}_{filename}')
+
+    def get(self, width, height, filename, image_format):
+        """
+        Path of a derivative, generating it on first use
+
+        Returns:
+            str, or None if the source image doesn't exist or can't be decoded
+        """
+        path = self.path_for(width, height, filename)
+        if self._hit(path):
+            return path
+
+        with self._key_lock(path):
+            if self._hit(path):
+                return path
+            source = os.path.join(current_app.config['UPLOAD_FOLDER'], 'news', filename)
+            if not os.path.exists(source):
+                return None
+            written = self._generate(source, path, (width, height), image_format)
+            if written is None:
+                return None
+            self.generated += 1
+
+        self._account(written, path)
+        return path
+
+    def discard(self, filename):
+        """Remove every derivative of an image (called when the image is deleted)"""
+        for width, height in self.sizes:
+            try:
+                os.remove(self.path_for(width, height, filename))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                current_app.logger.warning(f"Could not remove derivative of {filename}: {e}")
+
+    def stats(self):
+        """Cache metrics for monitoring"""
+        return {
+            'bytes': self._size,
+            'hits': self.hits,
+            'generated': self.generated,
+            'evicted': self.evicted
+        }
+
+    def _hit(self, path):
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        now = time.time()
+        if now - mtime > TOUCH_INTERVAL:
+            # mtime is the LRU clock (atime is often disabled)
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        self.hits += 1
+        return True
+
+    @contextmanager
+    def _key_lock(self, path):
+        with self._locks_guard:
+            entry = self._locks.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if fcntl is None:
+                    yield
+                else:
+                    stripe = zlib.crc32(path.encode()) % LOCK_STRIPES
+                    with open(os.path.join(self.directory, '.locks', f'{stripe}.lock'), 'a') as lock_file:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX)
+                        try:
+                            yield
+                        finally:
+                            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[path]
+
+    @staticmethod
+    def _generate(source, path, size, image_format):
+        """
+        Write a derivative of ``source`` to ``path``
+
+        Returns:
+            int: Bytes written, or None if the source can't be decoded
+        """
+        try:
+            with Image.open(source) as img:
+                img.load()
+                if image_format == 'JPEG' and img.mode != 'RGB':
+                    img = img.convert('RGB')
+                derivative = ImageOps.fit(img, size, Image.Resampling.LANCZOS)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            # Truncated or corrupt upload, or too many pixels
+            current_app.logger.warning(f"Could not make a derivative of {source}: {e}")
+            return None
+
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            derivative.save(tmp_path, format=image_format, **SAVE_OPTIONS.get(image_format, {}))
+            os.replace(tmp_path, path)
+        except BaseException:
+            # e.g. a full disk; .tmp files aren't counted or evicted, so never leave one behind
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return os.path.getsize(path)
+
+    def _account(self, written, path):
+        # Other workers write here too, so the running total is re-checked by a scan now and then
+        if self._size is None or time.time() - self._scanned > RESCAN_INTERVAL:
+            self._size = self._scan_size()
+        else:
+            self._size += written
+        if self._size > self.max_bytes:
+            self._evict(keep=path)
+
+    def _entries(self):
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith('.') and not entry.name.endswith('.tmp'):
+                    yield entry
+
+    def _scan_size(self):
+        self._scanned = time.time()
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _evict(self, keep=None):
+        """Delete least recently used files (except ``keep``) until the cache is 90% of its limit"""
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            files = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries())
+            total = sum(size for _, size, _ in files)
+            target = self.max_bytes * 0.9
+            for _, size, path in files:
+                if total <= target:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evicted += 1
+            self._size = total
+            self._scanned = time.time()
+        finally:
+            self._evict_lock.release()
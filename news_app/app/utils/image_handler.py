@@ -1,5 +1,9 @@
 import os
+import json
 import uuid
+import hashlib
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from PIL import Image
@@ -22,52 +26,79 @@ def generate_unique_filename(original_filename):
     return f"{timestamp}_{unique_id}.{ext}"
 
 
-def validate_image(file_stream):
-    """Validate that the file is actually an image"""
+def content_filename(data, ext):
+    """Content-addressed name of a processed image: the same picture always gets the same name"""
+    ext = 'jpg' if ext.lower() == 'jpeg' else ext.lower()
+    return f"{hashlib.sha256(data).hexdigest()[:32]}.{ext}"
+
+
+def probe_image(data):
+    """Check that the bytes look like an image by reading only the header"""
     try:
-        img = Image.open(file_stream)
-        img.verify()
-        return True
+        with Image.open(BytesIO(data)) as img:
+            return img.format is not None
     except Exception:
         return False
 
 
-def save_news_image(file, max_width=1200, max_height=800):
-    """
-    Save and resize news article image
+def get_upload_folder():
+    """Directory holding processed news images"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'news')
 
-    Args:
-        file: FileStorage object from request.files
-        max_width: Maximum width for the image
-        max_height: Maximum height for the image
 
-    Returns:
-        str: Filename of the saved image, or None if save failed
-    """
-    if not file or file.filename == '':
-        return None
+def get_staging_folder():
+    """Directory holding raw uploads waiting to be processed"""
+    return os.path.join(get_upload_folder(), '.staging')
 
-    if not allowed_file(file.filename):
-        return None
 
-    # Validate it's actually an image
-    if not validate_image(file.stream):
-        return None
+def variant_filename(filename, width=None, ext=None):
+    """Name of a resized/re-encoded variant, e.g. name_w640.webp"""
+    stem, original_ext = filename.rsplit('.', 1)
+    suffix = f'_w{width}' if width else ''
+    return f'{stem}{suffix}.{ext or original_ext}'
 
-    # Reset stream position after validation
-    file.stream.seek(0)
 
-    # Generate unique filename
-    filename = generate_unique_filename(file.filename)
+def stored_image_paths(filename, widths=None):
+    """Every file stored for a processed image: the full size, its WebP version and the variants"""
+    upload_folder = get_upload_folder()
+    if widths is None:
+        widths = current_app.config.get('IMAGE_VARIANT_WIDTHS', (320, 640, 960))
+    names = [filename, variant_filename(filename, ext='webp')]
+    for width in widths:
+        names.append(variant_filename(filename, width))
+        names.append(variant_filename(filename, width, 'webp'))
+    return [os.path.join(upload_folder, name) for name in names]
 
-    # Determine save path
-    upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'news')
-    os.makedirs(upload_folder, exist_ok=True)
-    filepath = os.path.join(upload_folder, filename)
 
-    try:
-        # Open and resize image
-        img = Image.open(file.stream)
+def _atomic_write(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _atomic_save(img, path, **options):
+    # Write to a temp file first so readers never see a partial image
+    root, ext = os.path.splitext(path)
+    tmp_path = f'{root}.tmp{ext}'
+    img.save(tmp_path, **options)
+    os.replace(tmp_path, path)
+
+
+def encode_news_image(source_path, ext, max_size=(1200, 800)):
+    """
+    Decode an uploaded image once and encode its full-size version
+
+    Args:
+        source_path: Path of the staged raw upload
+        ext: Extension (format) of the stored images
+        max_size: Bounding box for the full-size image
+
+    Returns:
+        tuple: (resized image, encoded full-size bytes, content-addressed filename)
+    """
+    with Image.open(source_path) as img:
+        img.load()
 
         # Convert RGBA to RGB if necessary (for PNG with transparency)
         if img.mode in ('RGBA', 'LA', 'P'):
@@ -76,40 +107,154 @@ def save_news_image(file, max_width=1200, max_height=800):
                 img = img.convert('RGBA')
             background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
             img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
 
         # Resize while maintaining aspect ratio
-        img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        encoded = BytesIO()
+        img.save(encoded, format=Image.registered_extensions()[f'.{ext.lower()}'], quality=85, optimize=True)
+        data = encoded.getvalue()
+        return img, data, content_filename(data, ext)
 
-        # Save the image
-        img.save(filepath, quality=85, optimize=True)
 
-        return filename
-    except Exception as e:
-        print(f"Error saving image: {e}")
-        return None
+def store_news_image(img, data, filename, upload_folder, widths=(320, 640, 960)):
+    """
+    Write an encoded image plus variants, unless the same picture is already stored
 
+    Every size is written in the upload's format and as WebP. Callers must
+    hold a reference to ``filename`` (see acquire_image) so the collector
+    can't remove an existing copy between the check and its use.
 
-def delete_news_image(filename):
+    Returns:
+        dict: {'full': width of the full-size image, 'widths': variant widths}
     """
-    Delete a news article image
+    variant_widths = [width for width in sorted(widths) if width < img.width]
+    full_path = os.path.join(upload_folder, filename)
+    if os.path.exists(full_path):
+        # Already stored for another article
+        return {'full': img.width, 'widths': variant_widths}
+
+    _atomic_save(img, os.path.join(upload_folder, variant_filename(filename, ext='webp')),
+                 format='WEBP', quality=80, method=4)
+    written = []
+    for width in variant_widths:
+        height = round(img.height * width / img.width)
+        # Reducing from the already-downscaled image keeps this cheap
+        variant = img.resize((width, height), Image.Resampling.LANCZOS)
+        _atomic_save(variant, os.path.join(upload_folder, variant_filename(filename, width)),
+                     quality=82, optimize=True)
+        _atomic_save(variant, os.path.join(upload_folder, variant_filename(filename, width, 'webp')),
+                     format='WEBP', quality=78, method=4)
+        written.append(width)
+
+    # The full-size file marks a complete image, so it is written last
+    _atomic_write(full_path, data)
+    return {'full': img.width, 'widths': written}
+
+
+def save_news_image(file):
+    """
+    Stage an uploaded news image for background processing
+
+    The upload is only sniffed here; decoding, resizing and encoding the
+    variants happen in the image processor once the article is committed
+    (see ImageProcessor.submit).
 
     Args:
-        filename: Name of the file to delete
+        file: FileStorage object from request.files
 
     Returns:
-        bool: True if deleted successfully, False otherwise
+        str: Filename the processed image will be saved under, or None if the
+        upload was rejected
     """
-    if not filename:
-        return False
+    if not file or file.filename == '':
+        return None
 
-    upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'news')
-    filepath = os.path.join(upload_folder, filename)
+    if not allowed_file(file.filename):
+        return None
 
+    data = file.read()
+    if not probe_image(data):
+        return None
+
+    # Generate unique filename
+    filename = generate_unique_filename(file.filename)
+
+    staging_folder = get_staging_folder()
+    os.makedirs(staging_folder, exist_ok=True)
     try:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            return True
-    except Exception as e:
-        print(f"Error deleting image: {e}")
+        with open(os.path.join(staging_folder, filename), 'wb') as staged:
+            staged.write(data)
+    except OSError as e:
+        print(f"Error staging image: {e}")
+        return None
+
+    return filename
+
+
+class ImageProcessor:
+    """Worker pool that turns staged uploads into resized images and variants"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        workers = app.config.get('IMAGE_PROCESSING_WORKERS', 2)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='news-images') if workers else None
+        app.extensions['image_processor'] = self
+
+    def submit(self, filename):
+        """Queue a staged upload; runs inline when no workers are configured"""
+        if self.executor is None:
+            self._process(filename)
+        else:
+            self.executor.submit(self._process, filename)
+
+    def _process(self, filename):
+        from app.extensions import db
+        from app.models import NewsArticle
+        from app.utils.image_store import acquire_image
+
+        with self.app.app_context():
+            config = current_app.config
+            source_path = os.path.join(get_staging_folder(), filename)
+            if not os.path.exists(source_path):
+                return
+            stored = None
+            try:
+                img, data, stored = encode_news_image(
+                    source_path, filename.rsplit('.', 1)[1], max_size=config.get('IMAGE_MAX_SIZE', (1200, 800))
+                )
+                # Pin the stored image before looking for an existing copy, so the
+                # collector can't remove that copy before the articles point at it
+                acquire_image(stored)
+                db.session.commit()
+                try:
+                    variants = store_news_image(img, data, stored, get_upload_folder(),
+                                                widths=config.get('IMAGE_VARIANT_WIDTHS', (320, 640, 960)))
+                except Exception:
+                    acquire_image(stored, -1)
+                    db.session.commit()
+                    raise
+                values = {'image_pending': False, 'image_filename': stored, 'image_variants': json.dumps(variants)}
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.warning(f"Error processing image {filename}: {e}")
+                stored = None
+                values = {'image_pending': False, 'image_filename': None, 'image_variants': None}
+            finally:
+                if os.path.exists(source_path):
+                    os.remove(source_path)
 
-    return False
+            # Articles still pointing at the staged upload take a reference each (none if it
+            # was replaced); the pin taken above is handed over in the same transaction
+            updated = NewsArticle.query.filter_by(image_filename=filename).update(values, synchronize_session=False)
+            if stored:
+                acquire_image(stored, updated - 1)
+            db.session.commit()
+            db.session.remove()
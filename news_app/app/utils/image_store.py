@@ -0,0 +1,173 @@
+"""
+Reference-counted news image storage
+
+Processed images are stored under a hash of their encoded full-size bytes
+(see content_filename), so uploading the same picture for several articles
+stores it once and every article links to the same URL. The
+``image_blobs`` table counts the articles using each stored image.
+Processing an upload takes a reference; replacing or deleting an article's
+image gives one back, in the database only.
+
+Files of images nobody has referenced for IMAGE_GC_GRACE seconds are
+removed by the ImageCollector, every IMAGE_GC_INTERVAL seconds in one
+worker process (see PeriodicTask) or with ``flask news gc-images``. A collected
+image's files are first renamed aside; if an upload revived the image
+before its row could be deleted, they are renamed back.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import case
+from app.utils.image_handler import stored_image_paths, variant_filename
+from app.utils.periodic import PeriodicTask
+
+
+def acquire_image(filename, count=1):
+    """Add references to a stored image in the current transaction (creating its row)"""
+    from app.extensions import db
+    from app.models import ImageBlob
+
+    table = ImageBlob.__table__
+    now = datetime.utcnow()
+    released_at = now if count <= 0 else None
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(filename=filename, refcount=count, created_at=now, released_at=released_at)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.filename],
+            set_={
+                'refcount': table.c.refcount + count,
+                'released_at': case((table.c.refcount + count > 0, None), else_=table.c.released_at)
+            }
+        )
+        db.session.execute(statement)
+        return
+
+    updated = db.session.execute(
+        table.update().where(table.c.filename == filename).values(
+            refcount=table.c.refcount + count,
+            released_at=case((table.c.refcount + count > 0, None), else_=table.c.released_at)
+        )
+    )
+    if not updated.rowcount:
+        db.session.execute(table.insert().values(
+            filename=filename, refcount=count, created_at=now, released_at=released_at
+        ))
+
+
+def release_image(filename):
+    """
+    Drop one reference to a stored image in the current transaction
+
+    Returns:
+        bool: False if the image isn't tracked (e.g. an upload still being processed)
+    """
+    from app.extensions import db
+    from app.models import ImageBlob
+
+    if not filename:
+        return False
+    table = ImageBlob.__table__
+    released = db.session.execute(
+        table.update().where(table.c.filename == filename).values(
+            refcount=table.c.refcount - 1,
+            released_at=case((table.c.refcount - 1 <= 0, datetime.utcnow()), else_=table.c.released_at)
+        )
+    )
+    return bool(released.rowcount)
+
+
+class ImageCollector:
+    """Removes the files of stored images that are no longer referenced"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 3600
+        self.grace = 86400
+        self._lock = threading.Lock()
+        self._task = PeriodicTask('image-collector', self.collect, 'Image garbage collection')
+        self.collected = 0
+        self.freed_bytes = 0
+        self.last_run = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('IMAGE_GC_INTERVAL', 3600)
+        self.grace = app.config.get('IMAGE_GC_GRACE', 86400)
+        app.extensions['image_collector'] = self
+        self._task.init_app(app, self.interval)
+
+    def collect(self, grace=None, limit=500):
+        """
+        Remove unreferenced images released more than ``grace`` seconds ago
+
+        Returns:
+            tuple: (images collected, bytes freed)
+        """
+        from app.extensions import db
+        from app.models import ImageBlob
+
+        grace = self.grace if grace is None else grace
+        cutoff = datetime.utcnow() - timedelta(seconds=grace)
+        candidates = db.session.execute(
+            db.select(ImageBlob.filename)
+            .where(ImageBlob.refcount <= 0, ImageBlob.released_at <= cutoff)
+            .order_by(ImageBlob.released_at).limit(limit)
+        ).scalars().all()
+        db.session.commit()
+
+        collected = freed = 0
+        for filename in candidates:
+            moved = []
+            for path in stored_image_paths(filename):
+                try:
+                    os.replace(path, f'{path}.gc')
+                    moved.append(path)
+                except FileNotFoundError:
+                    pass
+
+            table = ImageBlob.__table__
+            deleted = db.session.execute(
+                table.delete().where(table.c.filename == filename, table.c.refcount <= 0)
+            ).rowcount
+            db.session.commit()
+
+            if not deleted:
+                # Referenced again while being collected
+                for path in moved:
+                    os.replace(f'{path}.gc', path)
+                continue
+
+            for path in moved:
+                try:
+                    freed += os.path.getsize(f'{path}.gc')
+                    os.remove(f'{path}.gc')
+                except OSError as e:
+                    self.app.logger.warning(f"Could not remove {path}: {e}")
+            image_cache = self.app.extensions.get('image_cache')
+            if image_cache is not None:
+                image_cache.discard(filename)
+                image_cache.discard(variant_filename(filename, ext='webp'))
+            collected += 1
+
+        with self._lock:
+            self.collected += collected
+            self.freed_bytes += freed
+            self.last_run = time.time()
+        return collected, freed
+
+    def stats(self):
+        """Collector metrics for monitoring"""
+        return {
+            'collected': self.collected,
+            'freed_bytes': self.freed_bytes,
+            'last_run': self.last_run,
+            'scheduled': self._task.leader
+        }
@@ -0,0 +1,237 @@
+"""
+Full-page cache for anonymous visitors
+
+Public pages (PAGE_CACHE_ENDPOINTS) requested by a visitor who isn't logged
+in are served from a per-process LRU of gzip-compressed responses, before
+the view runs. The key is the host, path and query string with empty and
+tracking parameters dropped and the rest sorted, so ``?b=2&a=1`` and
+``?a=1&b=2&utm_source=x`` share an entry.
+
+Views opt in by calling ``page_cache.tag(...)`` with the tags their content
+depends on (``article:<id>``, ``category:<id>``, ``listing``); untagged
+responses are never stored. ``page_cache.invalidate(*tags)`` drops every
+entry carrying one of the tags. Invalidation is per process, so other
+workers may serve a page for up to PAGE_CACHE_TTL seconds after a change.
+
+Cached pages are sent with an ETag, Last-Modified and a public
+Cache-Control header, and without a session cookie, so a proxy in front of
+the app can cache them too.
+"""
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from flask import g, request, session, current_app, Response
+from flask.sessions import SecureCookieSessionInterface
+
+TRACKING_PARAMS = frozenset({'fbclid', 'gclid', 'msclkid', 'ref'})
+
+
+def normalize_key(host, path, args):
+    """Cache key for a URL: lowercase host, path and sorted non-empty, non-tracking args"""
+    params = sorted(
+        (name, value) for name, value in args.items(multi=True)
+        if value and name not in TRACKING_PARAMS and not name.startswith('utm_')
+    )
+    query = urlencode(params)
+    return f'{host.lower()}{path}?{query}' if query else f'{host.lower()}{path}'
+
+
+class PageCacheSessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions that are never saved on a cacheable response"""
+
+    def should_set_cookie(self, app, session):
+        if g.get('_page_cache_key') is not None:
+            return False
+        return super().should_set_cookie(app, session)
+
+
+class CachedPage:
+    """A compressed response body with its validators"""
+
+    __slots__ = ('body', 'etag', 'weak', 'last_modified', 'mimetype', 'expires', 'tags', 'meta')
+
+    def __init__(self, body, etag, weak, last_modified, mimetype, expires, tags, meta):
+        self.body = body
+        self.etag = etag
+        self.weak = weak
+        self.last_modified = last_modified
+        self.mimetype = mimetype
+        self.expires = expires
+        self.tags = tags
+        self.meta = meta
+
+
+class PageCache:
+    """Flask extension caching whole responses for anonymous visitors"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.ttl = 60
+        self.max_entries = 512
+        self.max_bytes = 32 * 1024 * 1024
+        self.endpoints = frozenset()
+        self._pages = OrderedDict()
+        self._tags = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hit_listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read PAGE_CACHE_* settings and register the request hooks"""
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        self.ttl = app.config.get('PAGE_CACHE_TTL', 60)
+        self.max_entries = app.config.get('PAGE_CACHE_SIZE', 512)
+        self.max_bytes = app.config.get('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+        self.endpoints = frozenset(app.config.get('PAGE_CACHE_ENDPOINTS', ()))
+        app.extensions['page_cache'] = self
+        if not self.enabled:
+            return
+        app.session_interface = PageCacheSessionInterface()
+        app.before_request(self._serve_cached)
+        app.after_request(self._store_response)
+
+    def add_hit_listener(self, listener):
+        """Call ``listener(endpoint, meta)`` when a cached page is served (e.g. to count views)"""
+        self._hit_listeners.append(listener)
+
+    def tag(self, *tags, **meta):
+        """
+        Mark the current response as cacheable under some tags
+
+        Keyword arguments are stored with the page and passed to hit
+        listeners. Does nothing for requests that aren't cacheable.
+        """
+        if g.get('_page_cache_key') is not None:
+            g._page_cache_tags = g.get('_page_cache_tags', set()) | set(tags)
+            g._page_cache_meta = {**g.get('_page_cache_meta', {}), **meta}
+
+    def invalidate(self, *tags):
+        """Drop every cached page carrying any of the tags"""
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    if key in self._pages:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        """Drop every cached page"""
+        with self._lock:
+            self._pages.clear()
+            self._tags.clear()
+            self._size = 0
+
+    def stats(self):
+        """Cache metrics for monitoring"""
+        return {
+            'entries': len(self._pages),
+            'bytes': self._size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations
+        }
+
+    def _is_anonymous(self):
+        # Reading the signed session cookie is cheap; the user is never loaded
+        remember_cookie = current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token')
+        if request.cookies.get(remember_cookie):
+            return False
+        return '_user_id' not in session and '_flashes' not in session
+
+    def _serve_cached(self):
+        if request.method not in ('GET', 'HEAD') or request.endpoint not in self.endpoints:
+            return None
+        if not self._is_anonymous():
+            return None
+        key = normalize_key(request.host, request.path, request.args)
+        g._page_cache_key = key
+
+        now = time.time()
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None and page.expires <= now:
+                self._remove(key)
+                page = None
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+
+        for listener in self._hit_listeners:
+            listener(request.endpoint, page.meta)
+
+        if 'gzip' in request.accept_encodings:
+            response = Response(page.body, mimetype=page.mimetype)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(gzip.decompress(page.body), mimetype=page.mimetype)
+        response.set_etag(page.etag, weak=page.weak)
+        response.last_modified = page.last_modified
+        self._set_cache_headers(response, page.expires - now)
+        g._page_cache_served = True
+        return response.make_conditional(request)
+
+    def _store_response(self, response):
+        key = g.get('_page_cache_key')
+        if key is None or g.get('_page_cache_served'):
+            return response
+        tags = g.get('_page_cache_tags')
+        if not tags or response.status_code != 200 or response.direct_passthrough \
+                or response.headers.get('Content-Encoding'):
+            # Not cacheable after all, so the session cookie must be saved as usual
+            g._page_cache_key = None
+            return response
+
+        body = response.get_data()
+        compressed = gzip.compress(body, 6)
+        # Validators the view already set (see http_cache.py) are kept
+        etag, weak = response.get_etag()
+        if etag is None:
+            etag, weak = hashlib.sha1(body).hexdigest(), False
+        last_modified = response.last_modified or datetime.now(timezone.utc).replace(microsecond=0)
+        expires = time.time() + self.ttl
+        page = CachedPage(compressed, etag, weak, last_modified, response.mimetype, expires,
+                          frozenset(tags), g.get('_page_cache_meta', {}))
+
+        with self._lock:
+            if key in self._pages:
+                self._remove(key)
+            self._pages[key] = page
+            self._size += len(compressed)
+            for tag in page.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._pages and (len(self._pages) > self.max_entries or self._size > self.max_bytes):
+                self._remove(next(iter(self._pages)))
+
+        response.set_etag(etag, weak=weak)
+        response.last_modified = last_modified
+        self._set_cache_headers(response, self.ttl)
+        return response.make_conditional(request)
+
+    @staticmethod
+    def _set_cache_headers(response, max_age):
+        response.cache_control.public = True
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = max(int(max_age), 0)
+        response.vary.update(('Accept-Encoding', 'Cookie'))
+
+    def _remove(self, key):
+        # Caller holds the lock
+        page = self._pages.pop(key)
+        self._size -= len(page.body)
+        for tag in page.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -0,0 +1,198 @@
+"""
+Keyset (cursor) pagination
+
+Pages are selected with a ``WHERE (key1, key2) < (last1, last2)`` seek on an
+indexed sort key instead of OFFSET, so page 500 costs the same as page 1 and
+no COUNT(*) is needed to render next/previous links. Cursors are opaque
+URL-safe tokens carrying the boundary key values and the page number.
+"""
+import base64
+import binascii
+import json
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+# Approximate totals: cache key -> (count, expires_at)
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and '$dt' in value:
+        return datetime.fromisoformat(value['$dt'])
+    return value
+
+
+def encode_cursor(values, direction, page):
+    """Encode boundary key values into an opaque cursor token"""
+    payload = {'k': [_encode_value(v) for v in values], 'd': direction, 'p': page}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor token
+
+    Returns:
+        tuple: (values, direction, page), or None for a missing or invalid token
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = [_decode_value(v) for v in payload['k']]
+        direction = payload['d']
+        page = int(payload.get('p', 1))
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+    if direction not in ('next', 'prev'):
+        return None
+    return values, direction, page
+
+
+def approximate_count(query, cache_key=None, ttl=60):
+    """
+    Count rows for a query, caching the result per process for ``ttl`` seconds
+
+    Args:
+        query: SQLAlchemy query to count
+        cache_key: Key for the cached total; without one the count is not cached
+        ttl: Cache lifetime in seconds
+    """
+    if cache_key is None:
+        return query.order_by(None).count()
+
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(cache_key)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    total = query.order_by(None).count()
+    with _count_lock:
+        _count_cache[cache_key] = (total, now + ttl)
+    return total
+
+
+def invalidate_count(prefix):
+    """Drop cached totals whose key starts with ``prefix``"""
+    with _count_lock:
+        for key in [k for k in _count_cache if k.startswith(prefix)]:
+            del _count_cache[key]
+
+
+def _seek_filter(keys, values, forward):
+    """Build the row-value comparison (a, b) < (x, y) as portable AND/OR clauses"""
+    clauses = []
+    for i, ((expression, descending), value) in enumerate(zip(keys, values)):
+        # Moving forward through a descending key means smaller values
+        if descending == forward:
+            comparison = expression < value
+        else:
+            comparison = expression > value
+        equal_prefix = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, comparison) if equal_prefix else comparison)
+    return or_(*clauses)
+
+
+class KeysetPagination:
+    """One page of keyset-paginated results"""
+
+    def __init__(self, items, per_page, page, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.page = page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def pages(self):
+        """Approximate page count, if a total was requested"""
+        if self.total is None:
+            return None
+        return max(1, -(-self.total // self.per_page))
+
+
+def paginate_keyset(query, keys, cursor=None, per_page=20, count=False,
+                    count_cache_key=None, count_ttl=60):
+    """
+    Paginate a query by seeking on a unique sort key
+
+    Args:
+        query: SQLAlchemy query without ORDER BY
+        keys: List of (expression, descending) pairs; the last one must make
+            the ordering unique (usually the primary key)
+        cursor: Opaque token from a previous page's next_cursor/prev_cursor
+        per_page: Number of items per page
+        count: Also compute an (optionally cached) total for page-number UI
+        count_cache_key: Cache key for the total, see approximate_count()
+        count_ttl: Lifetime of the cached total in seconds
+
+    Returns:
+        KeysetPagination
+    """
+    decoded = decode_cursor(cursor)
+    if decoded and len(decoded[0]) != len(keys):
+        decoded = None
+    values, direction, page = decoded if decoded else (None, 'next', 1)
+    forward = direction == 'next'
+
+    total = approximate_count(query, count_cache_key, count_ttl) if count else None
+
+    paged = query
+    if values is not None:
+        paged = paged.filter(_seek_filter(keys, values, forward))
+
+    # Key values are selected alongside each row to build the next cursors
+    labels = [expression.label(f'_key{i}') for i, (expression, _) in enumerate(keys)]
+    ordering = [
+        expression.desc() if descending == forward else expression.asc()
+        for expression, descending in keys
+    ]
+    rows = paged.add_columns(*labels).order_by(*ordering).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    key_count = len(keys)
+    items = []
+    for row in rows:
+        rest = tuple(row[:-key_count])
+        items.append(rest[0] if len(rest) == 1 else rest)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first_key = list(rows[0][-key_count:])
+        last_key = list(rows[-1][-key_count:])
+        # Going forward, extra rows mean a next page and a cursor means a previous
+        # one; going backward it's the other way round
+        more_after = has_more if forward else values is not None
+        more_before = values is not None if forward else has_more
+        if more_after:
+            next_cursor = encode_cursor(last_key, 'next', page + 1)
+        if more_before:
+            prev_cursor = encode_cursor(first_key, 'prev', max(page - 1, 1))
+
+    return KeysetPagination(items, per_page, page, next_cursor, prev_cursor, total)
@@ -0,0 +1,97 @@
+"""
+Periodic background jobs
+
+A PeriodicTask calls a function every ``interval`` seconds from a daemon
+thread, inside an application context. The thread is started on the first
+request, so it runs in a worker process rather than a preloading parent.
+
+Only one worker process per host runs each job: the one holding the job's
+lock file (an exclusive ``flock`` in PERIODIC_LOCK_DIR, the instance folder
+by default). The other workers try again every interval and take over when
+that process exits. When several hosts share the database and upload
+folder, set the job's interval to 0 and run its ``flask news`` command from
+a single cron job instead.
+"""
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process runs the job
+    fcntl = None
+
+
+class PeriodicTask:
+    """Runs ``job()`` every ``interval`` seconds in a single worker process"""
+
+    def __init__(self, name, job, description):
+        self.name = name
+        self.job = job
+        self.description = description
+        self.app = None
+        self.interval = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._lock_file = None
+
+    def init_app(self, app, interval):
+        self.app = app
+        self.interval = interval
+        if interval:
+            app.before_request(self._ensure_thread)
+
+    @property
+    def leader(self):
+        """Whether this process is the one running the job"""
+        return self._lock_file is not None and self._pid == os.getpid()
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != pid or self._thread is None or not self._thread.is_alive():
+                if self._pid != pid:
+                    # A lock inherited through fork belongs to the parent
+                    self._lock_file = None
+                self._pid = pid
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _acquire(self):
+        """Take the job's lock file for the life of this process, if no other worker holds it"""
+        if self._lock_file is not None or fcntl is None:
+            return True
+        directory = self.app.config.get('PERIODIC_LOCK_DIR') or self.app.instance_path
+        os.makedirs(directory, exist_ok=True)
+        lock_file = open(os.path.join(directory, f'{self.name}.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        from app.extensions import db
+
+        while True:
+            time.sleep(self.interval)
+            try:
+                if not self._acquire():
+                    # Another worker process runs this job
+                    continue
+            except OSError as e:
+                self.app.logger.warning(f"Could not lock {self.name}: {e}")
+                continue
+            with self.app.app_context():
+                try:
+                    self.job()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.warning(f"{self.description} failed: {e}")
+                finally:
+                    db.session.remove()
@@ -0,0 +1,321 @@
+"""
+Content-based related articles
+
+Published articles are vectorized into TF-IDF rows (title, summary and body,
+weighted in that order) in a SciPy sparse matrix. Rows are L2-normalised, so
+a sparse matrix product gives cosine similarities, and the top-k neighbours
+of every article are computed in batches. Results are stored in the
+``related_articles`` table, so the article page needs one indexed lookup.
+
+Saving an article refreshes the index in the background. A refresh still
+loads every published article and builds the whole matrix, so saves queued
+while one is pending or running are coalesced into a single refresh. Only
+the rows whose neighbours can change are rewritten: the saved articles,
+articles that list them, and articles they now beat. ``flask news
+rebuild-related`` recomputes everything.
+"""
+import html
+import math
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+TOKEN_RE = re.compile(r'[^\W\d_]{2,}')
+TAG_RE = re.compile(r'<[^>]+>')
+FIELD_WEIGHTS = (('title', 3), ('summary', 2), ('content', 1))
+STOP_WORDS = frozenset("""
+    a about after all also an and any are as at be been but by can could did do does for from had has have
+    he her his how if in into is it its just more most no not of on one or other our out over said she so
+    some than that the their them then there these they this to up was we were what when which who will
+    with would you your
+""".split())
+
+
+def tokenize(text):
+    """Lowercase words of two or more letters, without HTML tags and stop words"""
+    text = html.unescape(TAG_RE.sub(' ', text or '')).lower()
+    return [token for token in TOKEN_RE.findall(text) if token not in STOP_WORDS]
+
+
+def document_terms(title, summary, content):
+    """Weighted term counts for one article"""
+    counts = Counter()
+    for (_, weight), text in zip(FIELD_WEIGHTS, (title, summary, content)):
+        for token in tokenize(text):
+            counts[token] += weight
+    return counts
+
+
+def build_matrix(documents, min_df=2):
+    """
+    Build an L2-normalised TF-IDF matrix
+
+    Args:
+        documents: List of term-count mappings, one per row
+        min_df: Terms found in fewer documents are dropped (they can't link two articles)
+
+    Returns:
+        scipy.sparse.csr_matrix of shape (len(documents), vocabulary size)
+    """
+    import numpy as np
+    from scipy import sparse
+
+    document_frequency = Counter()
+    for terms in documents:
+        document_frequency.update(terms.keys())
+    vocabulary = {}
+    for term, frequency in document_frequency.items():
+        if frequency >= min_df:
+            vocabulary[term] = len(vocabulary)
+
+    rows, columns, values = [], [], []
+    for row, terms in enumerate(documents):
+        for term, count in terms.items():
+            column = vocabulary.get(term)
+            if column is not None:
+                rows.append(row)
+                columns.append(column)
+                values.append(1.0 + math.log(count))  # Sublinear term frequency
+
+    matrix = sparse.csr_matrix(
+        (np.array(values, dtype=np.float32), (rows, columns)),
+        shape=(len(documents), max(len(vocabulary), 1))
+    )
+    df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1 + len(documents)) / (1 + df)) + 1
+    matrix.data *= idf[matrix.indices].astype(np.float32)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms).astype(np.float32) @ matrix).tocsr()
+
+
+def top_neighbours(matrix, rows, k, min_score=0.0, batch_size=512):
+    """
+    Cosine top-k neighbours for some rows of a normalised matrix
+
+    Yields:
+        tuple: (row, [(neighbour row, score), ...] best first)
+    """
+    import numpy as np
+
+    count = matrix.shape[0]
+    k = min(k, count - 1)
+    if k <= 0:
+        for row in rows:
+            yield row, []
+        return
+
+    rows = list(rows)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        scores = (matrix[batch] @ matrix.T).toarray()
+        scores[np.arange(len(batch)), batch] = -1  # An article isn't related to itself
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for i, row in enumerate(batch):
+            ranked = sorted(((int(j), float(scores[i, j])) for j in best[i]), key=lambda item: -item[1])
+            yield row, [(j, score) for j, score in ranked if score > min_score]
+
+
+class RelatedIndex:
+    """Maintains the related_articles table"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self.count = 3
+        self.min_score = 0.05
+        self._pending = set()
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.count = app.config.get('RELATED_ARTICLES_COUNT', 3)
+        self.min_score = app.config.get('RELATED_ARTICLES_MIN_SCORE', 0.05)
+        workers = app.config.get('RELATED_ARTICLES_WORKERS', 1)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='related-articles') \
+            if workers else None
+        app.extensions['related_index'] = self
+
+    @staticmethod
+    def available():
+        """True if NumPy and SciPy are installed"""
+        try:
+            import numpy  # noqa: F401
+            import scipy.sparse  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def related_ids(self, article):
+        """Ids of the related published articles, best first (newest in the category if not indexed yet)"""
+        from app.extensions import db
+        from app.models import NewsArticle, RelatedArticle
+
+        ids = db.session.execute(
+            db.select(RelatedArticle.related_id)
+            .join(NewsArticle, NewsArticle.id == RelatedArticle.related_id)
+            .where(RelatedArticle.article_id == article.id, NewsArticle.is_published == True)
+            .order_by(RelatedArticle.rank).limit(self.count)
+        ).scalars().all()
+        if ids:
+            return ids
+        return db.session.execute(
+            db.select(NewsArticle.id).where(
+                NewsArticle.category_id == article.category_id,
+                NewsArticle.id != article.id,
+                NewsArticle.is_published == True
+            ).order_by(NewsArticle.publish_date.desc()).limit(self.count)
+        ).scalars().all()
+
+    def related_for(self, article, ids=None):
+        """Related published articles, best first (``ids`` from related_ids() if already looked up)"""
+        from app.models import NewsArticle
+
+        if ids is None:
+            ids = self.related_ids(article)
+        if not ids:
+            return []
+        articles = {related.id: related for related in NewsArticle.query.filter(NewsArticle.id.in_(ids))}
+        return [articles[related_id] for related_id in ids if related_id in articles]
+
+    def refresh(self, article_id):
+        """Queue an incremental refresh after an article was saved or deleted"""
+        if not self.available():
+            return
+        if self.executor is None:
+            self._refresh({article_id})
+            return
+        with self._lock:
+            self._pending.add(article_id)
+            if self._scheduled:
+                # The queued refresh picks this article up too
+                return
+            self._scheduled = True
+        self.executor.submit(self._run_pending)
+
+    def _run_pending(self):
+        with self._lock:
+            article_ids, self._pending = self._pending, set()
+            # Saves from now on queue the next refresh
+            self._scheduled = False
+        self._refresh(article_ids)
+
+    def _load(self):
+        from app.extensions import db
+        from app.models import NewsArticle
+
+        ids, documents = [], []
+        query = db.session.query(NewsArticle.id, NewsArticle.title, NewsArticle.summary, NewsArticle.content) \
+            .filter(NewsArticle.is_published == True).order_by(NewsArticle.id)
+        for article_id, title, summary, content in query.yield_per(500):
+            ids.append(article_id)
+            documents.append(document_terms(title, summary, content))
+        return ids, documents
+
+    def _write(self, ids, neighbours, replace_rows=None):
+        """Replace the stored neighbours of some articles (all of them if replace_rows is None)"""
+        from app.extensions import db
+        from app.models import RelatedArticle
+
+        table = RelatedArticle.__table__
+        values = [
+            {'article_id': ids[row], 'related_id': ids[j], 'score': score, 'rank': rank}
+            for row, ranked in neighbours
+            for rank, (j, score) in enumerate(ranked)
+        ]
+        if replace_rows is None:
+            db.session.execute(table.delete())
+        elif replace_rows:
+            db.session.execute(table.delete().where(table.c.article_id.in_(replace_rows)))
+        if values:
+            db.session.execute(table.insert(), values)
+        db.session.commit()
+        return len(values)
+
+    def rebuild(self, report=None):
+        """
+        Recompute every article's neighbours
+
+        Args:
+            report: Optional callable receiving (phase, seconds) timings
+
+        Returns:
+            tuple: (articles indexed, neighbour rows written)
+        """
+        report = report or (lambda phase, seconds: None)
+        started = time.perf_counter()
+        ids, documents = self._load()
+        report('load', time.perf_counter() - started)
+
+        started = time.perf_counter()
+        matrix = build_matrix(documents)
+        report('vectorize', time.perf_counter() - started)
+
+        started = time.perf_counter()
+        neighbours = list(top_neighbours(matrix, range(len(ids)), self.count, self.min_score))
+        report('similarity', time.perf_counter() - started)
+
+        started = time.perf_counter()
+        written = self._write(ids, neighbours)
+        report('write', time.perf_counter() - started)
+        return len(ids), written
+
+    def stats(self):
+        """Refresh metrics for monitoring"""
+        return {'refreshes': self.refreshes, 'pending': len(self._pending)}
+
+    def _refresh(self, article_ids):
+        from app.extensions import db, article_cache
+
+        with self.app.app_context():
+            try:
+                self._refresh_rows(article_ids)
+                article_cache.clear()
+                self.refreshes += 1
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.warning(f"Could not refresh related articles for {sorted(article_ids)}: {e}")
+            finally:
+                db.session.remove()
+
+    def _refresh_rows(self, article_ids):
+        import numpy as np
+        from app.extensions import db
+        from app.models import RelatedArticle
+
+        ids, documents = self._load()
+        position = {pk: row for row, pk in enumerate(ids)}
+
+        # Articles listing a saved one must be recomputed whatever happened to it
+        listing = {pk for (pk,) in db.session.query(RelatedArticle.article_id)
+                   .filter(RelatedArticle.related_id.in_(article_ids))}
+        affected = {position[pk] for pk in listing if pk in position}
+        # Unpublished or deleted articles have no neighbours and appear in no list
+        saved = sorted(position[pk] for pk in article_ids if pk in position)
+
+        matrix = None
+        if saved and len(ids) > 1:
+            matrix = build_matrix(documents)
+            affected.update(saved)
+            similarity = np.asarray((matrix[saved] @ matrix.T).toarray())
+            similarity[np.arange(len(saved)), saved] = 0
+
+            # Articles whose weakest neighbour (or free slot) a saved one now beats
+            weakest = dict(db.session.query(RelatedArticle.article_id, db.func.min(RelatedArticle.score))
+                           .group_by(RelatedArticle.article_id)
+                           .having(db.func.count() >= self.count))
+            thresholds = np.array([max(weakest.get(pk, 0), self.min_score) for pk in ids])
+            affected.update(int(other) for other in np.nonzero((similarity > thresholds).any(axis=0))[0])
+        elif affected:
+            matrix = build_matrix(documents)
+
+        neighbours = list(top_neighbours(matrix, sorted(affected), self.count, self.min_score)) \
+            if affected else []
+        self._write(ids, neighbours, replace_rows=[ids[row] for row in affected] + sorted(article_ids))
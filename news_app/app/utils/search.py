@@ -0,0 +1,246 @@
+"""
+Full-text search index for news articles
+
+SQLite uses an FTS5 virtual table ranked with bm25(); PostgreSQL uses a
+weighted tsvector column with a GIN index ranked with ts_rank_cd(). The index
+is kept in sync from NewsArticle insert/update/delete mapper events, so routes
+never have to touch it directly.
+"""
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import event, text, inspect, func, table, column, literal_column
+
+from app.models import NewsArticle
+from app.extensions import db
+from app.utils.pagination import paginate_keyset
+
+FTS_TABLE = 'news_articles_fts'
+PG_TABLE = 'news_articles_search'
+
+# Highlight markers used inside the database, replaced after HTML escaping
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_END = '\ue001'
+
+INDEXED_FIELDS = ('title', 'summary', 'content')
+
+# Per-engine cache of whether the index table exists (only positives are cached)
+_available = set()
+
+
+def _dialect(connection):
+    return connection.dialect.name
+
+
+def index_available(connection):
+    """Check whether the search index table exists for this connection's database"""
+    key = str(connection.engine.url)
+    if key in _available:
+        return True
+
+    dialect = _dialect(connection)
+    if dialect == 'sqlite':
+        name = FTS_TABLE
+    elif dialect == 'postgresql':
+        name = PG_TABLE
+    else:
+        return False
+
+    if inspect(connection).has_table(name):
+        _available.add(key)
+        return True
+    return False
+
+
+def create_index(connection):
+    """Create the search index structures for the connection's dialect"""
+    dialect = _dialect(connection)
+    if dialect == 'sqlite':
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(title, summary, content, tokenize='porter unicode61')"
+        ))
+    elif dialect == 'postgresql':
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+            "article_id INTEGER PRIMARY KEY REFERENCES news_articles(id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{PG_TABLE}_document "
+            f"ON {PG_TABLE} USING GIN (document)"
+        ))
+
+
+def drop_index(connection):
+    """Drop the search index structures"""
+    dialect = _dialect(connection)
+    if dialect == 'sqlite':
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    elif dialect == 'postgresql':
+        connection.execute(text(f"DROP TABLE IF EXISTS {PG_TABLE}"))
+    _available.discard(str(connection.engine.url))
+
+
+def _index_row(connection, article_id, title, summary, content):
+    params = {
+        'id': article_id,
+        'title': title or '',
+        'summary': summary or '',
+        'content': content or ''
+    }
+    if _dialect(connection) == 'sqlite':
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), params)
+        connection.execute(text(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, summary, content) "
+            "VALUES (:id, :title, :summary, :content)"
+        ), params)
+    else:
+        connection.execute(text(
+            f"INSERT INTO {PG_TABLE} (article_id, document) VALUES (:id, "
+            "setweight(to_tsvector('english', :title), 'A') || "
+            "setweight(to_tsvector('english', :summary), 'B') || "
+            "setweight(to_tsvector('english', :content), 'C')) "
+            "ON CONFLICT (article_id) DO UPDATE SET document = EXCLUDED.document"
+        ), params)
+
+
+def _unindex_row(connection, article_id):
+    if _dialect(connection) == 'sqlite':
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': article_id})
+    else:
+        connection.execute(text(f"DELETE FROM {PG_TABLE} WHERE article_id = :id"), {'id': article_id})
+
+
+def rebuild_index(connection, batch_size=500):
+    """
+    Rebuild the whole search index from the news_articles table
+
+    Args:
+        connection: SQLAlchemy connection
+        batch_size: Number of articles read per batch
+
+    Returns:
+        int: Number of articles indexed
+    """
+    create_index(connection)
+    if _dialect(connection) == 'sqlite':
+        connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    elif _dialect(connection) == 'postgresql':
+        connection.execute(text(f"DELETE FROM {PG_TABLE}"))
+    else:
+        return 0
+
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(text(
+            "SELECT id, title, summary, content FROM news_articles "
+            "WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': batch_size}).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            _index_row(connection, *row)
+        indexed += len(rows)
+        last_id = rows[-1][0]
+    return indexed
+
+
+@event.listens_for(NewsArticle, 'after_insert')
+def _article_inserted(mapper, connection, target):
+    if index_available(connection):
+        _index_row(connection, target.id, target.title, target.summary, target.content)
+
+
+@event.listens_for(NewsArticle, 'after_update')
+def _article_updated(mapper, connection, target):
+    # View counter and flag updates don't touch the indexed text
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+        return
+    if index_available(connection):
+        _index_row(connection, target.id, target.title, target.summary, target.content)
+
+
+@event.listens_for(NewsArticle, 'after_delete')
+def _article_deleted(mapper, connection, target):
+    if index_available(connection):
+        _unindex_row(connection, target.id)
+
+
+def _fts5_query(query_text):
+    """Turn free user input into a safe FTS5 MATCH expression"""
+    terms = re.findall(r'\w+', query_text, re.UNICODE)
+    if not terms:
+        return None
+    # Every term must match; the last one as a prefix for partially typed words
+    quoted = [f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*']
+    return ' '.join(quoted)
+
+
+def highlight(snippet):
+    """Escape a raw snippet and turn highlight markers into <mark> tags"""
+    if not snippet:
+        return None
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+
+def search_articles(query_text, category_id=None, cursor=None, per_page=20):
+    """
+    Run a ranked full-text search over published articles
+
+    Args:
+        query_text: Raw search text entered by the user
+        category_id: Optional category filter
+        cursor: Pagination cursor from a previous results page
+        per_page: Results per page
+
+    Returns:
+        tuple: (pagination, snippets) where snippets maps article id to
+        highlighted Markup, or None if the index is unavailable and the caller
+        should fall back to a LIKE search
+    """
+    connection = db.session.connection()
+    if not index_available(connection):
+        return None
+
+    if _dialect(connection) == 'sqlite':
+        match = _fts5_query(query_text)
+        if match is None:
+            return None
+        fts = table(FTS_TABLE, column('rowid'))
+        # bm25() scores are negative; lower is more relevant
+        rank = func.bm25(literal_column(FTS_TABLE), 10.0, 4.0, 1.0)
+        snippet = func.snippet(literal_column(FTS_TABLE), -1, HIGHLIGHT_START, HIGHLIGHT_END, '…', 24)
+        query = NewsArticle.listing_query().join(fts, fts.c.rowid == NewsArticle.id) \
+            .filter(literal_column(FTS_TABLE).op('MATCH')(match))
+        descending = False
+    else:
+        search_table = table(PG_TABLE, column('article_id'), column('document'))
+        tsquery = func.websearch_to_tsquery('english', query_text)
+        rank = func.ts_rank_cd(search_table.c.document, tsquery)
+        snippet = func.ts_headline(
+            'english', NewsArticle.content, tsquery,
+            f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=2, MaxWords=30'
+        )
+        query = NewsArticle.listing_query().join(search_table, search_table.c.article_id == NewsArticle.id) \
+            .filter(search_table.c.document.op('@@')(tsquery))
+        descending = True
+
+    query = query.filter(NewsArticle.is_published == True)
+    if category_id:
+        query = query.filter(NewsArticle.category_id == category_id)
+
+    # Keyset pagination over (rank, id) so deep result pages don't need OFFSET
+    query = query.add_columns(snippet)
+    pagination = paginate_keyset(query, [(rank, descending), (NewsArticle.id, descending)], cursor, per_page)
+
+    snippets = {}
+    articles = []
+    for article, raw_snippet in pagination.items:
+        articles.append(article)
+        snippets[article.id] = highlight(raw_snippet)
+    pagination.items = articles
+
+    return pagination, snippets
@@ -0,0 +1,154 @@
+"""
+Slug allocation for articles and categories
+
+A new slug is picked with one query that fetches every existing slug
+starting with the base (live slugs plus old slugs kept for redirects), then
+the lowest free ``base-N`` suffix is used. Slugs are kept when the title
+still produces the same base. A changed slug leaves a SlugRedirect behind so
+old links keep working, until the object is deleted (drop_redirects). Two saves racing for the same slug are resolved by
+``commit_with_unique_slug``, which retries with a fresh suffix.
+"""
+import re
+from sqlalchemy import inspect, select, union_all
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+
+# Room kept at the end of a truncated base for a "-N" suffix
+SUFFIX_ROOM = 6
+
+
+def slugify(text, max_length=200, fallback='untitled'):
+    """Lowercase, strip punctuation and join words with hyphens"""
+    slug = re.sub(r'[^\w\s-]', '', (text or '').lower())
+    slug = re.sub(r'[\s_-]+', '-', slug)
+    slug = re.sub(r'^-+|-+$', '', slug)
+    slug = slug[:max_length - SUFFIX_ROOM].rstrip('-')
+    return slug or fallback
+
+
+def _prefix_filter(column, base):
+    # An index range scan on both backends: GLOB is case-sensitive so SQLite can
+    # use the slug index, LIKE uses the text_pattern_ops index on PostgreSQL
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return column.op('GLOB')(f'{base}-*')
+    return column.startswith(f'{base}-', autoescape=True)
+
+
+def next_free_slug(model, base, exclude_id=None):
+    """
+    Pick ``base`` or the lowest free ``base-N`` in a single query
+
+    Args:
+        model: Model class with a ``slug`` column
+        base: Slugified title
+        exclude_id: Object whose own redirects don't count as taken
+    """
+    from app.models import SlugRedirect
+
+    live = select(model.slug.label('slug')).where(
+        (model.slug == base) | _prefix_filter(model.slug, base)
+    )
+    if exclude_id is not None:
+        live = live.where(model.id != exclude_id)
+    redirects = select(SlugRedirect.old_slug.label('slug')).where(
+        SlugRedirect.kind == model.__tablename__,
+        (SlugRedirect.old_slug == base) | _prefix_filter(SlugRedirect.old_slug, base)
+    )
+    if exclude_id is not None:
+        redirects = redirects.where(SlugRedirect.target_id != exclude_id)
+
+    taken = set(db.session.execute(union_all(live, redirects)).scalars())
+    if base not in taken:
+        return base
+    suffix = 1
+    while f'{base}-{suffix}' in taken:
+        suffix += 1
+    return f'{base}-{suffix}'
+
+
+def _matches_base(slug, base):
+    return slug == base or re.fullmatch(rf'{re.escape(base)}-\d+', slug or '') is not None
+
+
+def assign_slug(instance, text, force=False):
+    """
+    Give an article or category a unique slug for ``text``
+
+    The current slug is kept if ``text`` still slugifies to the same base.
+    When a saved object's slug changes, the old one is recorded for redirects.
+    """
+    from app.models import SlugRedirect
+
+    model = type(instance)
+    base = slugify(text, model.slug.type.length)
+    current = instance.slug
+    if current and not force and _matches_base(current, base):
+        return current
+
+    # The instance may be pending without a slug yet, so don't flush it early
+    with db.session.no_autoflush:
+        slug = next_free_slug(model, base, exclude_id=instance.id)
+        if instance.id is not None and current and current != slug:
+            kind = model.__tablename__
+            # Renaming back to an old slug: that redirect is no longer needed
+            SlugRedirect.query.filter_by(kind=kind, old_slug=slug, target_id=instance.id).delete()
+            db.session.add(SlugRedirect(kind=kind, old_slug=current, target_id=instance.id))
+    instance.slug = slug
+    return slug
+
+
+def drop_redirects(instance):
+    """
+    Delete the old slugs of an article or category that is being deleted
+
+    Runs in the caller's transaction. Left behind, they would keep counting
+    as taken in next_free_slug and push new titles to ``-N`` suffixes.
+    """
+    from app.models import SlugRedirect
+
+    SlugRedirect.query.filter_by(kind=type(instance).__tablename__, target_id=instance.id) \
+        .delete(synchronize_session=False)
+
+
+def find_redirect(model, slug):
+    """Current slug of the object that used to have ``slug``, or None"""
+    from app.models import SlugRedirect
+
+    return db.session.execute(
+        select(model.slug)
+        .join(SlugRedirect, SlugRedirect.target_id == model.id)
+        .where(SlugRedirect.kind == model.__tablename__, SlugRedirect.old_slug == slug)
+    ).scalar()
+
+
+def _is_slug_violation(error):
+    message = str(error.orig).lower()
+    return 'slug' in message and ('unique' in message or 'duplicate' in message)
+
+
+def commit_with_unique_slug(instance, text, retries=3):
+    """
+    Commit the session, retrying with a new slug if another save took it first
+
+    A rollback discards the pending changes, so the instance's changed
+    attributes are captured beforehand and put back before each retry.
+    """
+    for attempt in range(retries):
+        state = inspect(instance)
+        changes = {
+            attr.key: attr.value for attr in state.attrs
+            if attr.key != 'slug' and attr.key in state.mapper.column_attrs and attr.history.has_changes()
+        }
+        try:
+            db.session.commit()
+            return
+        except IntegrityError as e:
+            db.session.rollback()
+            if attempt == retries - 1 or not _is_slug_violation(e):
+                raise
+        if inspect(instance).transient:
+            instance.slug = None
+        db.session.add(instance)
+        for key, value in changes.items():
+            setattr(instance, key, value)
+        assign_slug(instance, text, force=True)
@@ -0,0 +1,148 @@
+"""
+Trending articles
+
+Views reach this module through the view counter's batched flushes, never
+one row per view. Each article keeps a ring buffer of hourly counts in
+``article_view_buckets``: slot ``hour % TRENDING_WINDOW_HOURS`` is added to
+while it belongs to the current hour and overwritten when the ring wraps.
+
+Each process keeps a top-k list of articles ranked by exponentially decayed
+views (``TRENDING_HALF_LIFE_HOURS``). The list is recomputed from the
+buckets inside the window every TRENDING_REFRESH_SECONDS, so serving
+"Trending now" never sorts the articles table.
+"""
+import heapq
+import threading
+import time
+from sqlalchemy import case, select
+
+
+def current_hour(now=None):
+    """Hours since the epoch"""
+    return int((now or time.time()) // 3600)
+
+
+class TrendingTracker:
+    """Hourly view buckets plus a cached, decayed top-k ranking"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.window_hours = 48
+        self.half_life = 6.0
+        self.size = 5
+        self.refresh_seconds = 60
+        self._ranking = []
+        self._expires = 0
+        self._lock = threading.Lock()
+        self.batches = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.window_hours = app.config.get('TRENDING_WINDOW_HOURS', 48)
+        self.half_life = app.config.get('TRENDING_HALF_LIFE_HOURS', 6.0)
+        self.size = app.config.get('TRENDING_SIZE', 5)
+        self.refresh_seconds = app.config.get('TRENDING_REFRESH_SECONDS', 60)
+        app.extensions['trending'] = self
+
+    def record_batch(self, connection, batch, now=None):
+        """
+        Add a flushed {article_id: views} batch to the current hour's slots
+
+        Runs inside the view counter's flush transaction.
+        """
+        from app.models import ArticleViewBucket
+
+        hour = current_hour(now)
+        slot = hour % self.window_hours
+        rows = [
+            {'article_id': article_id, 'slot': slot, 'hour': hour, 'views': count}
+            for article_id, count in batch.items()
+        ]
+        if not rows:
+            return
+        table = ArticleViewBucket.__table__
+
+        dialect = connection.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            statement = insert(table)
+            # Same hour: add to the slot; older hour: the ring has wrapped, start over
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.article_id, table.c.slot],
+                set_={
+                    'views': case(
+                        (table.c.hour == statement.excluded.hour, table.c.views + statement.excluded.views),
+                        else_=statement.excluded.views
+                    ),
+                    'hour': statement.excluded.hour
+                }
+            )
+            connection.execute(statement, rows)
+        else:
+            for row in rows:
+                updated = connection.execute(
+                    table.update()
+                    .where(table.c.article_id == row['article_id'], table.c.slot == slot)
+                    .values(
+                        views=case((table.c.hour == hour, table.c.views + row['views']), else_=row['views']),
+                        hour=hour
+                    )
+                )
+                if not updated.rowcount:
+                    connection.execute(table.insert().values(**row))
+        self.batches += 1
+
+    def scores(self, now=None):
+        """Decayed view score of every article with views inside the window"""
+        from app.extensions import db
+        from app.models import ArticleViewBucket
+
+        now = now or time.time()
+        oldest = current_hour(now) - self.window_hours + 1
+        rows = db.session.execute(
+            select(ArticleViewBucket.article_id, ArticleViewBucket.hour, ArticleViewBucket.views)
+            .where(ArticleViewBucket.hour >= oldest)
+        )
+        scores = {}
+        for article_id, hour, views in rows:
+            # Age at the end of the bucket, so the current hour counts fully
+            age = max(now - (hour + 1) * 3600, 0) / 3600
+            scores[article_id] = scores.get(article_id, 0.0) + views * 0.5 ** (age / self.half_life)
+        return scores
+
+    def ranking(self):
+        """Cached [(score, article_id), ...] best first, recomputed when expired"""
+        now = time.time()
+        with self._lock:
+            if now < self._expires:
+                return self._ranking
+        # Extra candidates so unpublished articles can be dropped without a refill
+        ranking = heapq.nlargest(self.size * 2, ((score, pk) for pk, score in self.scores(now).items()))
+        with self._lock:
+            self._ranking = ranking
+            self._expires = now + self.refresh_seconds
+        return ranking
+
+    def trending_articles(self, limit=None):
+        """Published articles ranked by recent views, best first"""
+        from app.models import NewsArticle
+
+        limit = limit or self.size
+        ranking = self.ranking()
+        if not ranking:
+            return []
+        ids = [pk for _, pk in ranking]
+        articles = {
+            article.id: article for article in
+            NewsArticle.listing_query().filter(NewsArticle.id.in_(ids), NewsArticle.is_published == True)
+        }
+        return [articles[pk] for pk in ids if pk in articles][:limit]
+
+    def stats(self):
+        """Tracker metrics for monitoring"""
+        return {'batches': self.batches, 'ranked': len(self._ranking)}
@@ -0,0 +1,219 @@
+"""
+Unique reader estimates with HyperLogLog
+
+Every article page view adds the reader (user id when logged in, otherwise
+IP address and user agent) to two HyperLogLog sketches for the article: one
+for the current UTC day and one for all time. A sketch is a fixed array of
+``2 ** UNIQUE_READERS_PRECISION`` one-byte registers (4 KB and about 1.6%
+standard error at the default precision 12), whatever the traffic, and no
+reader identity is stored.
+
+Views since the last write are kept per process as small delta sketches.
+They are merged into the ``article_reader_sketches`` rows (register-wise
+maximum) when the view counter flushes, in the same transaction, so several
+worker processes can update the same article without losing readers.
+"""
+import hashlib
+import math
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, select
+
+ALL_TIME = 'all'
+
+
+class HyperLogLog:
+    """Dense HyperLogLog sketch with ``2 ** precision`` byte registers"""
+
+    def __init__(self, precision=12, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError(f'Expected {self.size} registers, got {len(self.registers)}')
+
+    @classmethod
+    def from_bytes(cls, data, precision=12):
+        return cls(precision, data)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        """Add a string to the sketch"""
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+        x = int.from_bytes(digest, 'big')
+        bits = 64 - self.precision
+        index = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Union with another sketch of the same precision, in place"""
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge sketches of different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """Estimated number of distinct values added"""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+def reader_key(user, remote_addr, user_agent):
+    """
+    Identity counted as one reader
+
+    ``remote_addr`` must be the client's address: behind a proxy that is
+    ``request.remote_addr`` only once ProxyFix has applied X-Forwarded-For
+    (PROXY_FIX_X_FOR), otherwise every anonymous reader shares the proxy's.
+    ``request.access_route`` isn't used since its first hop is client-supplied.
+    """
+    if user is not None and user.is_authenticated:
+        return f'user:{user.id}'
+    return f'anon:{remote_addr}|{user_agent or ""}'
+
+
+class UniqueReaders:
+    """Flask extension maintaining per-article daily and all-time reader sketches"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.precision = 12
+        self.retention_days = 90
+        self._pending = {}
+        self._pruned_day = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.sketches_written = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.precision = app.config.get('UNIQUE_READERS_PRECISION', 12)
+        self.retention_days = app.config.get('UNIQUE_READERS_RETENTION_DAYS', 90)
+        app.extensions['unique_readers'] = self
+
+    @staticmethod
+    def today():
+        return datetime.utcnow().date().isoformat()
+
+    def record(self, article_id, key):
+        """Add a reader to the article's sketches for today and all time"""
+        day = self.today()
+        with self._lock:
+            for period in (day, ALL_TIME):
+                sketch = self._pending.get((article_id, period))
+                if sketch is None:
+                    sketch = self._pending[(article_id, period)] = HyperLogLog(self.precision)
+                sketch.add(key)
+            self.recorded += 1
+
+    def persist(self, connection, batch=None):
+        """
+        Merge the pending delta sketches into their stored rows
+
+        Registered as a view counter flush listener, so it runs inside the
+        flush transaction. On failure the deltas are kept for the next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            self._merge_rows(connection, pending)
+        except Exception:
+            with self._lock:
+                for key, sketch in pending.items():
+                    current = self._pending.get(key)
+                    self._pending[key] = sketch.merge(current) if current else sketch
+            raise
+        self.sketches_written += len(pending)
+
+    def _merge_rows(self, connection, pending):
+        from app.models import ArticleReaderSketch
+
+        table = ArticleReaderSketch.__table__
+        article_ids = {article_id for article_id, _ in pending}
+        periods = {period for _, period in pending}
+        query = select(table.c.article_id, table.c.period, table.c.registers).where(
+            table.c.article_id.in_(article_ids), table.c.period.in_(periods)
+        )
+        if connection.dialect.name != 'sqlite':
+            # SQLite already holds the write lock taken by the view count update
+            query = query.with_for_update()
+        stored = {
+            (article_id, period): registers
+            for article_id, period, registers in connection.execute(query)
+        }
+
+        updates, inserts = [], []
+        for (article_id, period), sketch in pending.items():
+            registers = stored.get((article_id, period))
+            if registers is not None:
+                sketch = HyperLogLog.from_bytes(registers, self.precision).merge(sketch)
+                updates.append({'a': article_id, 'p': period, 'r': sketch.to_bytes()})
+            else:
+                inserts.append({'article_id': article_id, 'period': period, 'registers': sketch.to_bytes()})
+
+        if updates:
+            connection.execute(
+                table.update()
+                .where(table.c.article_id == bindparam('a'), table.c.period == bindparam('p'))
+                .values(registers=bindparam('r')),
+                updates
+            )
+        if inserts:
+            connection.execute(table.insert(), inserts)
+
+        # Daily sketches past the retention period are dropped once a day per process
+        today = self.today()
+        if self._pruned_day != today:
+            cutoff = (datetime.utcnow().date() - timedelta(days=self.retention_days)).isoformat()
+            connection.execute(table.delete().where(table.c.period != ALL_TIME, table.c.period < cutoff))
+            self._pruned_day = today
+
+    def _sketch(self, article_id, period):
+        from app.extensions import db
+        from app.models import ArticleReaderSketch
+
+        registers = db.session.execute(
+            select(ArticleReaderSketch.registers)
+            .where(ArticleReaderSketch.article_id == article_id, ArticleReaderSketch.period == period)
+        ).scalar()
+        sketch = HyperLogLog.from_bytes(registers, self.precision) if registers else HyperLogLog(self.precision)
+        with self._lock:
+            pending = self._pending.get((article_id, period))
+            if pending is not None:
+                sketch.merge(pending)
+        return sketch
+
+    def estimate(self, article_id):
+        """
+        Estimated unique readers of an article
+
+        Returns:
+            dict: {'today': int, 'total': int}
+        """
+        return {
+            'today': self._sketch(article_id, self.today()).count(),
+            'total': self._sketch(article_id, ALL_TIME).count()
+        }
+
+    def stats(self):
+        """Sketch metrics for monitoring"""
+        return {
+            'recorded': self.recorded,
+            'pending_sketches': len(self._pending),
+            'sketches_written': self.sketches_written,
+            'sketch_bytes': 1 << self.precision
+        }
@@ -0,0 +1,253 @@
+"""
+Upload directory reconciler
+
+Files in static/uploads/news that no article or image_blobs row refers to
+(images of a create that was rolled back, raw uploads left in .staging by a
+crashed worker, temp files of an interrupted write) are found by streaming
+the directory with ``os.scandir`` and checking the names against the
+database UPLOAD_RECONCILE_BATCH at a time, so memory use doesn't grow with
+the number of files.
+
+An orphan older than UPLOAD_RECONCILE_GRACE is first moved to a
+``.quarantine`` folder next to it, where it 404s but can still be put
+back. A quarantined file is deleted once it has been there for another
+grace period and is still unreferenced; if something refers to it again it
+is restored instead. Articles whose image file is missing are reported.
+
+Runs every UPLOAD_RECONCILE_INTERVAL seconds in one worker process (see
+PeriodicTask), or with ``flask news reconcile-uploads``.
+"""
+import os
+import re
+import threading
+import time
+from app.utils.image_handler import get_upload_folder, get_staging_folder
+from app.utils.periodic import PeriodicTask
+
+QUARANTINE = '.quarantine'
+VARIANT_SUFFIX_RE = re.compile(r'_w\d+$')
+
+
+def _age(entry, now):
+    # ctime also changes on rename, so files just moved aside (.gc, quarantine) count as new
+    stat = entry.stat()
+    return now - max(stat.st_mtime, stat.st_ctime)
+
+
+def _batches(entries, size):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _files(directory):
+    """Regular files in a directory, skipping hidden entries (.staging, .quarantine, .gitkeep)"""
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.startswith('.') and entry.is_file(follow_symlinks=False):
+                    yield entry
+    except FileNotFoundError:
+        return
+
+
+class UploadReconciler:
+    """Quarantines and deletes uploaded files the database doesn't know about"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 24 * 3600
+        self.grace = 24 * 3600
+        self.batch_size = 500
+        self.extensions = frozenset()
+        self._lock = threading.Lock()
+        self._task = PeriodicTask('upload-reconciler', self._run_scheduled, 'Upload reconciliation')
+        self.quarantined = 0
+        self.deleted = 0
+        self.freed_bytes = 0
+        self.missing = 0
+        self.last_run = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('UPLOAD_RECONCILE_INTERVAL', 24 * 3600)
+        self.grace = app.config.get('UPLOAD_RECONCILE_GRACE', 24 * 3600)
+        self.batch_size = app.config.get('UPLOAD_RECONCILE_BATCH', 500)
+        self.extensions = frozenset(app.config.get('ALLOWED_EXTENSIONS', ())) | {'jpg', 'webp'}
+        app.extensions['upload_reconciler'] = self
+        self._task.init_app(app, self.interval)
+
+    def reconcile(self, grace=None, dry_run=False, on_orphan=None, on_missing=None):
+        """
+        Quarantine orphaned uploads, delete expired quarantined ones and find missing files
+
+        Args:
+            grace: Seconds a file must be unreferenced before each step (default UPLOAD_RECONCILE_GRACE)
+            dry_run: Only report, don't move or delete anything
+            on_orphan: Called as ``on_orphan(path)`` for each orphan found
+            on_missing: Called as ``on_missing(article_id, filename)`` for each missing image
+
+        Returns:
+            dict: Counts of scanned, quarantined, restored, deleted and missing files and freed bytes
+        """
+        grace = self.grace if grace is None else grace
+        report = dict.fromkeys(('scanned', 'quarantined', 'restored', 'deleted', 'missing', 'freed_bytes'), 0)
+        upload_folder = get_upload_folder()
+        for directory, staging in ((upload_folder, False), (get_staging_folder(), True)):
+            self._sweep_quarantine(directory, staging, grace, dry_run, report)
+            self._scan(directory, staging, grace, dry_run, report, on_orphan)
+        self._find_missing(upload_folder, report, on_missing)
+        if dry_run:
+            return report
+
+        with self._lock:
+            self.quarantined += report['quarantined']
+            self.deleted += report['deleted']
+            self.freed_bytes += report['freed_bytes']
+            self.missing = report['missing']
+            self.last_run = time.time()
+        return report
+
+    def stats(self):
+        """Reconciler metrics for monitoring"""
+        return {
+            'quarantined': self.quarantined,
+            'deleted': self.deleted,
+            'freed_bytes': self.freed_bytes,
+            'missing': self.missing,
+            'last_run': self.last_run,
+            'scheduled': self._task.leader
+        }
+
+    def _owners(self, name, staging):
+        """Names an article or image_blobs row would use for the image a file belongs to"""
+        if staging:
+            return (name,)
+        if name.endswith('.gc'):
+            # Set aside by the ImageCollector
+            name = name[:-3]
+        if '.tmp' in name or '.' not in name:
+            # Leftover of an interrupted write
+            return ()
+        stem, ext = name.rsplit('.', 1)
+        stem = VARIANT_SUFFIX_RE.sub('', stem)
+        if ext.lower() == 'webp':
+            # The WebP copy of a .jpg/.png/... image
+            return tuple(f'{stem}.{extension}' for extension in self.extensions)
+        return (f'{stem}.{ext}',)
+
+    def _referenced(self, names, staging):
+        """The subset of ``names`` the database refers to"""
+        from app.extensions import db
+        from app.models import NewsArticle, ImageBlob
+
+        names = list(names)
+        found = set()
+        for start in range(0, len(names), self.batch_size):
+            chunk = names[start:start + self.batch_size]
+            found.update(db.session.execute(
+                db.select(NewsArticle.image_filename).where(NewsArticle.image_filename.in_(chunk))
+            ).scalars())
+            if not staging:
+                found.update(db.session.execute(
+                    db.select(ImageBlob.filename).where(ImageBlob.filename.in_(chunk))
+                ).scalars())
+        db.session.commit()
+        return found
+
+    def _resolve(self, batch, staging):
+        """[(entry, referenced)] for a batch of directory entries"""
+        owners = [(entry, self._owners(entry.name, staging)) for entry in batch]
+        referenced = self._referenced({name for _, names in owners for name in names}, staging)
+        return [(entry, any(name in referenced for name in names)) for entry, names in owners]
+
+    def _scan(self, directory, staging, grace, dry_run, report, on_orphan):
+        now = time.time()
+        quarantine = os.path.join(directory, QUARANTINE)
+        # Files younger than the grace period may belong to an upload that isn't committed yet
+        candidates = (entry for entry in _files(directory) if _age(entry, now) >= grace)
+        for batch in _batches(candidates, self.batch_size):
+            report['scanned'] += len(batch)
+            for entry, referenced in self._resolve(batch, staging):
+                if referenced:
+                    continue
+                if on_orphan is not None:
+                    on_orphan(entry.path)
+                if dry_run:
+                    report['quarantined'] += 1
+                    continue
+                os.makedirs(quarantine, exist_ok=True)
+                try:
+                    target = os.path.join(quarantine, entry.name)
+                    os.replace(entry.path, target)
+                    os.utime(target)
+                except FileNotFoundError:
+                    # Removed meanwhile (collector, another worker)
+                    continue
+                report['quarantined'] += 1
+
+    def _sweep_quarantine(self, directory, staging, grace, dry_run, report):
+        now = time.time()
+        candidates = (entry for entry in _files(os.path.join(directory, QUARANTINE)) if _age(entry, now) >= grace)
+        for batch in _batches(candidates, self.batch_size):
+            for entry, referenced in self._resolve(batch, staging):
+                if dry_run:
+                    continue
+                if referenced:
+                    # Referenced again (e.g. a restored backup), so it goes back unless replaced meanwhile
+                    original = os.path.join(directory, entry.name)
+                    try:
+                        if os.path.exists(original):
+                            os.remove(entry.path)
+                        else:
+                            os.replace(entry.path, original)
+                    except FileNotFoundError:
+                        continue
+                    report['restored'] += 1
+                    continue
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+                report['deleted'] += 1
+                report['freed_bytes'] += size
+                if not staging:
+                    image_cache = self.app.extensions.get('image_cache')
+                    if image_cache is not None:
+                        image_cache.discard(entry.name)
+
+    def _run_scheduled(self):
+        report = self.reconcile()
+        if report['missing']:
+            self.app.logger.warning(f"{report['missing']} news images are missing from the upload folder")
+
+    def _find_missing(self, upload_folder, report, on_missing):
+        from app.extensions import db
+        from app.models import NewsArticle
+
+        last_id = 0
+        while True:
+            # Keyset pages keep each query and the memory use small
+            rows = db.session.execute(
+                db.select(NewsArticle.id, NewsArticle.image_filename)
+                .where(NewsArticle.id > last_id, NewsArticle.image_filename.isnot(None),
+                       NewsArticle.image_pending.is_(False))
+                .order_by(NewsArticle.id).limit(self.batch_size)
+            ).all()
+            db.session.commit()
+            if not rows:
+                break
+            for article_id, filename in rows:
+                if not os.path.exists(os.path.join(upload_folder, filename)):
+                    report['missing'] += 1
+                    if on_missing is not None:
+                        on_missing(article_id, filename)
+            last_id = rows[-1].id
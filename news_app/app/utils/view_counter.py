@@ -0,0 +1,147 @@
+"""
+Write-behind view counter for news articles
+
+Article views are buffered in memory per worker process and written as
+batched ``UPDATE news_articles SET views = views + n`` statements, either on a
+timer or once enough views have piled up. Pending views are flushed when the
+process exits. Other components (e.g. trending) can subscribe to the flushed
+batches and write their own aggregates in the same transaction.
+"""
+import atexit
+import os
+import threading
+import time
+from sqlalchemy import text
+
+
+class ViewCounter:
+    """Buffered article view aggregator"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_interval = 10
+        self.flush_threshold = 500
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_total = 0
+        self._pid = None
+        self._timer = None
+        self._flushed_total = 0
+        self._last_flush = None
+        self._flush_listeners = []
+        self._exit_hook = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the counter to an application and register the exit hook"""
+        self.app = app
+        self.flush_interval = app.config.get('VIEW_COUNTER_FLUSH_INTERVAL', 10)
+        self.flush_threshold = app.config.get('VIEW_COUNTER_FLUSH_THRESHOLD', 500)
+        app.extensions['view_counter'] = self
+        if not self._exit_hook:
+            # One hook per counter, however many apps it's bound to (tests, CLI)
+            atexit.register(self.flush)
+            self._exit_hook = True
+
+    def record(self, article_id, count=1):
+        """Buffer a view for an article, flushing if the buffer is full"""
+        if not self.flush_interval:
+            # Write-through mode (used in tests and single-process debugging)
+            self._write({article_id: count})
+            return
+
+        with self._lock:
+            self._check_fork()
+            self._pending[article_id] = self._pending.get(article_id, 0) + count
+            self._pending_total += count
+            should_flush = self._pending_total >= self.flush_threshold
+            self._ensure_timer()
+
+        if should_flush:
+            self.flush()
+
+    def add_flush_listener(self, listener):
+        """Call ``listener(connection, batch)`` with every flushed {article_id: views} batch"""
+        self._flush_listeners.append(listener)
+
+    def pending_for(self, article_id):
+        """Number of buffered views not yet written for an article"""
+        return self._pending.get(article_id, 0)
+
+    @property
+    def pending(self):
+        """Total number of buffered views waiting to be flushed"""
+        return self._pending_total
+
+    def stats(self):
+        """Counter metrics for monitoring"""
+        return {
+            'pending_views': self._pending_total,
+            'pending_articles': len(self._pending),
+            'flushed_views': self._flushed_total,
+            'last_flush': self._last_flush
+        }
+
+    def flush(self):
+        """
+        Write all buffered views to the database
+
+        Returns:
+            int: Number of views written
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = self._pending
+            self._pending = {}
+            self._pending_total = 0
+
+        try:
+            self._write(batch)
+        except Exception as e:
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                for article_id, count in batch.items():
+                    self._pending[article_id] = self._pending.get(article_id, 0) + count
+                    self._pending_total += count
+            if self.app:
+                self.app.logger.warning(f"Could not flush article views: {e}")
+            return 0
+
+        return sum(batch.values())
+
+    def _write(self, batch):
+        from app.extensions import db
+
+        params = [{'id': article_id, 'n': count} for article_id, count in batch.items()]
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(
+                    text("UPDATE news_articles SET views = COALESCE(views, 0) + :n WHERE id = :id"),
+                    params
+                )
+                for listener in self._flush_listeners:
+                    listener(connection, batch)
+        with self._lock:
+            self._flushed_total += sum(batch.values())
+            self._last_flush = time.time()
+
+    def _check_fork(self):
+        # Buffers and timers don't survive a fork (e.g. gunicorn preload)
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._pending = {}
+            self._pending_total = 0
+            self._timer = None
+
+    def _ensure_timer(self):
+        if self._timer is None or not self._timer.is_alive():
+            self._timer = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._timer.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
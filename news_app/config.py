@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -16,9 +17,70 @@ class Config:
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+    # Image processing: uploads are resized in a background worker pool
+    IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+    IMAGE_MAX_SIZE = (1200, 800)
+    IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+
+    # Stored images are shared by content hash and reference counted; files nobody has used
+    # for IMAGE_GC_GRACE seconds are removed every IMAGE_GC_INTERVAL seconds (0 = only `flask news gc-images`)
+    IMAGE_GC_INTERVAL = int(os.environ.get('IMAGE_GC_INTERVAL', 3600))
+    IMAGE_GC_GRACE = int(os.environ.get('IMAGE_GC_GRACE', 24 * 3600))
+
+    # Uploaded files nothing refers to are quarantined, then deleted, each after UPLOAD_RECONCILE_GRACE
+    # seconds; checked every UPLOAD_RECONCILE_INTERVAL seconds (0 = only `flask news reconcile-uploads`)
+    UPLOAD_RECONCILE_INTERVAL = int(os.environ.get('UPLOAD_RECONCILE_INTERVAL', 24 * 3600))
+    UPLOAD_RECONCILE_GRACE = int(os.environ.get('UPLOAD_RECONCILE_GRACE', 24 * 3600))
+    UPLOAD_RECONCILE_BATCH = 500  # Names checked per query
+    # The GC and reconciler run in whichever worker holds their lock file here (unset = instance folder);
+    # with several hosts, set both intervals to 0 and run the commands from one cron job
+    PERIODIC_LOCK_DIR = os.environ.get('PERIODIC_LOCK_DIR')
+
+    # Cropped thumbnails served from /img/<width>x<height>/<filename>, generated on first request
+    # and kept on disk in IMAGE_CACHE_DIR (unset = instance folder) up to IMAGE_CACHE_MAX_BYTES
+    # (least recently used files are evicted)
+    IMAGE_DERIVATIVE_SIZES = ((96, 64), (192, 128), (320, 200), (640, 400))
+    IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR')
+    IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+    # Rendered article cache (set ARTICLE_CACHE_DIR to share it between workers)
+    ARTICLE_CACHE_SIZE = 256
+    ARTICLE_CACHE_TTL = 300
+    ARTICLE_CACHE_DIR = os.environ.get('ARTICLE_CACHE_DIR')
+
+    # Full-page cache for anonymous visitors (per process, invalidated by article/category tags)
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    PAGE_CACHE_ENDPOINTS = ('news.index', 'news.article', 'news.search')
+    PAGE_CACHE_TTL = 60  # Seconds; also the max-age sent to browsers and proxies
+    PAGE_CACHE_SIZE = 512
+    PAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024  # Compressed bodies
+
+    # Trending: hourly view buckets over a sliding window, ranked with exponential decay
+    TRENDING_WINDOW_HOURS = 48
+    TRENDING_HALF_LIFE_HOURS = 6
+    TRENDING_SIZE = 5
+    TRENDING_REFRESH_SECONDS = 60  # How long each process reuses its ranking
+
+    # Unique readers: HyperLogLog sketches of 2 ** precision bytes per article and day
+    UNIQUE_READERS_PRECISION = 12  # 4 KB per sketch, ~1.6% standard error
+    UNIQUE_READERS_RETENTION_DAYS = 90
+
+    # Related articles (TF-IDF neighbours, refreshed in the background when articles are saved)
+    RELATED_ARTICLES_COUNT = 3
+    RELATED_ARTICLES_MIN_SCORE = 0.05
+    # Every refresh loads all published articles and rebuilds the TF-IDF matrix (O(corpus)), so saves
+    # made while one is queued or running are coalesced into the next; one worker is enough
+    RELATED_ARTICLES_WORKERS = 1  # 0 refreshes inline
+
     # Pagination
     ARTICLES_PER_PAGE = 12
     SEARCH_RESULTS_PER_PAGE = 20
+    MESSAGES_PER_PAGE = 25
+    JOB_APPLICATIONS_PER_PAGE = 20
+
+    # View counter: buffered views are flushed every N seconds or after N views
+    VIEW_COUNTER_FLUSH_INTERVAL = int(os.environ.get('VIEW_COUNTER_FLUSH_INTERVAL', 10))
+    VIEW_COUNTER_FLUSH_THRESHOLD = int(os.environ.get('VIEW_COUNTER_FLUSH_THRESHOLD', 500))
 
     # Flask-Login
     REMEMBER_COOKIE_DURATION = timedelta(days=7)
@@ -27,6 +89,33 @@ class Config:
     # WTForms
     WTF_CSRF_ENABLED = True
 
+    # Password hashing: algorithm is pbkdf2:sha256 or scrypt, cost is PBKDF2 iterations or
+    # scrypt N (unset = werkzeug default). Find a cost for this host with `flask auth hash-benchmark`
+    PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM', 'pbkdf2:sha256')
+    PASSWORD_HASH_COST = int(os.environ['PASSWORD_HASH_COST']) if os.environ.get('PASSWORD_HASH_COST') else None
+    PASSWORD_VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', 0))  # 0 = min(4, CPU count)
+    PASSWORD_VERIFY_QUEUE = int(os.environ.get('PASSWORD_VERIFY_QUEUE', 8))  # Waiting verifications before rejecting
+    PASSWORD_VERIFY_TIMEOUT = 10  # Seconds
+
+    # Login throttling: token buckets per client IP and per username, as attempts/seconds.
+    # LOGIN_THROTTLE_STORAGE (a SQLite file path) shares the buckets between worker processes
+    LOGIN_THROTTLE_ENABLED = os.environ.get('LOGIN_THROTTLE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    LOGIN_THROTTLE_IP_LIMIT = os.environ.get('LOGIN_THROTTLE_IP_LIMIT', '20/300')
+    LOGIN_THROTTLE_USER_LIMIT = os.environ.get('LOGIN_THROTTLE_USER_LIMIT', '5/300')
+    LOGIN_THROTTLE_STORAGE = os.environ.get('LOGIN_THROTTLE_STORAGE')
+
+    # Number of proxies in front of the app that append to X-Forwarded-For (0 = not behind a proxy).
+    # Only trust as many hops as there really are, or clients can pick their own address
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+
+    # Flask-Login user snapshots (per process); other workers see user changes after the TTL
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))  # 0 disables the cache
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))  # Seconds
+
+    # Performance instrumentation
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '').lower() in ('1', 'true', 'yes')
+    INSTRUMENTATION_WINDOW = 200  # Requests kept per endpoint for the rolling summary
+
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -40,10 +129,30 @@ class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI') or \
         'sqlite:///' + os.path.join(basedir, 'news_app.db')
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 1))  # Render's load balancer
+
+
+class TestingConfig(Config):
+    """Test configuration (see tests/conftest.py)"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'  # A new in-memory database per app
+    WTF_CSRF_ENABLED = False
+    PASSWORD_HASH_COST = 1000
+    LOGIN_THROTTLE_ENABLED = False
+    PAGE_CACHE_ENABLED = False
+    IMAGE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'news_app-test-image-cache')
+
+    # Background work runs inline, or only when a test calls it
+    IMAGE_PROCESSING_WORKERS = 0
+    RELATED_ARTICLES_WORKERS = 0
+    VIEW_COUNTER_FLUSH_INTERVAL = 0
+    IMAGE_GC_INTERVAL = 0
+    UPLOAD_RECONCILE_INTERVAL = 0
 
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
@@ -45,6 +45,23 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# Search index tables managed outside the models (see app/utils/search.py): the
+# FTS5 table with its shadow tables on SQLite, the tsvector table on PostgreSQL
+UNMANAGED_TABLES = ('news_articles_fts', 'news_articles_search')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate from dropping the search index tables"""
+    if type_ == 'table':
+        table_name = name
+    elif type_ in ('index', 'column', 'unique_constraint', 'foreign_key_constraint'):
+        table_name = object.table.name
+    else:
+        return True
+    return not any(table_name == unmanaged or table_name.startswith(f'{unmanaged}_')
+                   for unmanaged in UNMANAGED_TABLES)
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -65,7 +82,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +111,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
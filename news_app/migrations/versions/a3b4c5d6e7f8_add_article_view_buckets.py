@@ -0,0 +1,32 @@
+"""Add hourly article view buckets for trending
+
+Revision ID: a3b4c5d6e7f8
+Revises: f2a3b4c5d6e7
+Create Date: 2026-02-13 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a3b4c5d6e7f8'
+down_revision = 'f2a3b4c5d6e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'article_view_buckets',
+        sa.Column('article_id', sa.Integer(), nullable=False),
+        sa.Column('slot', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('hour', sa.Integer(), nullable=False),
+        sa.Column('views', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['article_id'], ['news_articles.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('article_id', 'slot')
+    )
+    op.create_index(op.f('ix_article_view_buckets_hour'), 'article_view_buckets', ['hour'])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_article_view_buckets_hour'), table_name='article_view_buckets')
+    op.drop_table('article_view_buckets')
@@ -0,0 +1,71 @@
+"""Move desired jobs to user_jobs table
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-02-04 09:00:00.000000
+
+"""
+import json
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a7b8c9d0e1f2'
+down_revision = 'f6a7b8c9d0e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    user_jobs = op.create_table('user_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('job_title', sa.String(length=50), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'job_title', name='unique_job_per_user')
+    )
+    op.create_index(op.f('ix_user_jobs_user_id'), 'user_jobs', ['user_id'], unique=False)
+    op.create_index(op.f('ix_user_jobs_job_title'), 'user_jobs', ['job_title'], unique=False)
+
+    # Migrate existing data: one row per job in the JSON array
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        "SELECT id, desired_jobs FROM users WHERE desired_jobs IS NOT NULL"
+    )).fetchall()
+    now = datetime.utcnow()
+    selections = []
+    for user_id, desired_jobs in rows:
+        try:
+            jobs = json.loads(desired_jobs)
+        except (TypeError, ValueError):
+            continue
+        for job in list(dict.fromkeys(jobs))[:3]:
+            selections.append({'user_id': user_id, 'job_title': job, 'created_at': now})
+    if selections:
+        op.bulk_insert(user_jobs, selections)
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('desired_jobs')
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('desired_jobs', sa.Text(), nullable=True))
+
+    # Migrate data back: rebuild the JSON array per user
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        "SELECT user_id, job_title FROM user_jobs ORDER BY user_id, id"
+    )).fetchall()
+    jobs_by_user = {}
+    for user_id, job_title in rows:
+        jobs_by_user.setdefault(user_id, []).append(job_title)
+    for user_id, jobs in jobs_by_user.items():
+        connection.execute(sa.text("UPDATE users SET desired_jobs = :jobs WHERE id = :id"),
+                           {'jobs': json.dumps(jobs), 'id': user_id})
+
+    op.drop_index(op.f('ix_user_jobs_job_title'), table_name='user_jobs')
+    op.drop_index(op.f('ix_user_jobs_user_id'), table_name='user_jobs')
+    op.drop_table('user_jobs')
@@ -0,0 +1,29 @@
+"""Add HyperLogLog unique reader sketches
+
+Revision ID: b4c5d6e7f8a9
+Revises: a3b4c5d6e7f8
+Create Date: 2026-02-14 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'b4c5d6e7f8a9'
+down_revision = 'a3b4c5d6e7f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'article_reader_sketches',
+        sa.Column('article_id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=10), nullable=False),
+        sa.Column('registers', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['article_id'], ['news_articles.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('article_id', 'period')
+    )
+
+
+def downgrade():
+    op.drop_table('article_reader_sketches')
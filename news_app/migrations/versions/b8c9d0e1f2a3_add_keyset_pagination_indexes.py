@@ -0,0 +1,26 @@
+"""Add keyset pagination indexes
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-02-05 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'b8c9d0e1f2a3'
+down_revision = 'a7b8c9d0e1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_news_articles_listing', 'news_articles', ['is_published', 'publish_date', 'id'], unique=False)
+    op.create_index('ix_messages_recipient_created_at', 'messages', ['recipient_id', 'created_at'], unique=False)
+    op.create_index('ix_job_applications_status_created_at', 'job_applications', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_applications_status_created_at', table_name='job_applications')
+    op.drop_index('ix_messages_recipient_created_at', table_name='messages')
+    op.drop_index('ix_news_articles_listing', table_name='news_articles')
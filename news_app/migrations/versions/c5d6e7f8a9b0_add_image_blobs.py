@@ -0,0 +1,50 @@
+"""Add reference counts for stored news images
+
+Revision ID: c5d6e7f8a9b0
+Revises: b4c5d6e7f8a9
+Create Date: 2026-02-15 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'c5d6e7f8a9b0'
+down_revision = 'b4c5d6e7f8a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'image_blobs',
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('refcount', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('released_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('filename')
+    )
+    op.create_index('ix_image_blobs_released_at', 'image_blobs', ['released_at'])
+
+    # Existing uploads keep their names; count the articles using each one
+    news_articles = sa.table(
+        'news_articles',
+        sa.column('image_filename', sa.String),
+        sa.column('image_pending', sa.Boolean)
+    )
+    image_blobs = sa.table(
+        'image_blobs',
+        sa.column('filename', sa.String),
+        sa.column('refcount', sa.Integer),
+        sa.column('created_at', sa.DateTime)
+    )
+    op.execute(image_blobs.insert().from_select(
+        ['filename', 'refcount', 'created_at'],
+        sa.select(news_articles.c.image_filename, sa.func.count(), sa.func.current_timestamp())
+        .where(news_articles.c.image_filename.isnot(None), news_articles.c.image_pending == sa.false())
+        .group_by(news_articles.c.image_filename)
+    ))
+
+
+def downgrade():
+    op.drop_index('ix_image_blobs_released_at', table_name='image_blobs')
+    op.drop_table('image_blobs')
@@ -0,0 +1,26 @@
+"""Add image processing state and variants to news articles
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2026-02-06 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'c9d0e1f2a3b4'
+down_revision = 'b8c9d0e1f2a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('news_articles') as batch_op:
+        batch_op.add_column(sa.Column('image_pending', sa.Boolean(), nullable=False, server_default=sa.false()))
+        batch_op.add_column(sa.Column('image_variants', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('news_articles') as batch_op:
+        batch_op.drop_column('image_variants')
+        batch_op.drop_column('image_pending')
@@ -0,0 +1,29 @@
+"""Add per-year citizen ID counters
+
+Revision ID: d0e1f2a3b4c5
+Revises: c9d0e1f2a3b4
+Create Date: 2026-02-09 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd0e1f2a3b4c5'
+down_revision = 'c9d0e1f2a3b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Counters are seeded from existing citizen IDs the first time a year is used.
+    # PostgreSQL uses per-year sequences (citizen_id_seq_<year>) created the same way.
+    op.create_table(
+        'citizen_id_counters',
+        sa.Column('year', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('year')
+    )
+
+
+def downgrade():
+    op.drop_table('citizen_id_counters')
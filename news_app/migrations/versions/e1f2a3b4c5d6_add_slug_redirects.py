@@ -0,0 +1,47 @@
+"""Add slug redirects and prefix indexes for slug allocation
+
+Revision ID: e1f2a3b4c5d6
+Revises: d0e1f2a3b4c5
+Create Date: 2026-02-10 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'e1f2a3b4c5d6'
+down_revision = 'd0e1f2a3b4c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'slug_redirects',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('old_slug', sa.String(length=200), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'old_slug', name='unique_old_slug_per_kind')
+    )
+    op.create_index('ix_slug_redirects_target', 'slug_redirects', ['kind', 'target_id'])
+
+    # LIKE 'base-%' can only use a btree index with pattern ops under non-C collations
+    # (SQLite uses GLOB on the existing slug indexes instead)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index('ix_news_articles_slug_pattern', 'news_articles', ['slug'],
+                        postgresql_ops={'slug': 'text_pattern_ops'})
+        op.create_index('ix_news_categories_slug_pattern', 'news_categories', ['slug'],
+                        postgresql_ops={'slug': 'text_pattern_ops'})
+        op.create_index('ix_slug_redirects_old_slug_pattern', 'slug_redirects', ['old_slug'],
+                        postgresql_ops={'old_slug': 'text_pattern_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_slug_redirects_old_slug_pattern', table_name='slug_redirects')
+        op.drop_index('ix_news_categories_slug_pattern', table_name='news_categories')
+        op.drop_index('ix_news_articles_slug_pattern', table_name='news_articles')
+    op.drop_index('ix_slug_redirects_target', table_name='slug_redirects')
+    op.drop_table('slug_redirects')
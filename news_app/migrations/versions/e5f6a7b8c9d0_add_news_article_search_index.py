@@ -0,0 +1,54 @@
+"""Add full-text search index for news articles
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-02-02 10:00:00.000000
+
+"""
+from alembic import op
+
+revision = 'e5f6a7b8c9d0'
+down_revision = 'd4e5f6a7b8c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 virtual table on SQLite, tsvector + GIN index on PostgreSQL.
+    # The SQL is inlined so this revision doesn't change with app/utils/search.py.
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS news_articles_fts "
+            "USING fts5(title, summary, content, tokenize='porter unicode61')"
+        )
+        op.execute(
+            "INSERT INTO news_articles_fts (rowid, title, summary, content) "
+            "SELECT id, coalesce(title, ''), coalesce(summary, ''), coalesce(content, '') FROM news_articles"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS news_articles_search ("
+            "article_id INTEGER PRIMARY KEY REFERENCES news_articles(id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_news_articles_search_document "
+            "ON news_articles_search USING GIN (document)"
+        )
+        op.execute(
+            "INSERT INTO news_articles_search (article_id, document) "
+            "SELECT id, "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(summary, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'C') "
+            "FROM news_articles"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS news_articles_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP TABLE IF EXISTS news_articles_search")
@@ -0,0 +1,36 @@
+"""Add precomputed related articles
+
+Revision ID: f2a3b4c5d6e7
+Revises: e1f2a3b4c5d6
+Create Date: 2026-02-12 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'f2a3b4c5d6e7'
+down_revision = 'e1f2a3b4c5d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled by `flask news rebuild-related`, then kept up to date as articles are saved
+    op.create_table(
+        'related_articles',
+        sa.Column('article_id', sa.Integer(), nullable=False),
+        sa.Column('related_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['article_id'], ['news_articles.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['related_id'], ['news_articles.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('article_id', 'related_id')
+    )
+    op.create_index('ix_related_articles_lookup', 'related_articles', ['article_id', 'rank'])
+    op.create_index('ix_related_articles_related', 'related_articles', ['related_id'])
+
+
+def downgrade():
+    op.drop_index('ix_related_articles_related', table_name='related_articles')
+    op.drop_index('ix_related_articles_lookup', table_name='related_articles')
+    op.drop_table('related_articles')
@@ -0,0 +1,38 @@
+"""Add unread messages counter to user
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-02-03 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'f6a7b8c9d0e1'
+down_revision = 'e5f6a7b8c9d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('unread_messages_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_index('ix_messages_recipient_is_read', 'messages', ['recipient_id', 'is_read'], unique=False)
+
+    # Backfill counters from existing messages
+    connection = op.get_bind()
+    connection.execute(sa.text("""
+        UPDATE users
+        SET unread_messages_count = (
+            SELECT COUNT(*) FROM messages
+            WHERE messages.recipient_id = users.id AND messages.is_read = :false
+        )
+    """), {'false': False})
+
+
+def downgrade():
+    op.drop_index('ix_messages_recipient_is_read', table_name='messages')
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('unread_messages_count')
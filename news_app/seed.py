@@ -4,7 +4,7 @@ Creates sample data including admin user, categories, and news articles
 """
 from app import create_app
 from app.extensions import db
-from app.models import User, NewsCategory, NewsArticle
+from app.models import User, NewsCategory, NewsArticle, CitizenIdCounter, SlugRedirect
 from datetime import datetime, timedelta
 
 app = create_app()
@@ -16,11 +16,13 @@ with app.app_context():
     print("Clearing existing data...")
     NewsArticle.query.delete()
     NewsCategory.query.delete()
+    SlugRedirect.query.delete()  # Bulk deletes skip drop_redirects
     User.query.delete()
+    CitizenIdCounter.reset()  # Counter rows, and the per-year sequences on PostgreSQL
     db.session.commit()
 
-    # Create admin user (President of Fiascha)
-    print("Creating admin user...")
+    # Create users; citizen IDs are reserved as one block and everything is committed once
+    print("Creating users...")
     admin = User(
         username='admin',
         email='admin@fiascha.com',
@@ -30,13 +32,7 @@ with app.app_context():
         is_active=True
     )
     admin.set_password('admin123')  # Change this in production!
-    admin.generate_citizen_id()
-    db.session.add(admin)
-    db.session.commit()
-    print(f"[OK] President created (username: admin, password: admin123, ID: {admin.citizen_id})")
 
-    # Create journalist user
-    print("Creating journalist user...")
     journalist = User(
         username='journalist',
         email='journalist@fiascha.com',
@@ -46,13 +42,7 @@ with app.app_context():
         is_active=True
     )
     journalist.set_password('journalist123')
-    journalist.generate_citizen_id()
-    db.session.add(journalist)
-    db.session.commit()
-    print(f"[OK] Journalist created (username: journalist, password: journalist123, ID: {journalist.citizen_id})")
 
-    # Create regular citizen
-    print("Creating regular citizen...")
     citizen = User(
         username='john',
         email='john@fiascha.com',
@@ -62,9 +52,13 @@ with app.app_context():
         is_active=True
     )
     citizen.set_password('password123')
-    citizen.generate_citizen_id()
-    db.session.add(citizen)
+
+    users = [admin, journalist, citizen]
+    User.assign_citizen_ids(users)
+    db.session.add_all(users)
     db.session.commit()
+    print(f"[OK] President created (username: admin, password: admin123, ID: {admin.citizen_id})")
+    print(f"[OK] Journalist created (username: journalist, password: journalist123, ID: {journalist.citizen_id})")
     print(f"[OK] Citizen created (username: john, password: password123, ID: {citizen.citizen_id})")
 
     # Create categories
@@ -0,0 +1,103 @@
+import pytest
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from app import create_app
+from app.extensions import db, user_cache, article_cache
+from app.models import User, NewsArticle, NewsCategory
+
+
+class QueryCounter:
+    """Records the SQL statements an engine executes while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+class RequestClient(FlaskClient):
+    """Runs each request in its own app context, as a server does, instead of the test's"""
+
+    def open(self, *args, **kwargs):
+        with self.application.app_context():
+            return super().open(*args, **kwargs)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('testing')
+    app.test_client_class = RequestClient
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    with app.app_context():
+        db.create_all()
+        # Per-process caches outlive the app; start every test empty
+        user_cache.clear()
+        article_cache.clear()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """``with queries() as counter:`` counts the statements run inside the block"""
+    return lambda: QueryCounter(db.engine)
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username, is_admin=False):
+        user = User(username=username, email=f'{username}@example.com', is_admin=is_admin)
+        user.set_password('password')
+        user.generate_citizen_id()
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def make_category(app):
+    def make_category(name, color='#3498db'):
+        category = NewsCategory(name=name, color=color)
+        category.generate_slug()
+        db.session.add(category)
+        db.session.commit()
+        return category
+    return make_category
+
+
+@pytest.fixture
+def make_article(app):
+    def make_article(title, category, author, **fields):
+        fields = {'summary': 'Summary', 'content': f'<p>{title} body</p>', 'is_published': True, **fields}
+        article = NewsArticle(title=title, category_id=category.id, author_id=author.id, **fields)
+        article.generate_slug()
+        db.session.add(article)
+        db.session.commit()
+        return article
+    return make_article
+
+
+def login(client, username):
+    response = client.post('/auth/login', data={'username': username, 'password': 'password'})
+    assert response.status_code == 302
+    return response
@@ -0,0 +1,49 @@
+from app.extensions import db
+from tests.conftest import login
+
+
+def test_renamed_category_shows_on_cached_article(client, make_user, make_category, make_article):
+    admin = make_user('admin', is_admin=True)
+    category = make_category('World', color='#112233')
+    article = make_article('Budget Vote', category, admin)
+    url = f'/news/article/{article.slug}'
+    page = client.get(url).get_data(as_text=True)
+    assert 'World' in page and '#112233' in page
+
+    login(client, 'admin')
+    response = client.post(f'/news/categories/edit/{category.id}',
+                           data={'name': 'Politics', 'description': '', 'color': '#445566'})
+    assert response.status_code == 302
+
+    page = client.get(url).get_data(as_text=True)
+    assert 'Politics' in page and '#445566' in page
+    assert 'World' not in page and '#112233' not in page
+
+
+def test_renamed_author_shows_on_cached_article(client, make_user, make_category, make_article):
+    author = make_user('author')
+    article = make_article('Budget Vote', make_category('World'), author)
+    url = f'/news/article/{article.slug}'
+    assert 'By author' in client.get(url).get_data(as_text=True)
+
+    author.full_name = 'Maria Chen'
+    db.session.commit()
+    assert 'By Maria Chen' in client.get(url).get_data(as_text=True)
+
+
+def test_category_edit_changes_the_article_etag(client, make_user, make_category, make_article):
+    admin = make_user('admin', is_admin=True)
+    category = make_category('World')
+    # Enough views that a few more don't change the (coarse) count in the ETag
+    article = make_article('Budget Vote', category, admin, views=50)
+    url = f'/news/article/{article.slug}'
+    reader = client.application.test_client()
+    etag = reader.get(url).headers['ETag']
+    assert reader.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    login(client, 'admin')
+    client.post(f'/news/categories/edit/{category.id}',
+                data={'name': 'Politics', 'description': '', 'color': '#445566'})
+    response = reader.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Politics' in response.get_data(as_text=True)
@@ -0,0 +1,141 @@
+"""
+Citizen ID allocation
+
+The counter-table path runs on SQLite. The sequence path needs PostgreSQL:
+set TEST_POSTGRES_URL to a throwaway database (its tables are dropped).
+"""
+import os
+import pytest
+from sqlalchemy.exc import IntegrityError
+from config import TestingConfig, config
+from app import create_app, models
+from app.extensions import db, user_cache
+from app.models import CitizenIdCounter, User
+
+
+def add_user(username, citizen_id=None):
+    user = User(username=username, email=f'{username}@example.com', citizen_id=citizen_id)
+    user.set_password('password')
+    db.session.add(user)
+    return user
+
+
+def ids(year, *numbers):
+    return [CitizenIdCounter.format(year, number) for number in numbers]
+
+
+def test_counter_allocates_consecutive_blocks(app):
+    assert CitizenIdCounter.allocate(3, year=2091) == ids(2091, 1, 2, 3)
+    db.session.commit()
+    assert CitizenIdCounter.allocate(year=2091) == ids(2091, 4)
+    assert CitizenIdCounter.allocate(year=2092) == ids(2092, 1)
+    db.session.commit()
+    assert db.session.get(CitizenIdCounter, 2091).last_value == 4
+
+
+def test_counter_continues_after_existing_ids(app):
+    add_user('early', 'FSC-2091-041')
+    db.session.commit()
+    assert CitizenIdCounter.allocate(year=2091) == ids(2091, 42)
+
+
+def test_rolled_back_numbers_are_reused_by_the_counter(app):
+    CitizenIdCounter.allocate(year=2091)
+    db.session.commit()
+    assert CitizenIdCounter.allocate(year=2091) == ids(2091, 2)
+    db.session.rollback()
+    assert CitizenIdCounter.allocate(year=2091) == ids(2091, 2)
+
+
+def test_assign_citizen_ids(app):
+    users = [add_user(f'user{i}') for i in range(3)]
+    User.assign_citizen_ids(users)
+    db.session.commit()
+    assert len({user.citizen_id for user in users}) == 3
+    with pytest.raises(IntegrityError):
+        add_user('duplicate', users[0].citizen_id)
+        db.session.commit()
+
+
+def test_reset(app):
+    CitizenIdCounter.allocate(5, year=2091)
+    db.session.commit()
+    CitizenIdCounter.reset()
+    db.session.commit()
+    assert CitizenIdCounter.allocate(year=2091) == ids(2091, 1)
+
+
+POSTGRES_YEARS = (2091, 2092, 2093)
+
+
+@pytest.fixture
+def postgres_app(monkeypatch):
+    url = os.environ.get('TEST_POSTGRES_URL')
+    if not url:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+
+    class PostgresConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = url.replace('postgres://', 'postgresql://', 1)
+    monkeypatch.setitem(config, 'postgres', PostgresConfig)
+    app = create_app('postgres')
+
+    def drop_sequences():
+        for year in POSTGRES_YEARS:
+            db.session.execute(db.text(f"DROP SEQUENCE IF EXISTS citizen_id_seq_{year}"))
+        db.session.commit()
+        models._known_sequences.clear()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        drop_sequences()
+        user_cache.clear()
+        yield app
+        db.session.rollback()
+        drop_sequences()
+        db.session.remove()
+        db.drop_all()
+
+
+def test_sequence_allocates_consecutive_blocks(postgres_app):
+    assert CitizenIdCounter.allocate(3, year=2091) == ids(2091, 1, 2, 3)
+    db.session.commit()
+    assert db.session.execute(db.text("SELECT to_regclass('citizen_id_seq_2091')")).scalar() is not None
+    assert CitizenIdCounter.allocate(2, year=2091) == ids(2091, 4, 5)
+    # No counter rows on PostgreSQL
+    assert CitizenIdCounter.query.count() == 0
+
+
+def test_sequence_skips_rolled_back_numbers(postgres_app):
+    CitizenIdCounter.allocate(year=2091)
+    db.session.commit()
+    assert CitizenIdCounter.allocate(year=2091) == ids(2091, 2)
+    db.session.rollback()
+    assert CitizenIdCounter.allocate(year=2091) == ids(2091, 3)
+
+
+def test_rolled_back_sequence_creation_is_repeated(postgres_app):
+    assert CitizenIdCounter.allocate(year=2091) == ids(2091, 1)
+    db.session.rollback()
+    assert CitizenIdCounter.allocate(year=2091) == ids(2091, 1)
+    db.session.commit()
+
+
+def test_sequence_continues_after_existing_ids(postgres_app):
+    add_user('early', 'FSC-2092-041')
+    db.session.commit()
+    assert CitizenIdCounter.allocate(year=2092) == ids(2092, 42)
+
+
+def test_reset_restarts_sequences(postgres_app):
+    users = [add_user(f'user{i}') for i in range(3)]
+    for user, citizen_id in zip(users, CitizenIdCounter.allocate(3, year=2093)):
+        user.citizen_id = citizen_id
+    CitizenIdCounter.allocate(year=2092)
+    db.session.commit()
+
+    User.query.delete()
+    CitizenIdCounter.reset()
+    db.session.commit()
+    assert CitizenIdCounter.allocate(year=2093) == ids(2093, 1)
+    assert CitizenIdCounter.allocate(year=2092) == ids(2092, 1)
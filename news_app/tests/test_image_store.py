@@ -0,0 +1,125 @@
+import io
+import os
+import pytest
+from PIL import Image
+from app.extensions import db, image_processor, image_collector
+from app.models import ImageBlob, NewsArticle, NewsCategory
+from app.utils import image_handler
+from app.utils.image_handler import get_staging_folder, get_upload_folder, stored_image_paths
+from app.utils.image_store import acquire_image, release_image
+
+
+def jpeg(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (900, 500), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def upload(make_user):
+    """Stage a picture for a new article and process it, as the edit view does"""
+    author = make_user('author')
+    category = NewsCategory(name='Culture')
+    category.generate_slug()
+    db.session.add(category)
+    db.session.commit()
+    staged = 0
+
+    def upload(data):
+        nonlocal staged
+        staged += 1
+        filename = f'staged{staged}.jpg'
+        os.makedirs(get_staging_folder(), exist_ok=True)
+        with open(os.path.join(get_staging_folder(), filename), 'wb') as f:
+            f.write(data)
+        article = NewsArticle(title=f'Article {staged}', content='Body', category_id=category.id,
+                              author_id=author.id, image_filename=filename, image_pending=True)
+        article.generate_slug()
+        db.session.add(article)
+        db.session.commit()
+        image_processor.submit(filename)
+        db.session.refresh(article)
+        return article
+    return upload
+
+
+def blob(filename):
+    db.session.expire_all()
+    return db.session.get(ImageBlob, filename)
+
+
+def stored_files(filename):
+    return [path for path in stored_image_paths(filename) if os.path.exists(path)]
+
+
+def is_stored(filename):
+    # Full size, its WebP copy and the 320/640 variants of a 900px wide picture
+    return len(stored_files(filename)) == 6
+
+
+def test_same_picture_is_stored_once(upload):
+    first = upload(jpeg('red'))
+    second = upload(jpeg('red'))
+    assert not first.image_pending
+    assert first.image_filename == second.image_filename
+    assert blob(first.image_filename).refcount == 2
+    assert is_stored(first.image_filename)
+    assert upload(jpeg('blue')).image_filename != first.image_filename
+
+
+def test_release_and_collect(upload):
+    filename = upload(jpeg('red')).image_filename
+    upload(jpeg('red'))
+
+    assert release_image(filename)
+    db.session.commit()
+    assert blob(filename).refcount == 1
+    assert blob(filename).released_at is None
+    assert image_collector.collect(grace=0) == (0, 0)
+
+    release_image(filename)
+    db.session.commit()
+    assert blob(filename).released_at is not None
+
+    # Not collected before the grace period is over
+    assert image_collector.collect(grace=3600) == (0, 0)
+    collected, freed = image_collector.collect(grace=0)
+    assert collected == 1 and freed > 0
+    assert blob(filename) is None
+    assert stored_files(filename) == []
+    assert not release_image(filename)
+
+
+def test_acquire_revives_a_released_image(upload):
+    filename = upload(jpeg('red')).image_filename
+    release_image(filename)
+    db.session.commit()
+
+    acquire_image(filename)
+    db.session.commit()
+    assert blob(filename).refcount == 1
+    assert blob(filename).released_at is None
+    assert image_collector.collect(grace=0) == (0, 0)
+    assert is_stored(filename)
+
+
+def test_collector_running_during_an_upload_keeps_the_files(upload, monkeypatch):
+    filename = upload(jpeg('red')).image_filename
+    release_image(filename)
+    db.session.commit()
+
+    # The collector fires after the upload found its picture stored, before the article points at it
+    store = image_handler.store_news_image
+    collected = []
+
+    def store_during_collection(*args, **kwargs):
+        collected.append(image_collector.collect(grace=0))
+        return store(*args, **kwargs)
+    monkeypatch.setattr(image_handler, 'store_news_image', store_during_collection)
+
+    article = upload(jpeg('red'))
+    assert collected == [(0, 0)]
+    assert article.image_filename == filename
+    assert blob(filename).refcount == 1
+    assert is_stored(filename)
+    assert not [name for name in os.listdir(get_upload_folder()) if name.endswith('.gc')]
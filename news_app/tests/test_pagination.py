@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+import pytest
+from app.extensions import db
+from app.models import Message
+from app.utils.pagination import approximate_count, decode_cursor, encode_cursor, invalidate_count, \
+    paginate_keyset
+
+KEYS = [(Message.created_at, True), (Message.id, True)]
+
+
+def test_cursor_round_trip():
+    moment = datetime(2026, 3, 1, 12, 30, 15, 250)
+    token = encode_cursor([moment, 42], 'prev', 3)
+    assert '=' not in token
+    assert decode_cursor(token) == ([moment, 42], 'prev', 3)
+
+
+@pytest.mark.parametrize('token', [None, '', 'not-a-cursor', encode_cursor([1], 'sideways', 1)])
+def test_invalid_cursors_are_ignored(token):
+    assert decode_cursor(token) is None
+
+
+@pytest.fixture
+def messages(make_user):
+    sender, recipient = make_user('sender'), make_user('recipient')
+    start = datetime(2026, 1, 1)
+    # Pairs share a timestamp, so pages must break ties on the id
+    for i in range(23):
+        db.session.add(Message(sender_id=sender.id, recipient_id=recipient.id, subject=f'{i}',
+                               content='Hello', created_at=start + timedelta(minutes=i // 2)))
+    db.session.commit()
+    return Message.query.order_by(Message.created_at.desc(), Message.id.desc()).all()
+
+
+def test_pages_forward_and_back(messages):
+    pages, cursor = [], None
+    while True:
+        page = paginate_keyset(Message.query, KEYS, cursor, per_page=5)
+        pages.append(page)
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+
+    assert [len(page.items) for page in pages] == [5, 5, 5, 5, 3]
+    assert [message for page in pages for message in page.items] == messages
+    assert [page.page for page in pages] == [1, 2, 3, 4, 5]
+    assert not pages[0].has_prev
+
+    # Walking back from the last page gives the same pages
+    page = pages[-1]
+    for expected in reversed(pages[:-1]):
+        page = paginate_keyset(Message.query, KEYS, page.prev_cursor, per_page=5)
+        assert page.items == expected.items
+        assert page.page == expected.page
+    assert not page.has_prev and page.has_next
+
+
+def test_cursor_for_other_keys_starts_over(messages):
+    token = encode_cursor([1], 'next', 4)
+    page = paginate_keyset(Message.query, KEYS, token, per_page=5)
+    assert page.page == 1
+    assert page.items == messages[:5]
+
+
+def test_cached_total(messages):
+    query = Message.query
+    page = paginate_keyset(query, KEYS, per_page=5, count=True, count_cache_key='test:messages')
+    assert page.total == 23 and page.pages == 5
+
+    db.session.delete(messages[0])
+    db.session.commit()
+    assert approximate_count(query, 'test:messages') == 23
+    invalidate_count('test:')
+    assert approximate_count(query, 'test:messages') == 22
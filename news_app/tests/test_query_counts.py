@@ -0,0 +1,107 @@
+"""
+Query counts of the list pages
+
+Each page must run the same number of statements for 1 row as for many,
+i.e. related users and categories are loaded with the rows rather than one
+query per row.
+"""
+from datetime import datetime, timedelta
+import pytest
+from app.extensions import db
+from app.models import Message, JobApplication
+from app.utils import search
+from tests.conftest import login
+
+MANY = 30  # More than a page of messages
+
+
+def count_page_queries(client, queries, url):
+    # Warm the user snapshot and the cached totals first, so only the listing differs between runs
+    assert client.get(url).status_code == 200
+    with queries() as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+    return counter.count
+
+
+@pytest.fixture
+def alice(make_user):
+    return make_user('alice')
+
+
+def add_messages(sender, recipient, count):
+    for i in range(count):
+        db.session.add(Message(sender_id=sender.id, recipient_id=recipient.id,
+                               subject=f'Subject {i}', content='Hello'))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('url', ['/messages/', '/messages/sent'])
+def test_message_lists_load_users_with_the_rows(client, queries, alice, make_user, url):
+    login(client, 'alice')
+    first = make_user('bob')
+    add_messages(first, alice, 1)
+    add_messages(alice, first, 1)
+    one = count_page_queries(client, queries, url)
+
+    # Every message from/to a different user, so lazy loads would show up
+    for i in range(MANY):
+        other = make_user(f'user{i}')
+        add_messages(other, alice, 1)
+        add_messages(alice, other, 1)
+    assert count_page_queries(client, queries, url) == one
+
+
+def test_job_application_queue_loads_users_with_the_rows(client, queries, make_user):
+    admin = make_user('admin', is_admin=True)
+    login(client, 'admin')
+
+    def add_applications(count, offset):
+        for i in range(count):
+            applicant = make_user(f'applicant{offset + i}')
+            db.session.add(JobApplication(user_id=applicant.id, job_title='Teacher'))
+            db.session.add(JobApplication(user_id=applicant.id, job_title='Doctor', status='approved',
+                                          reviewed_by=admin.id,
+                                          reviewed_at=datetime.utcnow() - timedelta(minutes=i)))
+        db.session.commit()
+
+    add_applications(1, 0)
+    one = count_page_queries(client, queries, '/job-applications')
+    add_applications(MANY, 1)
+    assert count_page_queries(client, queries, '/job-applications') == one
+
+
+@pytest.fixture
+def add_articles(make_user, make_category, make_article):
+    """Published articles, each by a different author in a different category"""
+    added = 0
+
+    def add_articles(count):
+        nonlocal added
+        for _ in range(count):
+            added += 1
+            make_article(f'Festival report {added}', make_category(f'Category {added}'),
+                         make_user(f'author{added}'), is_featured=True)
+    return add_articles
+
+
+@pytest.mark.parametrize('url', ['/', '/news/', '/news/?featured=1', '/news/search?query=festival'])
+def test_article_lists_load_authors_and_categories_with_the_rows(client, queries, add_articles, url):
+    add_articles(1)
+    one = count_page_queries(client, queries, url)
+    add_articles(MANY)
+    assert count_page_queries(client, queries, url) == one
+
+
+def test_ranked_search_loads_authors_and_categories_with_the_rows(client, queries, add_articles, monkeypatch):
+    # Every test database has the same URL, so don't let "index exists" outlive this one
+    monkeypatch.setattr(search, '_available', set())
+    with db.engine.begin() as connection:
+        search.create_index(connection)
+    add_articles(1)
+    pagination, _ = search.search_articles('festival')
+    assert len(pagination.items) == 1
+    url = '/news/search?query=festival'
+    one = count_page_queries(client, queries, url)
+    add_articles(MANY)
+    assert count_page_queries(client, queries, url) == one
@@ -0,0 +1,77 @@
+import pytest
+from app.extensions import db, related_index
+from app.models import RelatedArticle
+
+TOPICS = ['festival music stage crowd', 'budget parliament vote taxes', 'football league match goal']
+
+
+@pytest.fixture
+def articles(make_user, make_category, make_article):
+    author, category = make_user('author'), make_category('World')
+    made = []
+    for i in range(9):
+        topic = TOPICS[i % 3]
+        # No words shared between topics
+        made.append(make_article(f'{topic.split()[0].title()} {i}', category, author,
+                                 summary=topic, content=f'<p>{topic} {topic}</p>'))
+    return made
+
+
+def stored_neighbours():
+    db.session.expire_all()
+    rows = RelatedArticle.query.order_by(RelatedArticle.article_id, RelatedArticle.rank).all()
+    return [(row.article_id, row.related_id) for row in rows]
+
+
+def test_refresh_follows_an_edited_article(articles):
+    related_index.rebuild()
+    festival, budget = set(a.id for a in articles[3::3]), set(a.id for a in articles[1::3])
+    assert {related for article, related in stored_neighbours() if article == articles[0].id} <= festival
+
+    articles[0].title = 'Budget 0'
+    articles[0].summary = 'budget parliament vote taxes'
+    articles[0].content = '<p>budget parliament vote taxes budget</p>'
+    db.session.commit()
+    related_index.refresh(articles[0].id)
+
+    neighbours = stored_neighbours()
+    assert {related for article, related in neighbours if article == articles[0].id} <= budget
+    # The festival stories that listed it have been recomputed
+    assert not {article for article, related in neighbours if related == articles[0].id} & festival
+
+
+def test_unpublished_article_leaves_every_list(articles):
+    related_index.rebuild()
+    articles[0].is_published = False
+    db.session.commit()
+    related_index.refresh(articles[0].id)
+    assert articles[0].id not in {id for pair in stored_neighbours() for id in pair}
+
+
+def test_queued_saves_are_coalesced(articles, monkeypatch):
+    related_index.rebuild()
+    submitted = []
+
+    class QueueingExecutor:
+        def submit(self, fn, *args):
+            submitted.append((fn, args))
+    monkeypatch.setattr(related_index, 'executor', QueueingExecutor())
+    loads = []
+    load = related_index._load
+    monkeypatch.setattr(related_index, '_load', lambda: loads.append(1) or load())
+
+    for article in articles[:3]:
+        article.is_published = False
+        db.session.commit()
+        related_index.refresh(article.id)
+    assert len(submitted) == 1
+
+    fn, args = submitted.pop()
+    fn(*args)
+    assert loads == [1]
+    remaining = {id for pair in stored_neighbours() for id in pair}
+    assert not remaining & {article.id for article in articles[:3]}
+
+    # The next save queues a new refresh
+    related_index.refresh(articles[3].id)
+    assert len(submitted) == 1
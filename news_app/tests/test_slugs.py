@@ -0,0 +1,78 @@
+import pytest
+from app.extensions import db
+from app.models import NewsArticle, NewsCategory
+from app.utils.slugs import commit_with_unique_slug, drop_redirects, find_redirect, slugify
+
+
+@pytest.fixture
+def new_article(make_user):
+    author = make_user('author')
+    category = NewsCategory(name='Government')
+    category.generate_slug()
+    db.session.add(category)
+    db.session.commit()
+
+    def new_article(title):
+        article = NewsArticle(title=title, content='Body', category_id=category.id, author_id=author.id)
+        article.generate_slug()
+        db.session.add(article)
+        db.session.commit()
+        return article
+    return new_article
+
+
+def test_slugify():
+    assert slugify('  Hello, World!  ') == 'hello-world'
+    assert slugify('!!!') == 'untitled'
+    assert len(slugify('word ' * 100, max_length=50)) <= 50 - 6
+
+
+def test_duplicate_titles_get_the_lowest_free_suffix(new_article):
+    slugs = [new_article('Budget Vote').slug for _ in range(3)]
+    assert slugs == ['budget-vote', 'budget-vote-1', 'budget-vote-2']
+
+    middle = NewsArticle.query.filter_by(slug='budget-vote-1').one()
+    db.session.delete(middle)
+    db.session.commit()
+    assert new_article('Budget Vote').slug == 'budget-vote-1'
+
+
+def test_other_titles_sharing_the_prefix_do_not_count(new_article):
+    new_article('Budget Vote Results')
+    assert new_article('Budget Vote').slug == 'budget-vote'
+
+
+def test_renamed_article_keeps_a_redirect_until_deleted(new_article):
+    article = new_article('Budget Vote')
+    article.title = 'Budget Passed'
+    article.generate_slug()
+    db.session.commit()
+    assert article.slug == 'budget-passed'
+    assert find_redirect(NewsArticle, 'budget-vote') == 'budget-passed'
+
+    # The old slug still belongs to the renamed article
+    assert new_article('Budget Vote').slug == 'budget-vote-1'
+
+    drop_redirects(article)
+    db.session.delete(article)
+    db.session.commit()
+    assert find_redirect(NewsArticle, 'budget-vote') is None
+    assert new_article('Budget Vote').slug == 'budget-vote'
+
+
+def test_unchanged_base_keeps_the_slug(new_article):
+    new_article('Budget Vote')
+    article = new_article('Budget Vote')
+    article.title = 'Budget vote!'
+    article.generate_slug()
+    assert article.slug == 'budget-vote-1'
+
+
+def test_commit_retries_when_the_slug_was_taken_meanwhile(new_article):
+    first = new_article('Budget Vote')
+    article = NewsArticle(title='Budget Vote', content='Body', category_id=first.category_id,
+                          author_id=first.author_id, slug='budget-vote')
+    db.session.add(article)
+    commit_with_unique_slug(article, article.title)
+    assert article.slug == 'budget-vote-1'
+    assert NewsArticle.query.count() == 2
@@ -0,0 +1,61 @@
+import pytest
+from app.extensions import db
+from app.utils.unique_readers import ALL_TIME, HyperLogLog, UniqueReaders, reader_key
+
+
+def sketch_of(values, precision=12):
+    sketch = HyperLogLog(precision)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+@pytest.mark.parametrize('distinct', [10, 1000, 50000])
+def test_estimate_error(distinct):
+    # 1.6% standard error at precision 12; allow three of them
+    estimate = sketch_of(f'reader-{i}' for i in range(distinct)).count()
+    assert abs(estimate - distinct) <= max(1, 0.05 * distinct)
+
+
+def test_repeated_readers_count_once():
+    sketch = sketch_of(f'reader-{i % 100}' for i in range(10000))
+    assert abs(sketch.count() - 100) <= 2
+
+
+def test_merge_is_a_union():
+    left = sketch_of(f'reader-{i}' for i in range(0, 3000))
+    right = sketch_of(f'reader-{i}' for i in range(2000, 5000))
+    union = sketch_of(f'reader-{i}' for i in range(5000))
+    assert left.merge(right).registers == union.registers
+    assert HyperLogLog.from_bytes(union.to_bytes()).count() == union.count()
+
+    with pytest.raises(ValueError):
+        left.merge(HyperLogLog(10))
+
+
+def test_reader_key():
+    class Reader:
+        is_authenticated = True
+        id = 7
+    assert reader_key(Reader(), '10.0.0.1', 'Firefox') == 'user:7'
+    assert reader_key(None, '10.0.0.1', 'Firefox') != reader_key(None, '10.0.0.2', 'Firefox')
+
+
+def test_workers_merge_into_the_stored_sketch(app):
+    # Two worker processes saw overlapping readers of the same article
+    first, second = UniqueReaders(app), UniqueReaders(app)
+    for i in range(600):
+        first.record(1, f'anon:{i}')
+    for i in range(400, 1000):
+        second.record(1, f'anon:{i}')
+    assert abs(first.estimate(1)['total'] - 600) <= 30
+
+    for readers in (first, second):
+        with db.engine.begin() as connection:
+            readers.persist(connection)
+    assert first.stats()['pending_sketches'] == 0
+
+    estimate = UniqueReaders(app).estimate(1)
+    assert abs(estimate['total'] - 1000) <= 50
+    assert estimate['today'] == estimate['total']
+    assert first._sketch(1, ALL_TIME).count() == estimate['total']
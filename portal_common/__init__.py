@@ -0,0 +1,7 @@
+"""
+Modules shared by the todo app (app/) and the Fiascha portal (news_app/app/)
+
+Both applications have a top-level package named ``app``, so shared code
+lives here and is imported as ``portal_common.<module>``. The portal adds
+the repository root to ``sys.path`` in news_app/app/__init__.py.
+"""
@@ -0,0 +1,220 @@
+"""
+Request-level performance instrumentation (opt-in with INSTRUMENTATION_ENABLED)
+
+Records per request the number of SQL statements, total SQL time, template
+render time and the slowest statements. The numbers are sent back in a
+Server-Timing header, written as one JSON log line per request to the
+``performance`` logger, and aggregated into a rolling per-endpoint summary
+served as JSON to admins.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from flask import g, request, jsonify, abort, has_app_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('performance')
+
+_listeners_installed = False
+
+
+class RequestStats:
+    """Timings collected for a single request"""
+
+    def __init__(self, slow_statements=3):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.slowest = []
+        self.slow_statements = slow_statements
+        self._template_starts = []
+
+    def add_query(self, statement, duration):
+        self.query_count += 1
+        self.sql_time += duration
+        self.slowest.append((duration, statement))
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+        del self.slowest[self.slow_statements:]
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+
+def _current_stats():
+    if has_app_context():
+        return g.get('_request_stats')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_query_start')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    stats = _current_stats()
+    if stats is not None:
+        stats.add_query(statement, duration)
+
+
+def _install_engine_listeners():
+    # Engine-class listeners apply to every engine, so install them once per process
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listeners_installed = True
+
+
+class EndpointSummary:
+    """Rolling window of request timings for one endpoint"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.slowest_statement = None
+
+    def add(self, stats):
+        self.samples.append((stats.total_time, stats.sql_time, stats.query_count, stats.template_time))
+        if stats.slowest:
+            duration, statement = stats.slowest[0]
+            if self.slowest_statement is None or duration > self.slowest_statement[0]:
+                self.slowest_statement = (duration, statement)
+
+    def to_dict(self):
+        totals = sorted(sample[0] for sample in self.samples)
+        count = len(totals)
+        if not count:
+            return {'requests': 0}
+
+        def avg(index):
+            return round(sum(sample[index] for sample in self.samples) / count * 1000, 2)
+
+        return {
+            'requests': count,
+            'avg_ms': avg(0),
+            'p95_ms': round(totals[min(count - 1, int(count * 0.95))] * 1000, 2),
+            'max_ms': round(totals[-1] * 1000, 2),
+            'avg_sql_ms': avg(1),
+            'avg_queries': round(sum(sample[2] for sample in self.samples) / count, 2),
+            'max_queries': max(sample[2] for sample in self.samples),
+            'avg_template_ms': avg(3),
+            'slowest_statement': {
+                'ms': round(self.slowest_statement[0] * 1000, 2),
+                'sql': self.slowest_statement[1][:500]
+            } if self.slowest_statement else None
+        }
+
+
+class Instrumentation:
+    """Flask extension wiring the request timers together"""
+
+    def __init__(self, app=None):
+        self.window = 200
+        self.slow_statements = 3
+        self.admin_check = None
+        self._summaries = defaultdict(lambda: EndpointSummary(self.window))
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, admin_check=None):
+        """
+        Register request hooks if INSTRUMENTATION_ENABLED is set
+
+        Args:
+            app: Flask application
+            admin_check: Callable returning True when the current user may
+                view the summary endpoint
+        """
+        app.extensions['instrumentation'] = self
+        if not app.config.get('INSTRUMENTATION_ENABLED'):
+            return
+
+        self.enabled = True
+        self.window = app.config.get('INSTRUMENTATION_WINDOW', 200)
+        self.slow_statements = app.config.get('INSTRUMENTATION_SLOW_STATEMENTS', 3)
+        self.admin_check = admin_check
+
+        _install_engine_listeners()
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/admin/performance', 'performance_summary', self.summary_view)
+
+    def register_metrics(self, name, provider):
+        """Include another component's metrics (a callable returning a dict) in the summary"""
+        self._metrics[name] = provider
+
+    def _start_request(self):
+        g._request_stats = RequestStats(self.slow_statements)
+
+    def _template_started(self, sender, template, context, **extra):
+        stats = _current_stats()
+        if stats is not None:
+            stats._template_starts.append(time.perf_counter())
+
+    def _template_finished(self, sender, template, context, **extra):
+        stats = _current_stats()
+        if stats is not None and stats._template_starts:
+            stats.template_time += time.perf_counter() - stats._template_starts.pop()
+
+    def _finish_request(self, response):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return response
+
+        total = stats.total_time
+        response.headers.add('Server-Timing', ', '.join([
+            f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.query_count} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}'
+        ]))
+
+        endpoint = request.endpoint or 'unmatched'
+        with self._lock:
+            self._summaries[endpoint].add(stats)
+
+        logger.info(json.dumps({
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'queries': stats.query_count,
+            'template_ms': round(stats.template_time * 1000, 2),
+            'slowest': [
+                {'ms': round(duration * 1000, 2), 'sql': statement[:200]}
+                for duration, statement in stats.slowest
+            ]
+        }))
+        return response
+
+    def summary(self):
+        """Rolling per-endpoint summary plus registered component metrics"""
+        with self._lock:
+            endpoints = {name: summary.to_dict() for name, summary in self._summaries.items()}
+        metrics = {}
+        for name, provider in self._metrics.items():
+            try:
+                metrics[name] = provider()
+            except Exception as e:
+                metrics[name] = {'error': str(e)}
+        return {'endpoints': endpoints, 'metrics': metrics}
+
+    def summary_view(self):
+        """Admin-only JSON endpoint with the rolling summary"""
+        if self.admin_check is None or not self.admin_check():
+            abort(404)
+        return jsonify(self.summary())
@@ -0,0 +1,186 @@
+"""
+Login throttling with token buckets
+
+Every login attempt takes a token from a bucket for the client IP and one
+for the submitted username. Buckets refill continuously, so the limits
+``LOGIN_THROTTLE_IP_LIMIT`` and ``LOGIN_THROTTLE_USER_LIMIT`` read as
+"attempts/seconds" (e.g. ``20/300``): a burst of that many attempts, then
+one more every seconds/attempts. An empty bucket gets a 429 before the
+database or the password hasher is touched.
+
+Buckets live in a bounded per-process LRU by default. With
+LOGIN_THROTTLE_STORAGE set to a file path they are kept in a SQLite file
+instead, so every gunicorn worker on the host shares the same limits.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def parse_limit(value):
+    """Parse an ``attempts/seconds`` limit into (capacity, refill per second)"""
+    attempts, _, seconds = str(value).partition('/')
+    capacity = float(attempts)
+    return capacity, capacity / float(seconds or 60)
+
+
+def _refill(tokens, updated, capacity, rate, now):
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class MemoryBuckets:
+    """Per-process buckets: key -> (tokens, updated) in an LRU"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        """Take one token; return 0 if allowed, else seconds until a token is available"""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated, capacity, rate, now)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+                return (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBuckets:
+    """Buckets in a SQLite file shared by every worker process on the host"""
+
+    name = 'sqlite'
+
+    def __init__(self, path, max_keys=10000):
+        self.path = path
+        self.max_keys = max_keys
+        self._local = threading.local()
+        self._takes = 0
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS login_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def take(self, key, capacity, rate, now):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated FROM login_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = _refill(*(row or (capacity, now)), capacity, rate, now)
+            allowed = tokens >= 1
+            connection.execute(
+                "INSERT OR REPLACE INTO login_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens - 1 if allowed else tokens, now)
+            )
+            self._takes += 1
+            if self._takes % 1000 == 0:
+                # Keys that have been idle longest are full again anyway
+                connection.execute(
+                    "DELETE FROM login_buckets WHERE key NOT IN "
+                    "(SELECT key FROM login_buckets ORDER BY updated DESC LIMIT ?)", (self.max_keys,)
+                )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return 0 if allowed else (1 - tokens) / rate
+
+    def reset(self, key):
+        self._connect().execute("DELETE FROM login_buckets WHERE key = ?", (key,))
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM login_buckets").fetchone()[0]
+
+
+class LoginThrottle:
+    """Flask extension limiting login attempts per IP and per username"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.ip_limit = parse_limit('20/300')
+        self.user_limit = parse_limit('5/300')
+        self.storage = MemoryBuckets()
+        self.allowed = 0
+        self.throttled_ip = 0
+        self.throttled_user = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('LOGIN_THROTTLE_ENABLED', True)
+        self.ip_limit = parse_limit(app.config.get('LOGIN_THROTTLE_IP_LIMIT', '20/300'))
+        self.user_limit = parse_limit(app.config.get('LOGIN_THROTTLE_USER_LIMIT', '5/300'))
+        max_keys = app.config.get('LOGIN_THROTTLE_MAX_KEYS', 10000)
+        path = app.config.get('LOGIN_THROTTLE_STORAGE')
+        self.storage = SQLiteBuckets(path, max_keys) if path else MemoryBuckets(max_keys)
+        app.extensions['login_throttle'] = self
+
+    def hit(self, ip, username):
+        """
+        Record a login attempt
+
+        Args:
+            ip: Client address
+            username: Submitted username or email (may be empty)
+
+        Returns:
+            float: 0 if the attempt may proceed, else seconds to wait
+        """
+        if not self.enabled:
+            return 0
+        now = time.time()
+        retry_after = self.storage.take(f'ip:{ip}', *self.ip_limit, now)
+        if retry_after:
+            self.throttled_ip += 1
+            return retry_after
+        if username:
+            retry_after = self.storage.take(f'user:{username.strip().lower()}', *self.user_limit, now)
+            if retry_after:
+                self.throttled_user += 1
+                return retry_after
+        self.allowed += 1
+        return 0
+
+    def reset_user(self, username):
+        """Refill a username's bucket after a successful login"""
+        if self.enabled and username:
+            self.storage.reset(f'user:{username.strip().lower()}')
+
+    def stats(self):
+        """Throttle metrics for monitoring"""
+        return {
+            'storage': self.storage.name,
+            'tracked_keys': len(self.storage),
+            'allowed': self.allowed,
+            'throttled_ip': self.throttled_ip,
+            'throttled_user': self.throttled_user
+        }
@@ -0,0 +1,185 @@
+"""
+Password hashing policy
+
+The algorithm and cost come from PASSWORD_HASH_ALGORITHM (``pbkdf2:sha256``
+or ``scrypt``) and PASSWORD_HASH_COST (PBKDF2 iterations or the scrypt N
+parameter). Hashes stored with other parameters keep working and are
+upgraded the next time their owner logs in.
+
+Verification runs on a small bounded thread pool so a burst of logins can
+only occupy PASSWORD_VERIFY_WORKERS cores per process. When the pool and
+its queue are full, callers get PasswordHasherBusy immediately instead of
+piling up behind the KDF.
+"""
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+DEFAULT_SCRYPT_N = 2 ** 15
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password verifications are already running"""
+
+
+def build_method(algorithm, cost=None):
+    """
+    Build the werkzeug method string for an algorithm and cost
+
+    Args:
+        algorithm: ``pbkdf2:<hash name>`` or ``scrypt``
+        cost: PBKDF2 iterations or scrypt N; None for the werkzeug default
+
+    Returns:
+        str: Method string as stored in the hash prefix, e.g. ``pbkdf2:sha256:600000``
+    """
+    if algorithm == 'scrypt':
+        return f'scrypt:{cost or DEFAULT_SCRYPT_N}:8:1'
+    if algorithm.startswith('pbkdf2'):
+        hash_name = algorithm.partition(':')[2] or 'sha256'
+        return f'pbkdf2:{hash_name}:{cost or DEFAULT_PBKDF2_ITERATIONS}'
+    raise ValueError(f"Unsupported password hash algorithm '{algorithm}'")
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords according to the configured policy"""
+
+    def __init__(self, app=None):
+        self.method = build_method('pbkdf2:sha256')
+        self.workers = 2
+        self.queue_size = 8
+        self.timeout = 10
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.verified = 0
+        self.rejected = 0
+        self.rehashed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = build_method(
+            app.config.get('PASSWORD_HASH_ALGORITHM', 'pbkdf2:sha256'),
+            app.config.get('PASSWORD_HASH_COST')
+        )
+        self.workers = app.config.get('PASSWORD_VERIFY_WORKERS') or min(4, os.cpu_count() or 1)
+        self.queue_size = app.config.get('PASSWORD_VERIFY_QUEUE', 8)
+        self.timeout = app.config.get('PASSWORD_VERIFY_TIMEOUT', 10)
+        self._executor = None
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        """Hash a password with the current policy"""
+        return generate_password_hash(password, method=self.method)
+
+    def needs_rehash(self, password_hash):
+        """True if a stored hash was made with other parameters than the current policy"""
+        return password_hash.split('$', 1)[0] != self.method
+
+    def verify(self, password_hash, password):
+        """
+        Check a password against a stored hash on the verification pool
+
+        Raises:
+            PasswordHasherBusy: If every worker and queue slot is taken, or the
+                verification did not finish within PASSWORD_VERIFY_TIMEOUT
+        """
+        if not password_hash:
+            return False
+        executor, slots = self._get_executor()
+        if not slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        try:
+            future = executor.submit(check_password_hash, password_hash, password)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self.rejected += 1
+            raise PasswordHasherBusy() from None
+        self.verified += 1
+        return result
+
+    def verify_and_update(self, user, password):
+        """
+        Verify a user's password and rehash it if the stored parameters are outdated
+
+        The caller commits the session.
+
+        Returns:
+            bool: Whether the password matched
+        """
+        if not self.verify(user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            user.password_hash = self.hash(password)
+            self.rehashed += 1
+        return True
+
+    def stats(self):
+        """Hasher metrics for monitoring"""
+        return {
+            'method': self.method,
+            'workers': self.workers,
+            'verified': self.verified,
+            'rejected': self.rejected,
+            'rehashed': self.rehashed
+        }
+
+    def _get_executor(self):
+        # Thread pools don't survive a fork (e.g. gunicorn preload)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-verify')
+                self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+            return self._executor, self._slots
+
+
+def _time_hash(method, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_password_hash('benchmark-password', method=method)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def benchmark(algorithm, target_ms, rounds=3):
+    """
+    Find the highest cost whose hash takes at most ``target_ms`` on this host
+
+    Args:
+        algorithm: ``pbkdf2:<hash name>`` or ``scrypt``
+        target_ms: Target time for one hash (and so one login) in milliseconds
+        rounds: Timed runs per candidate; the median is used
+
+    Returns:
+        tuple: (cost, measured milliseconds)
+    """
+    target = target_ms / 1000
+    if algorithm == 'scrypt':
+        # N must be a power of two; double it while we stay under the target
+        cost = 2 ** 12
+        elapsed = _time_hash(build_method(algorithm, cost), rounds)
+        while True:
+            next_elapsed = _time_hash(build_method(algorithm, cost * 2), rounds)
+            if next_elapsed > target:
+                break
+            cost, elapsed = cost * 2, next_elapsed
+        return cost, elapsed * 1000
+
+    # PBKDF2 time is linear in the iteration count, so extrapolate from a sample
+    sample = 50_000
+    per_iteration = _time_hash(build_method(algorithm, sample), rounds) / sample
+    cost = max(10_000, int(target / per_iteration) // 10_000 * 10_000)
+    return cost, _time_hash(build_method(algorithm, cost), rounds) * 1000
@@ -0,0 +1,186 @@
+"""
+Identity cache for the Flask-Login user loader
+
+Flask-Login loads the user on every authenticated request. The loader is
+served from a per-process LRU of detached user snapshots (column values
+only, never the password hash) that expire after USER_CACHE_TTL seconds.
+Entries are dropped as soon as a User row is updated or deleted through the
+ORM, and again once that transaction commits. Other worker processes pick
+the change up when their entry expires.
+
+Attribute reads that aren't plain columns (relationships, methods,
+properties) fall through to a live ORM instance loaded on first use. Views
+that modify the user must do so on ``live_user(current_user)``.
+"""
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+_SESSION_KEY = 'user_cache_invalidate'
+
+
+class CachedUser:
+    """Read-only, detached snapshot of a User row"""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, data, cache):
+        object.__setattr__(self, '_data', data)
+        object.__setattr__(self, '_cache', cache)
+        object.__setattr__(self, '_live', None)
+
+    @property
+    def is_active(self):
+        return bool(self._data.get('is_active', True))
+
+    def get_id(self):
+        return str(self._data['id'])
+
+    def live(self):
+        """The ORM instance for this user, loaded in the current session"""
+        if self._live is None:
+            object.__setattr__(self, '_live', self._cache.get_live(self._data['id']))
+        return self._live
+
+    def __getattr__(self, name):
+        data = self.__dict__['_data']
+        if name in data:
+            return data[name]
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.live(), name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Cached user is read-only; modify live_user(current_user).{name} instead")
+
+    def __eq__(self, other):
+        other_id = getattr(other, 'id', None)
+        return other_id is not None and other_id == self._data['id']
+
+    def __hash__(self):
+        return hash(self._data['id'])
+
+    def __repr__(self):
+        return f"<CachedUser {self._data.get('username')}>"
+
+
+def live_user(user):
+    """Return the ORM instance behind current_user (cached or not)"""
+    if isinstance(user, CachedUser):
+        return user.live()
+    return user
+
+
+class UserCache:
+    """Per-process TTL/LRU cache of user snapshots"""
+
+    def __init__(self):
+        self.model = None
+        self.session = None
+        self.max_entries = 1024
+        self.ttl = 30
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app, model, session):
+        """
+        Bind the cache to the User model
+
+        Args:
+            app: Flask application
+            model: User model class
+            session: Scoped session used to load live instances
+        """
+        self.model = model
+        self.session = session
+        self.max_entries = app.config.get('USER_CACHE_SIZE', 1024)
+        self.ttl = app.config.get('USER_CACHE_TTL', 30)
+        self._columns = [
+            attr.key for attr in inspect(model).column_attrs if attr.key != 'password_hash'
+        ]
+        app.extensions['user_cache'] = self
+        if not event.contains(model, 'after_update', self._user_changed):
+            event.listen(model, 'after_update', self._user_changed)
+            event.listen(model, 'after_delete', self._user_changed)
+            event.listen(Session, 'after_commit', self._session_committed)
+            event.listen(Session, 'after_rollback', self._session_rolled_back)
+
+    def load(self, user_id):
+        """
+        Load a user for Flask-Login
+
+        Returns:
+            CachedUser, the ORM instance when caching is disabled, or None
+        """
+        if not self.max_entries:
+            return self.get_live(user_id)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return CachedUser(entry[1], self)
+            self.misses += 1
+
+        user = self.get_live(user_id)
+        if user is None:
+            return None
+        data = {key: getattr(user, key) for key in self._columns}
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, data)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        snapshot = CachedUser(data, self)
+        object.__setattr__(snapshot, '_live', user)
+        return snapshot
+
+    def get_live(self, user_id):
+        """Load the ORM instance for a user id"""
+        return self.session.get(self.model, user_id)
+
+    def invalidate(self, user_id, session=None):
+        """
+        Drop a user's snapshot now and, if a session is given, again after it commits
+
+        The second drop covers requests that re-cached the old row between the
+        flush and the commit.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.invalidations += 1
+        if session is not None:
+            session.info.setdefault(_SESSION_KEY, set()).add(user_id)
+
+    def clear(self):
+        """Drop every snapshot"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Cache metrics for monitoring"""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations
+        }
+
+    def _user_changed(self, mapper, connection, target):
+        self.invalidate(target.id, object_session(target))
+
+    def _session_committed(self, session):
+        for user_id in session.info.pop(_SESSION_KEY, ()):
+            with self._lock:
+                self._entries.pop(user_id, None)
+
+    def _session_rolled_back(self, session):
+        session.info.pop(_SESSION_KEY, None)
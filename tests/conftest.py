@@ -0,0 +1,75 @@
+import pytest
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from app import create_app, db, user_cache
+from app.models import User
+
+
+class QueryCounter:
+    """Records the SQL statements an engine executes while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+class RequestClient(FlaskClient):
+    """Runs each request in its own app context, as a server does, instead of the test's"""
+
+    def open(self, *args, **kwargs):
+        with self.application.app_context():
+            return super().open(*args, **kwargs)
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    app.test_client_class = RequestClient
+    with app.app_context():
+        # The user snapshot cache outlives the app; start every test empty
+        user_cache.clear()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """``with queries() as counter:`` counts the statements run inside the block"""
+    return lambda: QueryCounter(db.engine)
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username):
+        user = User(username=username, email=f'{username}@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+def login(client, username):
+    response = client.post('/auth/login', data={'email': f'{username}@example.com', 'password': 'password'})
+    assert response.status_code == 302
+    return response
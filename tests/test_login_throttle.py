@@ -0,0 +1,75 @@
+import pytest
+from config import TestingConfig, config
+from app import create_app
+from portal_common.login_throttle import LoginThrottle, MemoryBuckets, SQLiteBuckets, parse_limit
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def buckets(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBuckets()
+    return SQLiteBuckets(str(tmp_path / 'buckets.db'))
+
+
+def test_parse_limit():
+    assert parse_limit('20/300') == (20.0, 20 / 300)
+    assert parse_limit('5') == (5.0, 5 / 60)
+
+
+def test_burst_then_refill(buckets):
+    capacity, rate = parse_limit('3/30')  # One token every 10 seconds
+    assert [buckets.take('ip:a', capacity, rate, 1000.0) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take('ip:a', capacity, rate, 1000.0) == pytest.approx(10)
+    # Refused attempts don't use up tokens
+    assert buckets.take('ip:a', capacity, rate, 1005.0) == pytest.approx(5)
+    assert buckets.take('ip:a', capacity, rate, 1010.0) == 0
+    # Never refills past the capacity
+    assert [buckets.take('ip:a', capacity, rate, 5000.0) for _ in range(4)][-1] > 0
+    # Other keys have their own bucket
+    assert buckets.take('ip:b', capacity, rate, 1000.0) == 0
+
+
+def test_reset(buckets):
+    capacity, rate = parse_limit('1/60')
+    buckets.take('user:bob', capacity, rate, 0.0)
+    assert buckets.take('user:bob', capacity, rate, 0.0)
+    buckets.reset('user:bob')
+    assert buckets.take('user:bob', capacity, rate, 0.0) == 0
+
+
+def test_memory_buckets_are_bounded():
+    buckets = MemoryBuckets(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        buckets.take(key, 1, 1, 0.0)
+    assert len(buckets) == 2
+
+
+def test_per_ip_and_per_user_limits():
+    throttle = LoginThrottle()
+    throttle.ip_limit = parse_limit('10/60')
+    throttle.user_limit = parse_limit('2/60')
+    assert throttle.hit('10.0.0.1', 'Bob') == 0
+    assert throttle.hit('10.0.0.2', ' bob ') == 0
+    # Same username from yet another address
+    assert throttle.hit('10.0.0.3', 'BOB') > 0
+    assert throttle.hit('10.0.0.3', 'alice') == 0
+    throttle.reset_user('bob')
+    assert throttle.hit('10.0.0.3', 'bob') == 0
+    assert throttle.stats()['throttled_user'] == 1
+
+
+@pytest.mark.parametrize('proxies, throttled', [(0, True), (1, False)])
+def test_clients_behind_the_proxy_have_their_own_bucket(monkeypatch, proxies, throttled):
+    class ProxiedConfig(TestingConfig):
+        LOGIN_THROTTLE_ENABLED = True
+        LOGIN_THROTTLE_IP_LIMIT = '3/300'
+        PROXY_FIX_X_FOR = proxies
+    monkeypatch.setitem(config, 'proxied', ProxiedConfig)
+    client = create_app('proxied').test_client()
+
+    statuses = [
+        client.post('/auth/login', data={'email': f'user{i}@example.com', 'password': 'wrong'},
+                    headers={'X-Forwarded-For': f'203.0.113.{i}'}).status_code
+        for i in range(5)
+    ]
+    assert (429 in statuses) == throttled
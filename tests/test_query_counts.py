@@ -0,0 +1,50 @@
+"""
+Query count of the task list
+
+The page must run the same number of statements for 1 task as for many,
+i.e. categories are loaded with the tasks rather than one query per task.
+"""
+from app import db
+from app.models import Task, Category
+from tests.conftest import login
+
+MANY = 20
+
+
+def count_page_queries(client, queries, url):
+    # Warm the user snapshot first, so only the listing differs between runs
+    assert client.get(url).status_code == 200
+    with queries() as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+    return counter.count
+
+
+def add_tasks(user, count, offset=0):
+    for i in range(offset, offset + count):
+        # Every task in its own category, so lazy loads would show up
+        category = Category(name=f'Category {i}', user_id=user.id)
+        db.session.add(category)
+        db.session.flush()
+        db.session.add(Task(title=f'Task {i}', user_id=user.id, category_id=category.id))
+    db.session.commit()
+
+
+def test_task_list_loads_categories_with_the_rows(client, queries, make_user):
+    user = make_user('alice')
+    login(client, 'alice')
+    add_tasks(user, 1)
+    one = count_page_queries(client, queries, '/')
+    add_tasks(user, MANY, offset=1)
+    assert count_page_queries(client, queries, '/') == one
+
+
+def test_listing_query_loads_categories(app, queries, make_user):
+    user = make_user('alice')
+    add_tasks(user, MANY)
+    user_id = user.id
+    db.session.expunge_all()
+    with queries() as counter:
+        names = [task.category.name for task in Task.listing_query(user_id).all()]
+    assert len(names) == MANY
+    assert counter.count == 1